@@ -0,0 +1,109 @@
+"""
+
+By Pino Sante
+
+Please credit me if you change, use or adapt this file.
+
+"""
+
+import sys
+import argparse
+import multiprocessing
+
+from ecc.common.utility import *
+from ecc.common.settings import Settings
+from ecc.logic.generator import Generator
+from ecc.logic.raters import *
+from ecc.logic.selection import SELECTION_STRATEGIES
+from ecc.logic.batch_runner import BatchRunner
+
+INITIALIZATION_METHODS = ('Gaussian Samples', 'Random Crossover')
+# the settings a batch needs, with the option that gives them when they are not in the settings of the app
+REQUIRED_SETTINGS = {'--vam-dir': 'VAM base dir', '--appearance-dir': 'appearance dir',
+                     '--child-template': 'child template', '--morph-threshold': 'morph threshold',
+                     '--min-morphs': 'min morph threshold'}
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        description='Runs VAM Evolutionary Character Creation for a number of generations without the GUI. Settings '
+                    'which are not given are taken from the settings of the app, which are never changed.')
+    parser.add_argument('--vam-dir', help='the VAM base folder, the children are saved in its Appearance folder')
+    parser.add_argument('--appearance-dir', help='the folder with the parent appearances')
+    parser.add_argument('--recursive', action='store_true', default=None,
+                        help='also use the appearances in the subfolders of the appearance folder')
+    parser.add_argument('--child-template', help='the appearance the children are saved over')
+    parser.add_argument('--morph-threshold', type=float, help='morphs with a lower absolute value are ignored')
+    parser.add_argument('--min-morphs', type=int, help='parents need more morphs than this above the threshold')
+    parser.add_argument('--favorites', action='store_true', help='only use the favorite appearances as parents')
+    parser.add_argument('--method', choices=INITIALIZATION_METHODS, default='Gaussian Samples',
+                        help='how the first population is created')
+    parser.add_argument('--generations', type=int, default=10, help='number of generations to run')
+    parser.add_argument('--population-size', type=int,
+                        help=f'number of children per generation, default {POP_SIZE}')
+    parser.add_argument('--selection', choices=list(SELECTION_STRATEGIES),
+                        help='how the parents of the children are chosen from the ratings, default Roulette Wheel')
+    parser.add_argument('--tournament-size', type=int, help='number of chromosomes in a tournament selection')
+    parser.add_argument('--keep-generations', action='store_true',
+                        help='also save every generation to its own subfolder of the children folder')
+    raters = parser.add_mutually_exclusive_group(required=True)
+    raters.add_argument('--rater', metavar='MODULE:FUNCTION',
+                        help='rate with function(generation, population, filenames) from a module or python file')
+    raters.add_argument('--ratings-file', metavar='PATTERN',
+                        help='read the ratings of every generation from a json file, like ratings_{generation}.json')
+    raters.add_argument('--target', metavar='APPEARANCE',
+                        help='rate the children on how close their morphs are to this appearance')
+    parser.add_argument('--wait', type=float, default=0.0,
+                        help='seconds to wait for a ratings file which is not there yet')
+    return parser.parse_args(argv)
+
+
+def create_rater(args):
+    if args.rater:
+        return CallableRater(load_rater_function(args.rater))
+    if args.ratings_file:
+        return JsonFileRater(args.ratings_file, args.wait)
+    return TargetSimilarityRater.from_file(args.target)
+
+
+def main(argv=None):
+    """
+    run the genetic algorithm with the settings of the app and the command line arguments, and no window
+    """
+    args = parse_arguments(argv)
+    settings = Settings()
+    overrides = {'VAM base dir': args.vam_dir, 'appearance dir': args.appearance_dir,
+                 'recursive directory search': args.recursive, 'child template': args.child_template,
+                 'morph threshold': args.morph_threshold, 'min morph threshold': args.min_morphs,
+                 'selection method': args.selection, 'tournament size': args.tournament_size}
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    if 'recursive directory search' not in settings:
+        settings['recursive directory search'] = False
+    messages = [f'· Please give {option}' for option, setting in REQUIRED_SETTINGS.items()
+                if setting not in settings or settings[setting] in ('', None)]
+    if messages:
+        print('\n'.join(messages), file=sys.stderr)
+        return 2
+    if args.generations < 1:
+        print('· Please run at least 1 generation', file=sys.stderr)
+        return 2
+    if args.population_size is not None:
+        if args.population_size < 2:
+            print('· Please use a population size of at least 2', file=sys.stderr)
+            return 2
+        settings['population size'] = args.population_size
+
+    try:
+        rater = create_rater(args)
+        runner = BatchRunner(Generator(settings), rater, args.method, args.generations,
+                             get_only_favorites=args.favorites, keep_generations=args.keep_generations)
+        runner.run()
+    except (ValueError, OSError, ImportError) as e:
+        print(f'*** Error! {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()  # the library scan uses worker processes, also in the frozen executable
+    sys.exit(main())
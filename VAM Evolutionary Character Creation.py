@@ -7,6 +7,7 @@ Please credit me if you change, use or adapt this file.
 """
 
 import os
+import multiprocessing
 import tkinter as tk
 
 import ecc.common.utility
@@ -41,4 +42,5 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # the library scan uses worker processes, also in the frozen executable
     main()
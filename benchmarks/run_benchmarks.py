@@ -0,0 +1,197 @@
+"""
+Benchmarks for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+
+import numpy as np
+
+from ecc.common.utility import *
+from ecc.logic.generator import *
+from ecc.logic.variation import *
+from .synthetic_library import *
+
+BENCHMARK_VERSION = 1
+DEFAULT_MORPH_THRESHOLD = 0.01
+DEFAULT_MIN_MORPHS = 150
+DEFAULT_SELECTION_SIZE = 100000
+
+
+class BenchmarkSettings(dict):
+    """ Settings for the Generator which keep all its data files (the appearance index, the thumbnail cache and the
+        gaussian model) in data_path, so a benchmark never touches the data of the app """
+    def __init__(self, data_path, **settings):
+        super().__init__(**settings)
+        self.data_path = data_path
+
+    def get_data_filename(self, filename):
+        return os.path.join(self.data_path, os.path.basename(filename))
+
+    def save(self):
+        pass
+
+
+def time_function(function, repeat, setup=None):
+    """ Runs function repeat times and returns the timings in seconds. setup() runs before every call, outside of
+        the timing. Everything the app prints during the calls is hidden. """
+    timings = list()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings), 'repeat': repeat}
+
+
+def run_benchmarks(library_path, data_path, repeat=5, scan_workers=None, seed=1, population_size=POP_SIZE,
+                   selection_size=DEFAULT_SELECTION_SIZE):
+    """ Times the hot paths of the logic layer on the library in library_path, for populations of population_size
+        children. The selection strategies are timed on their own, for a population of selection_size chromosomes.
+        Returns a dictionary with the timings of every benchmark. """
+    rnd = random.Random(seed)
+    settings = BenchmarkSettings(data_path, **{'appearance dir': library_path, 'recursive directory search': True,
+                                               'morph threshold': DEFAULT_MORPH_THRESHOLD,
+                                               'min morph threshold': DEFAULT_MIN_MORPHS,
+                                               'scan workers': scan_workers, 'population size': population_size})
+    index_filename = settings.get_data_filename(APPEARANCE_INDEX_FILENAME)
+    results = dict()
+
+    results['walk_library'] = time_function(lambda: walk_library(library_path, True), repeat)
+
+    def remove_index():
+        if os.path.isfile(index_filename):
+            os.remove(index_filename)
+
+    results['fill_data_without_index'] = time_function(
+        lambda: Generator(settings).fill_data_with_all_appearances(), max(1, repeat // 2), setup=remove_index)
+    results['fill_data_with_index'] = time_function(lambda: Generator(settings).fill_data_with_all_appearances(),
+                                                    repeat)
+    generator = Generator(settings)
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.fill_data_with_all_appearances()
+    results['fill_data_refresh'] = time_function(generator.fill_data_with_all_appearances, repeat)
+    generator.stop_library_watcher()
+
+    store = generator.appearances
+    filenames = sorted(store.keys())
+    female_filenames = generator.filter_filename_list_on_genders(filenames, matching_genders(FEMALE))
+    thresholds = iter(np.linspace(0.02, 0.2, 10 * repeat))
+    results['filter_on_morph_count_new_threshold'] = time_function(
+        lambda: store.filter_on_morph_count(filenames, next(thresholds), DEFAULT_MIN_MORPHS), repeat)
+    store.filter_on_morph_count(filenames, DEFAULT_MORPH_THRESHOLD, DEFAULT_MIN_MORPHS)
+    results['filter_on_morph_count_same_threshold'] = time_function(
+        lambda: store.filter_on_morph_count(filenames, DEFAULT_MORPH_THRESHOLD, DEFAULT_MIN_MORPHS), repeat)
+
+    settings['child template'] = female_filenames[0]
+    pairs = [rnd.sample(female_filenames, 2) for _ in range(population_size)]
+    results['fuse_characters'] = time_function(
+        lambda: [fuse_characters(f1, f2, settings) for f1, f2 in pairs], repeat)
+
+    if population_size <= len(female_filenames):
+        parent_filenames = rnd.sample(female_filenames, population_size)
+    else:
+        parent_filenames = rnd.choices(female_filenames, k=population_size)
+    parents = [store.get_morph_list(f) for f in parent_filenames]
+    ratings = [rnd.randint(1, 5) for _ in parents]
+    results['create_children_morph_lists'] = time_function(
+        lambda: create_children_morph_lists(parents, ratings, population_size, DEFAULT_MORPH_THRESHOLD), repeat)
+
+    rng = np.random.default_rng(seed)
+    selection_ratings = rng.integers(MIN_RATING, MAX_RATING + 1, selection_size)
+    for method, select_parents in SELECTION_STRATEGIES.items():
+        results['selection_' + method.lower().replace(' ', '_')] = time_function(
+            lambda: select_parents(selection_ratings, selection_size, rng), repeat)
+
+    results['gaussian_fit_and_sample'] = time_function(
+        lambda: create_gaussian_samples_morph_lists(store, female_filenames, population_size,
+                                                    DEFAULT_MORPH_THRESHOLD), repeat)
+    model_cache = GaussianModelCache()
+    results['gaussian_sample_cached_model'] = time_function(
+        lambda: create_gaussian_samples_morph_lists(store, female_filenames, population_size, DEFAULT_MORPH_THRESHOLD,
+                                                    model_cache=model_cache, gender=FEMALE), repeat)
+
+    engine = EvolutionEngine(store, settings, model_cache)
+    results['engine_initialize_population'] = time_function(
+        lambda: engine.initialize_population('Random Crossover', female_filenames, gender=FEMALE), repeat)
+    results['engine_create_next_population'] = time_function(
+        lambda: engine.create_next_population(parents, ratings), repeat)
+
+    population = engine.create_next_population(parents, ratings)
+    save_path = os.path.join(data_path, 'children')
+    results['save_population'] = time_function(lambda: generator.save_population(population, save_path), repeat)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the logic layer of VAM Evolutionary Character Creation '
+                                                 'on a synthetic appearance library, and writes the results as json.')
+    parser.add_argument('--presets', type=int, default=1000, help='number of presets in the synthetic library')
+    parser.add_argument('--morphs', type=int, default=300, help='number of morphs per preset')
+    parser.add_argument('--clothing', type=int, default=4, help='number of clothing items per preset')
+    parser.add_argument('--favorites', type=float, default=0.1, help='share of presets marked as favorite')
+    parser.add_argument('--thumbnails', type=float, default=0.9, help='share of presets with a thumbnail')
+    parser.add_argument('--female', type=float, default=DEFAULT_GENDER_MIX[FEMALE], help='share of female presets')
+    parser.add_argument('--male', type=float, default=DEFAULT_GENDER_MIX[MALE], help='share of male presets')
+    parser.add_argument('--futa', type=float, default=DEFAULT_GENDER_MIX[FUTA], help='share of futa presets')
+    parser.add_argument('--population-size', type=int, default=POP_SIZE, help='number of children per generation')
+    parser.add_argument('--selection-size', type=int, default=DEFAULT_SELECTION_SIZE,
+                        help='number of chromosomes for the selection benchmarks')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per benchmark')
+    parser.add_argument('--scan-workers', type=int, default=None,
+                        help='worker processes for parsing the library, default one per cpu')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the synthetic library and the benchmarks')
+    parser.add_argument('--library', help='use or create the synthetic library in this directory and keep it')
+    parser.add_argument('--output', help='write the json results to this file instead of to stdout')
+    args = parser.parse_args(argv)
+
+    work_path = tempfile.mkdtemp(prefix='ecc_benchmark_')
+    try:
+        library_path = args.library or os.path.join(work_path, 'library')
+        data_path = os.path.join(work_path, 'data')
+        os.makedirs(data_path)
+        if not os.path.isdir(library_path) or not os.listdir(library_path):
+            print(f'Creating a synthetic library of {args.presets} presets in: {library_path}', file=sys.stderr)
+            create_library(library_path, args.presets, args.morphs, {FEMALE: args.female, MALE: args.male,
+                                                                     FUTA: args.futa},
+                           args.clothing, args.favorites, args.thumbnails, args.seed)
+        print('Running benchmarks...', file=sys.stderr)
+        results = run_benchmarks(library_path, data_path, args.repeat, args.scan_workers, args.seed,
+                                 args.population_size, args.selection_size)
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+    report = {
+        'version': BENCHMARK_VERSION,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('library', 'output')},
+        'results': results
+    }
+    text = json.dumps(report, indent=3)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
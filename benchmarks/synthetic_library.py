@@ -0,0 +1,106 @@
+"""
+Benchmarks for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import io
+import os
+import json
+import random
+
+from PIL import Image
+
+from ecc.common.utility import *
+
+DEFAULT_GENDER_MIX = {FEMALE: 0.7, MALE: 0.2, FUTA: 0.1}
+MORPH_VOCABULARY_FACTOR = 4  # the library uses this many times more different morphs than a single preset has
+SUBDIRECTORY_SIZE = 250  # presets per subdirectory, like a library sorted into creator folders
+
+
+def create_thumbnail_data(seed):
+    """ Returns the bytes of a small jpg, which is used as thumbnail for every preset """
+    color = (seed * 37 % 256, seed * 91 % 256, seed * 53 % 256)
+    data = io.BytesIO()
+    Image.new('RGB', (512, 512), color).save(data, 'JPEG', quality=80)
+    return data.getvalue()
+
+
+def create_morph_list(rnd, morph_names, n_morphs):
+    morph_list = list()
+    for name in rnd.sample(morph_names, n_morphs):
+        morph_list.append({'uid': f'Custom/Atom/Person/Morphs/female/{name}.vmi', 'name': name,
+                           'value': str(round(rnd.gauss(0.0, 0.35), 6))})
+    return morph_list
+
+
+def create_appearance(rnd, gender, morph_names, n_morphs, n_clothing):
+    """ Returns a synthetic appearance json, with a geometry storable, the anatomy storables, and clothing, hair and
+        skin storables of roughly the size VAM writes them """
+    morph_list = create_morph_list(rnd, morph_names, n_morphs)
+    if gender == FUTA:
+        morph_list.append({'uid': 'MVR_G2Female', 'name': 'MVR_G2Female', 'value': '1'})
+    clothing = [{'id': f'Creator{rnd.randrange(50)}:Clothing{k}', 'internalId': f'Clothing{k}', 'enabled': 'true'}
+                for k in range(n_clothing)]
+    hair = [{'id': f'Creator{rnd.randrange(50)}:Hair{k}', 'internalId': f'Hair{k}', 'enabled': 'true'}
+            for k in range(2)]
+    geometry = {
+        'id': 'geometry',
+        'hair': hair,
+        'clothing': clothing,
+        'character': 'Male' if gender == MALE else 'Female',
+        'useFemaleMorphsOnMale': 'true' if gender == FUTA else 'false',
+        'morphs': morph_list,
+        'morphsOtherGender': create_morph_list(rnd, morph_names, n_morphs // 10) if gender == FUTA else []
+    }
+    storables = [
+        {'id': 'FemaleAnatomy', 'enabled': 'false' if gender == MALE else 'true'},
+        {'id': 'MaleAnatomy', 'enabled': 'true' if gender == MALE else 'false'},
+        geometry,
+        {'id': 'skin', 'textures': {name: f'Custom/Atom/Person/Textures/{name}_{rnd.randrange(10 ** 6)}.png'
+                                    for name in ('face', 'torso', 'limbs', 'genitals')},
+         'specular': str(rnd.random()), 'gloss': str(rnd.random())}
+    ]
+    for item in clothing + hair:
+        # every clothing and hair item has a few storables with its simulation and material settings
+        for part in ('Sim', 'Material', 'Control'):
+            storable = {'id': f"{item['internalId']}{part}"}
+            for k in range(30):
+                storable[f'param{k}'] = str(round(rnd.random(), 6))
+            storables.append(storable)
+    return {'setUnlistedParamsToDefault': 'true', 'storables': storables}
+
+
+def create_library(path, n_presets, n_morphs=300, gender_mix=None, n_clothing=4, favorites_ratio=0.1,
+                   thumbnails_ratio=0.9, seed=1):
+    """ Writes a synthetic library of n_presets Preset_*.vap files with n_morphs morphs each to path. Every
+        SUBDIRECTORY_SIZE presets go into their own subdirectory. gender_mix maps a gender to its share of the library
+        and defaults to DEFAULT_GENDER_MIX. A preset gets a .fav marker with chance favorites_ratio and a jpg
+        thumbnail with chance thumbnails_ratio. The same arguments always give the same library. Returns the list of
+        preset filenames. """
+    rnd = random.Random(seed)
+    if gender_mix is None:
+        gender_mix = DEFAULT_GENDER_MIX
+    genders, weights = list(gender_mix.keys()), list(gender_mix.values())
+    morph_names = [f'Morph{i:05d}' for i in range(n_morphs * MORPH_VOCABULARY_FACTOR)]
+    thumbnail_data = create_thumbnail_data(seed)
+
+    filenames = list()
+    for i in range(n_presets):
+        directory = os.path.join(path, f'Creator{i // SUBDIRECTORY_SIZE}')
+        os.makedirs(directory, exist_ok=True)
+        gender = rnd.choices(genders, weights)[0]
+        filename = os.path.join(directory, f'Preset_Look{i:06d}.vap')
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(create_appearance(rnd, gender, morph_names, n_morphs, n_clothing), f, indent=3)
+        if rnd.random() < favorites_ratio:
+            open(filename + '.fav', 'w').close()
+        if rnd.random() < thumbnails_ratio:
+            with open(os.path.splitext(filename)[0] + '.jpg', 'wb') as f:
+                f.write(thumbnail_data)
+        filenames.append(filename)
+    return filenames
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please run "python -m benchmarks.run_benchmarks".')
@@ -18,31 +18,32 @@ class Settings(dict):
 
     def save(self):
         """ Saves the settings as a json file to DATA_PATH/SETTINGS_FILENAME """
-        dir_path = ''
-        if getattr(sys, 'frozen', False):
-            dir_path = os.path.dirname(sys.executable)
-        elif __file__:
-            dir_path = os.path.dirname(os.path.realpath(__file__))
-        filename = os.path.join(dir_path, DATA_PATH, SETTINGS_FILENAME)
+        filename = self.get_data_filename(SETTINGS_FILENAME)
         with open(filename, 'w') as json_file:
             print("Writing settings to:", filename)
             json.dump(self, json_file, indent=3)
 
     def load(self):
         """ Fills settings with the settings in the DATA_PATH/SETTINGS_FILENAME json_file """
-        dir_path = ''
-        settings = dict()
-        if getattr(sys, 'frozen', False):
-            dir_path = os.path.dirname(sys.executable)
-        elif __file__:
-            dir_path = os.path.dirname(os.path.realpath(__file__))
-        filename = os.path.join(dir_path, DATA_PATH, SETTINGS_FILENAME)
+        filename = self.get_data_filename(SETTINGS_FILENAME)
         if os.path.isfile(filename):
             with open(filename) as json_file:
                 print("Reading settings from:", filename)
                 data = json.load(json_file)
                 self.update(data)
 
+    @staticmethod
+    def get_data_filename(filename):
+        """ Returns the full path of filename, relative to DATA_PATH. Works both for the python script and for the
+            frozen executable. """
+        dir_path = ''
+        if getattr(sys, 'frozen', False):
+            dir_path = os.path.dirname(sys.executable)
+        elif __file__:
+            dir_path = os.path.dirname(os.path.realpath(__file__))
+        # normalized, because not every os resolves the '..' in filename when DATA_PATH doesn't exist in dir_path
+        return os.path.normpath(os.path.join(dir_path, DATA_PATH, filename))
+
     def is_setting_valid(self, setting_name):
         return setting_name in self and len(self[setting_name]) != 0
 
@@ -4,15 +4,28 @@ By Pino Sante
 Please credit me if you change, use or adapt this file.
 """
 
+import os
+
 DATA_PATH = 'data'
-SETTINGS_FILENAME = '..\\..\\..\\data\\settings.json'
-POP_SIZE = 20
+SETTINGS_FILENAME = os.path.join('..', '..', '..', 'data', 'settings.json')
+APPEARANCE_INDEX_FILENAME = os.path.join('..', '..', '..', 'data', 'appearance_index.json')
+GAUSSIAN_MODEL_FILENAME = os.path.join('..', '..', '..', 'data', 'gaussian_model.npz')
+THUMBNAIL_CACHE_PATH = os.path.join('..', '..', '..', 'data', 'thumbnail_cache')
+POP_SIZE = 20  # the population size of the app, which has a rating slot for every child in VAM
+MINIMAL_RATING_FOR_KEEP_ELITES = 2
+DEFAULT_MAX_KEPT_ELITES = 1
+DEFAULT_GAUSSIAN_SHRINKAGE = 0.0
 INITIAL_RATING = 3
+MIN_RATING = 1
+MAX_RATING = 5
+SAVED_CHILDREN_PATH = "VAM Evolutionary Character Creation"
+CHILDREN_FILENAME_PREFIX = "Evolutionary_Child_"
 MALE = 'Male'
 FEMALE = 'Female'
 FUTA = 'Futa'
 MAIN_SCRIPT_NAME = "VAM Evolutionary Character Creation.py"
 STORABLES = 'storables'
+APPEARANCE_FILENAME_PATTERN = 'Preset_*.vap'
 
 THUMBNAIL_SIZE = 184, 184
 NO_THUMBNAIL_FILENAME = "no_thumbnail.jpg"
@@ -31,6 +31,7 @@ from ..logic.tools import *
 from .population import Population
 
 from ..logic.vam_comm import VamComm
+from ..logic.job_runner import JobRunner
 
 class AppWindow(tk.Frame):
     def __init__(self, settings, generator):
@@ -40,6 +41,9 @@ class AppWindow(tk.Frame):
         self.settings = settings
         self.generator = generator
         self.vam_comm = VamComm(settings, self.master, self.execute_vam_command_callback)
+        self.job_runner = JobRunner(self.master.after)
+        self.deferred_vam_commands = list()
+        self.option_update_job = None
 
         self.subtitle_font = (DEFAULT_FONT, 11, 'bold')
         self.subtitle_padding = 1
@@ -119,8 +123,8 @@ class AppWindow(tk.Frame):
             if os.path.isfile(self.settings['child template']):
                 self.child_template_frame.child_template['label'].configure(
                     text=self.create_template_labeltext(self.settings['child template']))
-                self.child_template_frame.child_template['gender'] = get_appearance_gender(
-                    load_appearance(self.settings['child template']))
+                self.child_template_frame.child_template['gender'] = self.generator.appearances.get_gender(
+                    self.settings['child template'])
                 self.press_child_template_button(self.child_template_frame.child_template['gender'])
 
         if 'morph threshold' in self.settings:
@@ -157,6 +161,12 @@ class AppWindow(tk.Frame):
         if 'thumbnails per row' not in self.settings:
             self.settings['thumbnails per row'] = 5
 
+        if 'gaussian shrinkage' not in self.settings:
+            self.settings['gaussian shrinkage'] = DEFAULT_GAUSSIAN_SHRINKAGE
+
+        # keep the library up to date with the presets saved while the app runs
+        self.master.after(LIBRARY_REFRESH_INTERVAL, self.refresh_library)
+
         if 'generation counter' in self.settings:
             gc = self.settings["generation counter"]
             answer = messagebox.askquestion('Continue last session?',
@@ -196,10 +206,19 @@ Do you want to continue that session?""")
             self.options_frame.recursive_directory_search_no_button.configure(relief=tk.SUNKEN)
         self.options_frame.recursive_directory_search_yes_button.update()
         self.options_frame.recursive_directory_search_no_button.update()
-        self.generator.clear_data_with_all_appearances()
         self.generator.fill_data_with_all_appearances()
         self.update_found_labels()
 
+    def refresh_library(self):
+        """ Picks up the appearances which were added, changed or removed in the appearance directory, for instance
+            presets saved from VAM during the session. Runs every LIBRARY_REFRESH_INTERVAL ms, but not while a
+            population is being generated. """
+        if not self.job_runner.is_running() and self.generator.refresh_appearances():
+            if self.generator.gen_counter == 0:  # the found labels are only shown in the initialization step
+                self.update_found_labels()
+                self.update_initialize_population_button()
+        self.master.after(LIBRARY_REFRESH_INTERVAL, self.refresh_library)
+
     def press_child_template_button(self, gender):
         """ Sinks the GUI button for the gender chosen/pressed (female, male, futa) and raises the other buttons. """
         all_genders = ['Female', 'Male', 'Futa']
@@ -213,59 +232,56 @@ Do you want to continue that session?""")
         """ Returns a formatted label text for a given Appearance file with
             PATH_TO/NAME_OF_APPEARANCE.vap as format """
 
-        template_gender = get_appearance_gender(load_appearance(filename))
+        template_gender = self.generator.appearances.get_gender(filename)
         label_txt = os.path.basename(filename)[7:-4]
         self.child_template_frame.child_template['gender'] = template_gender
         return label_txt
 
     def track_threshold_change(self, var, index, mode):
         """ Keeps track if the user changes the morph threshold value in the GUI.
-            If so, validity of the entry is checked. GUI is also updated depending
-            on validity, using update_XYZ calls """
+            If so, validity of the entry is checked. GUI is updated depending on validity
+            with schedule_option_update() """
         string = self.options_frame.threshold_entry.get()
         try:
             value = float(string)
             if 0.0 <= value < 1.0:
                 self.settings['morph threshold'] = value
-                self.update_found_labels()
-                self.update_initialize_population_button()
-            else:
-                if 'morph threshold' in self.settings:
-                    del self.settings['morph threshold']
-                self.update_found_labels()
-                self.update_initialize_population_button()
-                return
+            elif 'morph threshold' in self.settings:
+                del self.settings['morph threshold']
         except ValueError:
             if 'morph threshold' in self.settings:
                 del self.settings['morph threshold']
-            self.update_found_labels()
-            self.update_initialize_population_button()
-            return
-
-        for i in range(1, POP_SIZE + 1):
-            self.update_morph_info(i)
+        self.schedule_option_update()
 
     def track_min_morph_change(self, var, index, mode):
         """ Keeps track if the user changes the min morph value in the GUI.
-            If so, validity of the entry is checked. GUI is also updated depending
-            on validity, using update_XYZ calls """
+            If so, validity of the entry is checked. GUI is updated depending on validity
+            with schedule_option_update() """
         string = self.options_frame.min_morph_entry.get()
         try:
             value = int(string)
             self.settings['min morph threshold'] = value
-
-            # also update the morph info on Chosen Files
-            for i in range(1, POP_SIZE + 1):
-                self.update_morph_info(i)
-            self.update_found_labels()
-            self.update_initialize_population_button()
-
         except ValueError:
             if 'min morph threshold' in self.settings:
                 del self.settings['min morph threshold']
-            self.update_found_labels()
-            self.update_initialize_population_button()
-            return
+        self.schedule_option_update()
+
+    def schedule_option_update(self):
+        """ Updates the GUI for the changed options OPTION_UPDATE_DELAY ms after the last key press, so typing in the
+            options stays responsive """
+        if self.option_update_job is not None:
+            self.master.after_cancel(self.option_update_job)
+        self.option_update_job = self.master.after(OPTION_UPDATE_DELAY, self.apply_option_update)
+
+    def apply_option_update(self):
+        """ Updates the morph info on Chosen Files, the found labels and the Initialize Population button for the
+            current options """
+        self.option_update_job = None
+        if 'morph threshold' in self.settings and 'min morph threshold' in self.settings:
+            for i in range(1, POP_SIZE + 1):
+                self.update_morph_info(i)
+        self.update_found_labels()
+        self.update_initialize_population_button()
 
     def update_found_labels(self):
         """ Depending on the choice for the source files, updates the GUI """
@@ -356,7 +372,7 @@ Do you want to continue that session?""")
         c = self.population.get_chromosome(number)
         c.filename = ''
         c.short_filename = ''
-        c.appearance = None
+        c.morph_list = None
         c.file_name_display.configure(text=NO_FILE_SELECTED_TEXT)
         c.can_load = False
 
@@ -384,7 +400,6 @@ Do you want to continue that session?""")
                                                     MAX_VAMDIR_STRING_LENGTH))
             self.vam_dir_frame.vam_dir_button.configure(relief=tk.SUNKEN)
             self.track_min_morph_change("", "", "")  # update
-            self.generator.clear_data_with_all_appearances()
             self.generator.fill_data_with_all_appearances()
         else:
             self.settings['VAM base dir'] = ""
@@ -417,7 +432,6 @@ Do you want to continue that session?""")
                                                     MAX_APPEARANCEDIR_STRING_LENGTH))
             self.appearance_dir_frame.appearance_dir_button.configure(relief=tk.SUNKEN)
             self.track_min_morph_change("", "", "")  # update
-            self.generator.clear_data_with_all_appearances()
             self.generator.fill_data_with_all_appearances()
         self.update_initialize_population_button()
         self.update_found_labels()
@@ -462,7 +476,7 @@ Do you want to continue that session?""")
     def update_gui_file(self, number, filename):
         """ Updates the Parent file with 'number' with all information available through the 'filename' """
         if filename in self.generator.appearances:
-            self.population.get_chromosome(number).update_gui_file(filename, self.generator.appearances[filename])
+            self.population.get_chromosome(number).update_gui_file(filename)
 
     def select_template_file(self, gender_list, title):
         """ Called by the Female, Male and Futa load template file buttons. Opens a file selection dialogue which
@@ -484,7 +498,7 @@ Do you want to continue that session?""")
             self.update_found_labels()
             return
         self.child_template_frame.child_template['label'].configure(text=self.create_template_labeltext(filename))
-        self.child_template_frame.child_template['gender'] = self.generator.gender[filename]
+        self.child_template_frame.child_template['gender'] = self.generator.appearances.get_gender(filename)
         self.press_child_template_button(self.child_template_frame.child_template['gender'])
         self.settings['child template'] = filename
         for i in range(1, POP_SIZE + 1):
@@ -496,6 +510,8 @@ Do you want to continue that session?""")
         """ Called by the change template button in the rating windows. Opens a file selection dialogue which
             specifically filters for the gender of the template which is currently being used. If user does not
             select a valid new template file, the old template file is used. """
+        if self.job_runner.is_running():
+            return
         dialog = SelectAppearanceDialog(self.settings, self.generator)
         filename = dialog.file_selection_with_thumbnails(
             matching_genders(self.child_template_frame.child_template['gender']), title,
@@ -513,7 +529,7 @@ Do you want to continue that session?""")
         self.vam_comm.broadcast_message_to_vam_rating_blocker("Updating...\nPlease Wait")
         # we need to check if the chosen gender matches the gender of the current population (for example:
         # we can't suddenly switch from a male population to a female population or vice versa).
-        gender = get_appearance_gender(load_appearance(filename))
+        gender = self.generator.appearances.get_gender(filename)
         if not is_compatible_gender(gender, self.child_template_frame.child_template['gender']):
             matches = matching_genders(self.child_template_frame.child_template['gender'])
             if len(matches) > 1:  # Female and Futa
@@ -558,58 +574,52 @@ Do you want to continue that session?""")
 
     def variate_population_with_templates(self):
         """ Replaces all the chromosomes in the population with a randomly chosen templates from all the available
-            templates """
+            templates. The files are written by a job in a worker thread. """
         print('variate_population_with_templates')
         self.vam_comm.broadcast_message_to_vam_rating_blocker('Updating...\nPlease Wait')
 
         filenames = list(self.generator.appearances.keys())
         random.shuffle(filenames)
-        filename_generator = generate_list_element(filenames)
-
-        appearance_templates = list()
-        for filename in filename_generator:
-            if len(appearance_templates) >= POP_SIZE:
-                break
-            appearance = load_appearance(filename)
-            gender = get_appearance_gender(appearance)
-            if gender == self.child_template_frame.child_template['gender']:
-                appearance_templates.append(appearance)
-
-        for c in self.population.chromosomes:
-            morph_list = get_morph_list_from_appearance(load_appearance(c.filename))
-            updated_appearance = save_morph_to_appearance(morph_list, appearance_templates[c.index])
-            nude_appearance = remove_clothing_from_appearance(updated_appearance)
-            save_appearance(nude_appearance, c.filename)
-
-        self.vam_comm.broadcast_message_to_vam_rating_blocker('')
+        template_gender = self.child_template_frame.child_template['gender']
+        morph_lists = [c.morph_list for c in self.population.chromosomes]
+        child_filenames = [c.filename for c in self.population.chromosomes]
+
+        def work(job):
+            progress = job.get_progress_callback('Variating Population\nPlease be patient!')
+            appearance_templates = list()
+            for filename in generate_list_element(filenames):
+                if len(appearance_templates) >= POP_SIZE:
+                    break
+                gender = self.generator.appearances.get_gender(filename)
+                if gender == template_gender:
+                    appearance_templates.append(self.generator.appearances.get_appearance(filename))
+                    job.check_cancelled()
+            for i, (morph_list, template, child_filename) in enumerate(zip(morph_lists, appearance_templates,
+                                                                           child_filenames)):
+                progress(i, len(appearance_templates))
+                updated_appearance = save_morph_to_appearance(morph_list, template)
+                nude_appearance = remove_clothing_from_appearance(updated_appearance)
+                save_appearance(nude_appearance, child_filename)
+
+        self.run_generation_job(work, lambda result: self.vam_comm.broadcast_message_to_vam_rating_blocker(''))
 
     def update_population_with_new_template(self):
         """ Replaces the template of all the current Children with the new one but keeps the morphs values the same. """
-        template_appearance = load_appearance(self.settings['child template'])
+        self.generator.child_template.load(self.settings['child template'])
         for c in self.population.chromosomes:
-            morph_list = get_morph_list_from_appearance(load_appearance(c.filename))
-            updated_appearance = save_morph_to_appearance(morph_list, template_appearance)
-            save_appearance(updated_appearance, c.filename)
+            save_appearance_data(self.generator.child_template.render(c.morph_list), c.filename)
 
     def filter_filename_list_on_morph_threshold_and_min_morphs(self, filenames):
         """ For a given list of filenames returns a list of filenames which meet the morph and min morph thresholds.
             Returns an empty list if neither of these settings are available. """
-        # todo: to logic
-
         if 'morph threshold' not in self.settings:
             return list()
 
         if 'min morph threshold' not in self.settings:
             return list()
 
-        filtered = list()
-        for f in filenames:
-            appearance = self.generator.appearances[f]
-            morph_list = get_morph_list_from_appearance(appearance)
-            morph_list = filter_morphs_below_threshold(morph_list, self.settings['morph threshold'])
-            if len(morph_list) > self.settings['min morph threshold']:
-                filtered.append(f)
-        return filtered
+        return self.generator.appearances.filter_on_morph_count(filenames, self.settings['morph threshold'],
+                                                                self.settings['min morph threshold'])
 
     def update_morph_info(self, number):
         """ Updates morph info in the GUI for Parent file 'number'. """
@@ -627,16 +637,14 @@ Do you want to continue that session?""")
 
         c = self.population.get_chromosome(number)
         if c.filename != '':
-            gender = get_appearance_gender(load_appearance(c.filename))
+            gender = self.generator.appearances.get_gender(c.filename)
             if not is_compatible_gender(gender, template_gender):
                 self.hide_parent_file_from_view(
                     number)  # hide, but don't delete, in case template later has matching gender
                 return
 
-            morph_list_tmp = copy.deepcopy(get_morph_list_from_appearance(c.appearance))
-            morph_list_tmp = filter_morphs_below_threshold(morph_list_tmp, threshold)
-            number_of_morphs = str(len(morph_list_tmp))
-            if int(number_of_morphs) < self.settings['min morph threshold']:
+            number_of_morphs = self.generator.appearances.count_morphs_above_threshold(c.filename, threshold)
+            if number_of_morphs < self.settings['min morph threshold']:
                 if self.generator.gen_counter == 0:  # only do this in the initialization selection step
                     self.hide_parent_file_from_view(number)
                     return
@@ -660,7 +668,8 @@ Do you want to continue that session?""")
     def restart_population(self, method):
         """ Reinitializes the population. Can be called whenver the app is in the rating mode.
             Generation counter is reset to 1. """
-        # todo: split into GUI and BL
+        if self.job_runner.is_running():
+            return
         print(f'Restarting, with {method}')
         self.vam_comm.broadcast_message_to_vam_rating_blocker('Updating...\nPlease Wait')
 
@@ -677,60 +686,150 @@ Do you want to continue that session?""")
                     if len(self.settings[filename]) > 0:
                         c.filename = self.settings[filename]
 
-        if method == 'Gaussian Samples':
-            self.gaussian_initialize_population(source_files=self.settings['source files'])
-        elif method == "Random Crossover":
-            self.crossover_initialize_population(self.settings['source files'])
-        self.generator.gen_counter = 1
-        self.title_frame.title_label.configure(text="Generation " + str(self.generator.gen_counter))
-        self.population.reset_ratings()
-        self.vam_comm.broadcast_message_to_vam_rating_blocker("")
+        def finish():
+            self.generator.gen_counter = 1
+            self.title_frame.title_label.configure(text="Generation " + str(self.generator.gen_counter))
+            self.population.reset_ratings()
+            self.vam_comm.broadcast_generation_number_to_vam(self.generator.gen_counter)
+            self.vam_comm.broadcast_message_to_vam_rating_blocker("")
+
+        self.initialize_population(method, finish)
 
     def generate_next_population(self, method):
         """ Generates the next population. Switches GUI layout to the Ratings layout when called for the first time
-            (self.generator.gencounter == 0). Updates the population in the GUI through self.update_population(). """
-        # todo: split to put stuff ino logic
+            (self.generator.gencounter == 0). The population is created and saved by a job in a worker thread, and
+            the population in the GUI is updated through self.update_population() when the job is done. If a job
+            is running already, it is cancelled instead. """
         print(method)
+        if self.job_runner.is_running():
+            self.job_runner.cancel()
+            return
         if self.generator.gen_counter == 0:
             self.settings.save()  # in case of a bug we want to have the settings saved before we start the algorithm
-            if method == 'Gaussian Samples':
-                self.gaussian_initialize_population(source_files=self.settings['source files'])
-            elif method == 'Random Crossover':
-                self.crossover_initialize_population(self.settings['source files'])
-            self.change_parent_to_generation_display()
-            self.switch_layout_to_rating()
-            self.population.reset_ratings()
-            self.change_gui_to_show_user_to_start_vam()
-            self.vam_comm.scan_vam_for_command_updates('Initialize')
+            self.initialize_population(method, self.finish_first_population)
             return
 
         self.vam_comm.broadcast_message_to_vam_rating_blocker('Updating...\nPlease Wait')
 
-        # Start the new population with the elites from the last generation (depending on settings)
-        elites = self.get_elites_from_population()
-
-        # Save elite appearances over child template (we do this, becau^1se the user might have changed the template
-        # file)
-        elite_morph_lists = [get_morph_list_from_appearance(appearance) for appearance in elites if appearance]
-        template_appearance = load_appearance(self.settings['child template'])
-        new_population = [save_morph_to_appearance(elite_morph_list, template_appearance)
-                          for elite_morph_list in elite_morph_lists]
-
-        for i in range(POP_SIZE - len(new_population)):
-            random_parents = self.population.weighted_random_selection()
-            child_appearance = fuse_characters(random_parents[0].filename, random_parents[1].filename,
-                                               self.settings)
-            new_population.append(child_appearance)
-        self.save_population(new_population)
-        self.update_population(new_population)
+        parent_morph_lists = [c.morph_list for c in self.population.chromosomes]
+        ratings = [c.rating for c in self.population.chromosomes]
+
+        def work(job):
+            # The new population starts with the elites from the last generation (depending on settings), which are
+            # saved over the child template as well (we do this, because the user might have changed the template
+            # file)
+            progress = job.get_progress_callback('Generating Population\nPlease be patient!')
+            new_population = self.generator.engine.create_next_population(parent_morph_lists, ratings, POP_SIZE,
+                                                                          progress)
+            job.check_cancelled()
+            self.save_population(new_population)
+            return new_population
+
+        self.run_generation_job(work, self.finish_next_population)
+
+    def finish_first_population(self):
+        """ Switches to the rating layout, after the first population has been saved """
+        self.change_parent_to_generation_display()
+        self.switch_layout_to_rating()
+        self.population.reset_ratings()
+        self.change_gui_to_show_user_to_start_vam()
+        self.vam_comm.scan_vam_for_command_updates('Initialize')
 
+    def finish_next_population(self, new_population):
+        """ Updates the GUI and hands control back to VAM, after the next population has been saved """
+        self.update_population(new_population)
         self.generator.gen_counter += 1
         self.settings['generation counter'] = self.generator.gen_counter
         self.title_frame.title_label.configure(text=f'Generation {self.generator.gen_counter}')
         self.population.reset_ratings()
+        self.generate_children_frame.display_ready_for_new_generation()
+        self.vam_comm.broadcast_generation_number_to_vam(self.generator.gen_counter)
         self.vam_comm.broadcast_message_to_vam_rating_blocker('')
         self.settings.save()
 
+    def initialize_population(self, method, on_done):
+        """ Starts a job which creates and saves the first population with method. When the population is saved, the
+            GUI is updated and on_done() is called. """
+        source_files = self.settings['source files']
+        filenames = self.select_appearances_strategies[source_files]()
+        print(f"Source files: {source_files} ({len(filenames)} Files)")
+        template_gender = self.generator.appearances.get_gender(self.settings['child template'])
+
+        def work(job):
+            progress = job.get_progress_callback('Generating Population\nPlease be patient!')
+            new_population = self.generator.engine.initialize_population(method, filenames, POP_SIZE,
+                                                                         template_gender, progress)
+            job.check_cancelled()
+            self.save_population(new_population)
+            return new_population
+
+        def finish(new_population):
+            self.generator.gen_counter += 1
+            self.update_population(new_population)
+            self.generate_children_frame.display_ready_for_new_generation()
+            on_done()
+
+        self.run_generation_job(work, finish)
+
+    def get_setup_widgets(self):
+        """ Returns the widgets which change the settings, the library or the child template """
+        widgets = [self.vam_dir_frame.vam_dir_button, self.appearance_dir_frame.appearance_dir_button,
+                   self.options_frame.threshold_entry, self.options_frame.min_morph_entry,
+                   self.options_frame.max_kept_elites_entry, self.options_frame.recursive_directory_search_yes_button,
+                   self.options_frame.recursive_directory_search_no_button,
+                   self.source_files_frame.all_appearances_button, self.source_files_frame.all_favorites_button,
+                   self.source_files_frame.choose_files_button, self.method_frame.gaussian_button,
+                   self.method_frame.random_cross_over_button]
+        widgets.extend(self.child_template_frame.child_template_button.values())
+        widgets.extend(c.file_button for c in self.population.chromosomes if c.file_button is not None)
+        for name in ('title_restart_button', 'change_template_button'):
+            if hasattr(self, name):
+                widgets.append(getattr(self, name))
+        return widgets
+
+    def set_setup_widgets_state(self, state):
+        """ Enables (tk.NORMAL) or disables (tk.DISABLED) the setup widgets. They are disabled while a job runs,
+            because the job reads the settings, the appearance store and the child template from its worker
+            thread. """
+        for widget in self.get_setup_widgets():
+            if widget.winfo_exists():
+                widget.configure(state=state)
+
+    def run_generation_job(self, work, on_done):
+        """ Runs work in the job runner, showing its progress on the generate button. Clicking the button while the
+            job runs cancels it. VAM commands that arrive while the job runs are executed after it. The setup widgets
+            are disabled while the job runs. """
+        def on_progress(text):
+            self.generate_children_frame.display_progress(text + '\n(click to cancel)')
+            self.vam_comm.broadcast_message_to_vam_rating_blocker(text)
+
+        def on_end(callback, *args):
+            self.set_setup_widgets_state(tk.NORMAL)
+            if callback is not None:
+                callback(*args)
+            commands, self.deferred_vam_commands = self.deferred_vam_commands, list()
+            for command in commands:
+                self.execute_vam_command_callback(command)
+
+        def on_cancelled():
+            print('Generating the population was cancelled, nothing was saved.')
+            self.generate_children_frame.display_ready_for_new_generation()
+            # a reset already told VAM about the new generation, which is not there now
+            self.vam_comm.broadcast_generation_number_to_vam(self.generator.gen_counter)
+            self.vam_comm.broadcast_message_to_vam_rating_blocker('')
+
+        def on_error(exception):
+            self.generate_children_frame.display_ready_for_new_generation()
+            self.vam_comm.broadcast_generation_number_to_vam(self.generator.gen_counter)
+            self.vam_comm.broadcast_message_to_vam_rating_blocker(f'Failure: {exception}')
+
+        on_progress('Generating Population\nPlease be patient!')
+        self.set_setup_widgets_state(tk.DISABLED)
+        self.job_runner.start(work, lambda result: on_end(on_done, result),
+                              on_progress=on_progress,
+                              on_cancelled=lambda: on_end(on_cancelled),
+                              on_error=lambda e: on_end(on_error, e))
+
     def change_gui_to_show_user_to_start_vam(self):
         """ After initialization this method is called, to remove all the setup widgets and replace them with a window
             asking the user to load the VAM Companion Save. """
@@ -758,13 +857,10 @@ Do you want to continue that session?""")
     def continue_last_session(self):
         """ Skip choosing the settings and continue from the last session. This only means switching the layout to
             the rating window and setting the generation counter to the last known value. """
-        path = self.settings.get_vam_default_appearance_path()
-        save_path = os.path.join(path, SAVED_CHILDREN_PATH)
-
-        for c in self.population.chromosomes:
-            filename = os.path.join(save_path, f'Preset_{CHILDREN_FILENAME_PREFIX}{c.index}.vap')
+        filenames, population = self.generator.load_population(len(self.population.chromosomes))
+        for c, filename, morph_list in zip(self.population.chromosomes, filenames, population):
             c.filename = filename
-            c.appearance = load_appearance(filename)
+            c.morph_list = morph_list
 
         self.change_parent_to_generation_display()
         self.switch_layout_to_rating()
@@ -782,6 +878,11 @@ Do you want to continue that session?""")
             or
                 "Generate Next Population"
             """
+        if self.job_runner.is_running():
+            # the population is being generated, the command is executed when that is done
+            self.deferred_vam_commands.append(command)
+            return
+
         if self.generator.connected_to_VAM:
             # add command to last five commands
             command_dict = {}
@@ -817,14 +918,14 @@ Do you want to continue that session?""")
             self.population.reset_ratings()
             self.switch_layout_to_overview()
         elif 'generate next population' in commands[0].lower():
+            # the generation number is sent to VAM when the new population is saved
             self.generate_next_population(self.settings['method'])
-            self.vam_comm.broadcast_generation_number_to_vam(self.generator.gen_counter)
         elif 'reset' in commands[0].lower():
-            # in the case of a reset we immediately send the "Reset" command back to VAM to avoid a
-            # "Connection Lost" in VAM, since the initialization of a new generation (with the Gaussian Method)
-            # takes more than the 5 second Connection-check-timeout in VAM.
-            self.press_restart_button(give_warning=False)
-            self.vam_comm.broadcast_generation_number_to_vam(self.generator.gen_counter)
+            # the population is generated in a worker thread, so the app keeps answering VAM and there is no
+            # "Connection Lost" in VAM while the new generation is initialized. Like before, the reset is answered
+            # right away with the generation it restarts at, so the companion does not show the old generation.
+            if self.press_restart_button(give_warning=False):
+                self.vam_comm.broadcast_generation_number_to_vam(1)
 
         if self.generator.connected_to_VAM:
             self.update_overview_window()
@@ -842,42 +943,13 @@ Do you want to continue that session?""")
         self.favorites_frame.grid_remove()
         self.options_frame.grid_remove()
 
-    def get_elites_from_population(self):
-        """ Returns the children appearances where the rating is the maximum rating that the user selected.
-            If the maximum selected rating is lower than MINIMAL_RATING_FOR_KEEP_ELITES, then no appearances are
-            returned. Returns a maximum of appearances equal to user setting 'max kept elites'. """
-        # todo: candidate for logic
-
-        max_selected_rating = max(c.rating for c in self.population.chromosomes)
-        if max_selected_rating < MINIMAL_RATING_FOR_KEEP_ELITES:
-            return list()
-
-        # Select all appearances with maximum rating.
-        appearances_with_maximum_rating = [c.appearance for c in self.population.chromosomes
-                                           if c.rating == max_selected_rating]
-
-        # Limit the list of appearances to a maximum of 'max kept elites' elements and return it.
-        return appearances_with_maximum_rating[:self.settings['max kept elites']]
-
     def get_appearance_filenames(self, get_only_favorites):
         """ Returns a list of all appearance files in the default VAM Appearance directory, after gender and morph
             filters are applied. """
-        filenames = list()
-        if get_only_favorites:
-            filenames = [f for f, app in self.generator.appearances.items() if is_favorite(app)]
-        else:
-            filenames = list(self.generator.appearances.keys())
-        filenames = [f for f in filenames if CHILDREN_FILENAME_PREFIX not in f]
-
-        if 'gender' in self.child_template_frame.child_template:
-            filenames = self.generator.filter_filename_list_on_genders(filenames,
-                                                                       matching_genders(
-                                                                           self.child_template_frame.child_template[
-                                                                               'gender']))
-            filtered = self.filter_filename_list_on_morph_threshold_and_min_morphs(filenames)
-        else:
-            filtered = []
-        return filtered
+        if 'gender' not in self.child_template_frame.child_template:
+            return list()
+        return self.generator.get_parent_filenames(self.child_template_frame.child_template['gender'],
+                                                   get_only_favorites)
 
     def get_all_appearance_filenames(self):
         # todo: candidate for logic
@@ -892,83 +964,17 @@ Do you want to continue that session?""")
         self.filter_filename_list_on_morph_threshold_and_min_morphs(filenames)
         return filenames
 
-    def crossover_initialize_population(self, source_files):
-        """ Initializes the population using random crossover between all Parent files. Only used for initialization.
-            Updates population info and the GUI. """
-        print('Using random pairwise chromosome crossover for sample initialization.')
-        parent_filenames = self.select_appearances_strategies[source_files]()
-        print(f'Source files: {source_files} ({len(parent_filenames)} Files)')
-        new_population = list()
-        for i in range(1, POP_SIZE + 1):
-            random_parents = random.sample(parent_filenames, 2)
-            child_appearance = fuse_characters(random_parents[0], random_parents[1], self.settings)
-            new_population.append(child_appearance)
-        self.save_population(new_population)
-        self.generator.gen_counter += 1
-        self.update_population(new_population)
-        self.generate_children_frame.display_ready_for_new_generation()
-
-    def gaussian_initialize_population(self, source_files):
-        # todo: split the UI and the BL parts
-        """ Initializes the population using Gaussian Samples based on all Parent files. Only used for initialization.
-            Updates population info and the GUI. """
-        print('Using random samples from multivariate gaussian distribution for initialization.')
-        self.generate_children_frame.display_progress('Generating Population\n Please be patient!\n')
-
-        # select source files
-        filenames = self.select_appearances_strategies[source_files]()
-        appearances = [self.generator.appearances[f] for f in filenames]
-        print(f"Source files: {source_files} ({len(appearances)} Files)")
-        morph_lists = [get_morph_list_from_appearance(appearance) for appearance in appearances]
-        morph_names = get_all_morph_names_in_morph_lists(morph_lists)
-        morph_lists = pad_morph_names_to_morph_lists(morph_lists, morph_names, filenames)
-        morph_lists = dedupe_morphs(morph_lists)
-        means = get_means_from_morphlists(morph_lists)
-        means = list(means.values())
-        covariances = get_cov_from_morph_lists(morph_lists)
-        new_population = list()
-        template_file = self.settings['child template']
-        threshold = self.settings['morph threshold']
-
-        for i in range(1, POP_SIZE + 1):
-            text = f'Generating Population\nPlease be patient!\n({i}/{POP_SIZE})'
-            self.generate_children_frame.display_progress(text)
-            self.vam_comm.broadcast_message_to_vam_rating_blocker(text)
-
-            sample = np.random.default_rng().multivariate_normal(means, covariances)
-            sample = [str(x) for x in sample]
-            new_morph_list = copy.deepcopy(morph_lists[0])
-            for j, morph in enumerate(new_morph_list):
-                morph['value'] = sample[j]
-            new_morph_list = filter_morphs_below_threshold(new_morph_list, threshold)
-            child_appearance = load_appearance(template_file)
-            print('Using as appearance template:', template_file)
-            child_appearance = save_morph_to_appearance(new_morph_list, child_appearance)
-            new_population.append(child_appearance)
-
-        self.save_population(new_population)
-        self.generator.gen_counter += 1
-        self.update_population(new_population)
-        self.generate_children_frame.display_ready_for_new_generation()
-        return
-
     def save_population(self, population):
-        """ save a population list of child appearances to files """
-        path = self.settings.get_vam_default_appearance_path()
-        save_path = os.path.join(path, SAVED_CHILDREN_PATH)
-        pathlib.Path(save_path).mkdir(parents=True, exist_ok=True)
-        for i, child_appearance in enumerate(population):
-            save_filename = os.path.join(save_path, 'Preset_' + CHILDREN_FILENAME_PREFIX + str(i + 1) + '.vap')
-            save_appearance(child_appearance, save_filename)
-        return True
+        """ save a population list of child morph lists to files, using the child template as appearance """
+        return self.generator.save_population(population)
 
-    def update_population(self, new_appearances):
-        """ update all chromosome appearances with the list of child appearance in population """
+    def update_population(self, new_morph_lists):
+        """ update all chromosome morph lists with the list of child morph lists in population """
         path = self.settings.get_vam_default_appearance_path()
         save_path = os.path.join(path, SAVED_CHILDREN_PATH)
         pathlib.Path(save_path).mkdir(parents=True, exist_ok=True)
-        for chromosome, appearance in zip(self.population.chromosomes, new_appearances):
-            chromosome.update_appearance(appearance, save_path)
+        for chromosome, morph_list in zip(self.population.chromosomes, new_morph_lists):
+            chromosome.update_morph_list(morph_list, save_path)
 
     def change_parent_to_generation_display(self):
         """ Changes the Parent """
@@ -999,6 +1005,8 @@ Do you want to continue that session?""")
             c.initialize_rating_buttons(self.parent_selection_frame)
 
     def press_restart_button(self, give_warning=True):
+        if self.job_runner.is_running():
+            return False
         if give_warning:
             answer = messagebox.askquestion('Warning!',
                                             'Warning! This will reset all your current progress, ' +
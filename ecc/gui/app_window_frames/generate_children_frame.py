@@ -24,11 +24,9 @@ class GenerateChildrenFrame(tk.Frame):
     def display_ready_for_new_generation(self):
         self.generate_children_button.configure(bg='lightgreen', text='')
         self.generate_children_button.configure(text='Generate Next Population')
-        self.generate_children_button.update()
 
     def display_progress(self, text):
         self.generate_children_button.configure(text=text, bg='red')
-        self.generate_children_button.update()
 
 
 if __name__ == '__main__':
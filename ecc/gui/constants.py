@@ -11,10 +11,13 @@ CHOOSE_FILES_TEXT = "Choose Files"
 ICON_FILENAME = "VAM Evolutionary Character Creation.ico"
 APP_TITLE = "VAM Evolutionary Character Creation by Pino Sante"
 NO_FILE_SELECTED_TEXT = "…"
-SAVED_CHILDREN_PATH = "VAM Evolutionary Character Creation"
-CHILDREN_FILENAME_PREFIX = "Evolutionary_Child_"
-MINIMAL_RATING_FOR_KEEP_ELITES = 2
-DEFAULT_MAX_KEPT_ELITES = 1
+THUMBNAIL_POLL_INTERVAL = 20  # ms between two checks for thumbnails that finished loading
+THUMBNAIL_CELL_WIDTH = 190
+THUMBNAIL_CELL_HEIGHT = 208
+THUMBNAIL_GRID_OVERSCAN_ROWS = 1
+FILE_FILTER_DELAY = 150  # ms after the last key press before the file filter is applied
+OPTION_UPDATE_DELAY = 150  # ms after the last key press in the options before the GUI is updated
+LIBRARY_REFRESH_INTERVAL = 1000  # ms between two checks for changes in the appearance directory
 DEFAULT_FONT = "Calibri"
 FILENAME_FONT = ("Courier", 9)
 BG_COLOR = "#F9F9F9"
@@ -33,8 +36,6 @@ RATING_HOVER_BG_COLOR = BUTTON_BG_COLOR
 RATING_HOVER_FG_COLOR = BUTTON_FG_COLOR
 RATING_ACTIVE_BG_COLOR = BUTTON_BG_COLOR
 RATING_ACTIVE_FG_COLOR = BUTTON_FG_COLOR
-MIN_RATING = 1
-MAX_RATING = 5
 RATING_FONT_SIZE = 13
 
 FOREGROUND = 'foreground'
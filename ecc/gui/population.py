@@ -5,7 +5,6 @@ Please credit me if you change, use or adapt this file.
 """
 
 import os
-import random
 
 import tkinter as tk
 from .constants import *
@@ -18,7 +17,7 @@ class Chromosome:
         # data -- todo: decide if indices should be start with 0 or with 1
         self.index = index
         self.settings = settings
-        self.appearance = None
+        self.morph_list = None
         self.rating = INITIAL_RATING
         # file access
         self.filename = ''
@@ -48,11 +47,10 @@ class Chromosome:
         self.n_morph_display.grid(row=row, column=2, sticky=tk.W)
         self.can_load = False
 
-    def update_gui_file(self, filename, appearance):
+    def update_gui_file(self, filename):
         self.filename = filename
         self.short_filename = os.path.basename(filename)[7:-4]  # remove Preset_ and .vap
         self.file_name_display.configure(text=self.short_filename)
-        self.appearance = appearance
         self.can_load = True
 
     def destroy_ui(self):
@@ -114,8 +112,8 @@ class Chromosome:
             new_rating_button.bind('<Leave>', lambda r=j: self.on_leave_rating_button(r))
             self.rating_buttons.append(new_rating_button)
 
-    def update_appearance(self, appearance, filename):
-        self.appearance = appearance
+    def update_morph_list(self, morph_list, filename):
+        self.morph_list = morph_list
         self.filename = os.path.join(filename, f'Preset_{CHILDREN_FILENAME_PREFIX}{self.index + 1}.vap')
 
     def select_file(self, select_file_callback):
@@ -130,29 +128,11 @@ class Population:
 
     def get_chromosome(self, index):
         """index is one-based, but chromosomes are inside a zero-based list"""
-        assert 1 <= index <= POP_SIZE
+        assert 1 <= index <= len(self.chromosomes)
         c = self.chromosomes[index - 1]
         assert c.index == index - 1
         return c
 
-    def weighted_random_selection(self):
-        """ using roulette wheel selection, returns a randomly (weighted by rating) chosen appearance from the
-            population
-            reference: https://stackoverflow.com/questions/10324015/fitness-proportionate-selection-roulette-wheel-selection-in-python
-            """
-        total_ratings = sum([c.rating for c in self.chromosomes])
-        choices = []
-        while len(choices) < 2:
-            pick = random.uniform(0, total_ratings)
-            current = 0
-            for c in self.chromosomes:
-                current += c.rating
-                if current > pick:
-                    if c not in choices:
-                        choices.append(c)
-                    break
-        return choices
-
     def reset_ratings(self):
         """ Clear all ratings in the GUI. """
         for c in self.chromosomes:
@@ -11,6 +11,7 @@ import tkinter as tk
 from tkinter import ttk
 
 from .constants import *
+from .thumbnail_grid import ThumbnailGrid
 from ..common.utility import *
 
 
@@ -35,6 +36,10 @@ class SelectAppearanceDialog(tk.Frame):
             AppWindow window until a choice is made, or the file selection window is closed. Clicking on an image button
             calls end_file_selection_with_thumbnails(). """
         self._file_selection = ""
+        self.search_index = self.generator.get_search_index()
+        self.filter_text = None
+        self.filter_result = None
+        self.filter_job = None
 
         self.thumbnails_per_row = self.settings['thumbnails per row']
 
@@ -55,28 +60,20 @@ class SelectAppearanceDialog(tk.Frame):
         self.file_selection_popup.iconbitmap(os.path.join(DATA_PATH, ICON_FILENAME))
         self.file_selection_popup.grab_set()
 
-        #
-        # Start of scrollbar hack in Tkinter
-        #
         canvasholdingframe = tk.Frame(self.file_selection_popup, bg=BG_COLOR)
         canvasholdingframe.pack(fill=tk.BOTH, expand=1)
         self.my_canvas = tk.Canvas(canvasholdingframe, bg=BG_COLOR)
         self.my_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=1)
         my_scrollbar = ttk.Scrollbar(canvasholdingframe, orient=tk.VERTICAL, command=self.my_canvas.yview)
         my_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.my_canvas.configure(yscrollcommand=my_scrollbar.set)
-        self.my_canvas.bind('<Configure>', lambda e: self.my_canvas.configure(scrollregion=self.my_canvas.bbox("all")))
         self.my_canvas.bind_all('<MouseWheel>', lambda e: self.my_canvas.yview_scroll(int(-1 * e.delta / 120), "units"))
         self.my_canvas.bind_all('<Escape>', lambda e: self.file_selection_popup.destroy())
 
-        # we basically have a canvas for the scrollbar, and put this frame in it
-        self.appearancesframe = tk.Frame(self.my_canvas, bg=BG_COLOR)
-        self.my_canvas.create_window((0, 0), window=self.appearancesframe, anchor="nw")
-        #
-        # End of scrollbar hack in Tkinter
-        #
-
-        self.show_all_appearance_buttons(self.appearancesframe, filenames, self.thumbnails_per_row)
+        # only the visible appearances get widgets, see ThumbnailGrid
+        self.thumbnail_grid = ThumbnailGrid(self.my_canvas, my_scrollbar, self.generator.thumbnail_service,
+                                            self.end_file_selection_with_thumbnails)
+        self.thumbnail_grid.show(filenames, self.thumbnails_per_row)
+        self.process_loaded_thumbnails()
 
         #
         # Bottomframe of the popup
@@ -92,6 +89,7 @@ class SelectAppearanceDialog(tk.Frame):
         self.filefilter = tk.Entry(bottomframe, fg=BUTTON_FG_COLOR, bg=BUTTON_BG_COLOR, width=20)
         self.filefilter.pack(side=tk.LEFT)
         self.filefilter.bind('<Return>', lambda event, arg=filenames: self.apply_file_filter(arg))
+        self.filefilter.bind('<KeyRelease>', lambda event, arg=filenames: self.schedule_file_filter(arg))
         button = tk.Button(bottomframe, text="Filter", bg=BUTTON_BG_COLOR, fg=BUTTON_FG_COLOR,
                            activebackground=BUTTON_ACTIVE_COLOR, command=lambda: self.apply_file_filter(filenames))
         button.pack(side=tk.LEFT)
@@ -99,6 +97,7 @@ class SelectAppearanceDialog(tk.Frame):
                            activebackground=BUTTON_ACTIVE_COLOR, command=self.end_file_selection_with_thumbnails)
         button.pack(side=tk.LEFT)
         self.file_selection_popup.wait_window()
+        self.generator.thumbnail_service.cancel_callbacks()
         self.my_canvas.unbind_all('<MouseWheel>')
         self.my_canvas.unbind_all('<Escape>')
         return self._file_selection
@@ -113,81 +112,40 @@ class SelectAppearanceDialog(tk.Frame):
     def change_popup_width(self, value, filenames):
         """ Changes the amount of images shown on each row. Value is either +1 or -1 depending on which function calls
             this. Filenames is the list of filenames to be displayed in the file selection window. """
-        self.remove_all_appearance_widgets()
-        self.thumbnails_per_row += value
+        self.thumbnails_per_row = max(1, self.thumbnails_per_row + value)
         height = self.file_selection_popup.winfo_height()
         geometry = str(int(190 * self.thumbnails_per_row + 23)) + "x" + str(height)
         self.file_selection_popup.geometry(geometry)
-        self.show_all_appearance_buttons(self.appearancesframe, filenames, self.thumbnails_per_row)
-
-    def show_all_appearance_buttons(self, window, filenames, thumbnails_per_row):
-        """ Show all appearance files as image buttons, in the given window. """
-        self.all_appearance_widgets = list()
-        max_vertical = int(len(filenames) / thumbnails_per_row) + 1
-        file_index = 0
-        self.appearancebutton = dict()
-        self.appearancelabel = dict()
-        for row in range(max_vertical):
-            for column in range(thumbnails_per_row):
-                if file_index >= len(filenames):
-                    return
-                button, label = self.make_appearance_button(window, filenames[file_index], row, column, file_index)
-                self.all_appearance_widgets.extend((button, label))
-                file_index += 1
-
-    def make_appearance_button(self, window, file_name, row, column, index):
-        """ Make individual appearance button in file selection window. Called by show_all_appearance_buttons. """
-        self.appearancebutton[index] = self.make_appearance_button_sub(window, file_name, row, column, index)
-        self.appearancelabel[index] = self.make_appearance_button_label(window, file_name, row, column)
-        return self.appearancebutton[index], self.appearancelabel[index]
-
-    def make_appearance_button_sub(self, window, file_name, row, column, file_index):
-        """ todo """
-        thumbnail = self.generator.thumbnails[file_name]
-        appearance_button = tk.Button(window, relief=tk.FLAT, bg=BG_COLOR,
-                                      command=lambda fn=file_name: self.end_file_selection_with_thumbnails(fn))
-        appearance_button.grid(row=row * 2, column=column, padx=0, pady=0)
-        appearance_button.configure(image=thumbnail)
-        appearance_button.bind("<Enter>", lambda e, index=file_index: self.on_enter_appearance_button(index, event=e))
-        appearance_button.bind("<Leave>", lambda e, index=file_index: self.on_leave_appearance_button(index, event=e))
-        appearance_button.image = thumbnail
-        return appearance_button
-
-    @staticmethod
-    def make_appearance_button_label(window, file_name, row, column):
-        """ todo """
-        label_name = os.path.basename(file_name)[7:-4]  # remove Preset_ and .vap
-        appearance_label = tk.Label(window, text=label_name, font=FILENAME_FONT, width=26, anchor=tk.W,
-                                    bg=BG_COLOR, fg=FG_COLOR, padx=0, pady=0)
-        appearance_label.grid(row=row * 2 + 1, column=column, sticky=tk.W)
-        return appearance_label
-
-    def on_enter_appearance_button(self, index, event=None):
-        """ Show hover effect when entering mouse over an image file. """
-        self.appearancebutton[index][BACKGROUND] = HOVER_COLOR
-        self.appearancelabel[index][BACKGROUND] = BG_COLOR
-        self.appearancelabel[index][FOREGROUND] = HOVER_COLOR
-
-    def on_leave_appearance_button(self, index, event=None):
-        """ Show hover effect when exiting mouse over an image file. """
-        self.appearancebutton[index][BACKGROUND] = BG_COLOR
-        self.appearancelabel[index][BACKGROUND] = BG_COLOR
-        self.appearancelabel[index][FOREGROUND] = FG_COLOR
-
-    def remove_all_appearance_widgets(self):
-        """ Used by file_selection_with_thumbnails function to clear the popup window if the amount of thumbnails per
-            row is changed. After clearing, builds the images up again with the new thumbnails per row settings. """
-        for widget in self.all_appearance_widgets:
-            widget.destroy()
+        self.thumbnail_grid.show(filenames if self.filter_result is None else self.filter_result,
+                                 self.thumbnails_per_row)
+
+    def process_loaded_thumbnails(self):
+        """ Shows the thumbnails which finished loading in the background, for as long as the popup is open """
+        if self.file_selection_popup is None or not self.file_selection_popup.winfo_exists():
+            return
+        self.generator.thumbnail_service.process_completed()
+        self.file_selection_popup.after(THUMBNAIL_POLL_INTERVAL, self.process_loaded_thumbnails)
+
+    def schedule_file_filter(self, filenames):
+        """ Applies the file filter FILE_FILTER_DELAY ms after the last key press, so typing stays responsive """
+        if self.filter_job is not None:
+            self.file_selection_popup.after_cancel(self.filter_job)
+        self.filter_job = self.file_selection_popup.after(FILE_FILTER_DELAY, lambda: self.apply_file_filter(filenames))
 
     def apply_file_filter(self, filenames):
-        """ Applies file filter to file selection window. """
-        self.my_canvas.yview_moveto('0.0')  # scroll to top
+        """ Applies file filter to file selection window. When text was only added to the filter, only the files that
+            matched the previous filter are searched. """
+        if self.filter_job is not None:
+            self.file_selection_popup.after_cancel(self.filter_job)
+            self.filter_job = None
         filter_txt = self.filefilter.get()
-        glob_filter = "*preset_*" + filter_txt + "*.vap"
-        filtered = [file for file in filenames if fnmatch(file.lower(), glob_filter)]
-        self.remove_all_appearance_widgets()
-        self.show_all_appearance_buttons(self.appearancesframe, filtered, self.thumbnails_per_row)
+        if filter_txt == self.filter_text:
+            return
+        if self.search_index.can_narrow(self.filter_text, filter_txt):
+            filenames = self.filter_result
+        self.filter_result = self.search_index.search(filter_txt, filenames)
+        self.filter_text = filter_txt
+        self.thumbnail_grid.show(self.filter_result, self.thumbnails_per_row)
 
 
 if __name__ == '__main__':
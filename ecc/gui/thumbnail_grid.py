@@ -0,0 +1,133 @@
+"""
+GUI for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import os
+
+import tkinter as tk
+
+from .constants import *
+from ..common.utility import *
+
+
+class ThumbnailCell:
+    """ One appearance button with its label. Cells are recycled by the ThumbnailGrid: when a cell scrolls out of
+        view, it is moved and reused for an appearance that scrolls into view. """
+    def __init__(self, canvas, on_select):
+        self.canvas = canvas
+        self.filename = None
+        self.frame = tk.Frame(canvas, bg=BG_COLOR)
+        self.button = tk.Button(self.frame, relief=tk.FLAT, bg=BG_COLOR, command=lambda: on_select(self.filename))
+        self.button.grid(row=0, column=0, padx=0, pady=0)
+        self.label = tk.Label(self.frame, font=FILENAME_FONT, width=26, anchor=tk.W, bg=BG_COLOR, fg=FG_COLOR,
+                              padx=0, pady=0)
+        self.label.grid(row=1, column=0, sticky=tk.W)
+        self.button.bind("<Enter>", self.on_enter)
+        self.button.bind("<Leave>", self.on_leave)
+        self.item = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+
+    def show(self, filename, x, y, thumbnail_service):
+        """ Shows the appearance in filename at canvas position (x, y). The thumbnail is set once it is loaded. """
+        self.filename = filename
+        self.label.configure(text=os.path.basename(filename)[7:-4])  # remove Preset_ and .vap
+        image = thumbnail_service.get_photo_image(filename, lambda image, fn=filename: self.set_image(image, fn))
+        self.set_image(image, filename)
+        self.on_leave()
+        self.canvas.coords(self.item, x, y)
+        self.canvas.itemconfigure(self.item, state="normal")
+
+    def set_image(self, image, filename):
+        # the cell might show another appearance by the time the thumbnail of filename is loaded
+        if filename == self.filename:
+            self.button.configure(image=image)
+            self.button.image = image
+
+    def hide(self):
+        self.filename = None
+        self.canvas.itemconfigure(self.item, state="hidden")
+
+    def on_enter(self, event=None):
+        """ Show hover effect when entering mouse over an image file. """
+        self.button[BACKGROUND] = HOVER_COLOR
+        self.label[BACKGROUND] = BG_COLOR
+        self.label[FOREGROUND] = HOVER_COLOR
+
+    def on_leave(self, event=None):
+        """ Show hover effect when exiting mouse over an image file. """
+        self.button[BACKGROUND] = BG_COLOR
+        self.label[BACKGROUND] = BG_COLOR
+        self.label[FOREGROUND] = FG_COLOR
+
+
+class ThumbnailGrid:
+    """ Virtualized grid of appearance buttons on a canvas. Only the rows that are visible, plus
+        THUMBNAIL_GRID_OVERSCAN_ROWS above and below, have widgets. The scroll region of the canvas has the size of
+        the full grid, and whenever the view changes the cells of rows that scrolled out of view are reused for the
+        rows that scrolled into view. Showing, filtering and resizing the grid therefore only costs as much as the
+        number of visible cells, no matter how many appearances there are. """
+    def __init__(self, canvas, scrollbar, thumbnail_service, on_select):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.thumbnail_service = thumbnail_service
+        self.on_select = on_select
+        self.filenames = list()
+        self.columns = 1
+        self.cells = list()
+        self.visible_cells = dict()  # filename index: cell
+        self.canvas.configure(yscrollcommand=self.on_scroll, yscrollincrement=THUMBNAIL_CELL_HEIGHT // 4)
+        self.canvas.bind('<Configure>', lambda e: self.refresh())
+
+    def show(self, filenames, columns):
+        """ Shows filenames in a grid with columns columns, scrolled to the top """
+        self.filenames = filenames
+        self.columns = max(1, columns)
+        for cell in self.visible_cells.values():
+            cell.hide()
+        self.visible_cells.clear()
+        rows = (len(filenames) + self.columns - 1) // self.columns
+        self.canvas.configure(scrollregion=(0, 0, self.columns * THUMBNAIL_CELL_WIDTH, rows * THUMBNAIL_CELL_HEIGHT))
+        self.canvas.yview_moveto(0.0)
+        self.refresh()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def get_visible_range(self):
+        """ Returns the range of filename indices which should have a cell """
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // THUMBNAIL_CELL_HEIGHT) - THUMBNAIL_GRID_OVERSCAN_ROWS)
+        last_row = int(bottom // THUMBNAIL_CELL_HEIGHT) + 1 + THUMBNAIL_GRID_OVERSCAN_ROWS
+        return range(first_row * self.columns, min(len(self.filenames), last_row * self.columns))
+
+    def refresh(self):
+        """ Makes sure that exactly the cells in the visible range are shown """
+        visible_range = self.get_visible_range()
+        free_cells = [cell for index, cell in self.visible_cells.items() if index not in visible_range]
+        for index in [index for index in self.visible_cells if index not in visible_range]:
+            del self.visible_cells[index]
+        for cell in self.cells:
+            if cell.filename is None:
+                free_cells.append(cell)
+
+        for index in visible_range:
+            if index in self.visible_cells:
+                continue
+            if free_cells:
+                cell = free_cells.pop()
+            else:
+                cell = ThumbnailCell(self.canvas, self.on_select)
+                self.cells.append(cell)
+            row, column = divmod(index, self.columns)
+            cell.show(self.filenames[index], column * THUMBNAIL_CELL_WIDTH, row * THUMBNAIL_CELL_HEIGHT,
+                      self.thumbnail_service)
+            self.visible_cells[index] = cell
+        for cell in free_cells:
+            cell.hide()
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
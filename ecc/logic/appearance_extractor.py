@@ -0,0 +1,89 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import re
+import json
+import mmap
+import codecs
+
+from .tools import *
+
+# the storables which are needed to determine the morphs and the gender of an appearance
+CHARACTER_STORABLE_IDS = ('geometry', 'FemaleAnatomy', 'FemaleAnatomyAlt', 'MaleAnatomy', 'MaleAnatomyAlt')
+CHARACTER_STORABLE_PATTERN = re.compile(rb'\{\s*"id"\s*:\s*"(' + '|'.join(CHARACTER_STORABLE_IDS).encode() + rb')"')
+# bytes that are decoded at once for a storable, doubled until the storable fits in
+STORABLE_WINDOW_SIZE = 64 * 1024
+
+json_decoder = json.JSONDecoder()
+
+
+def decode_storable(data, start):
+    """ Decodes the json object which starts at byte start of data. Only a window of the data after start is turned
+        into text, which grows until the object fits in. Returns (storable, end) with the byte position after the
+        object, or None if the data is not valid json or utf-8 there. """
+    window = STORABLE_WINDOW_SIZE
+    while True:
+        chunk = data[start:start + window]
+        try:
+            text = chunk.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # the window can end in the middle of a character
+            if e.start < len(chunk) - 3:
+                return None
+            text = chunk[:e.start].decode('utf-8')
+        try:
+            storable, end = json_decoder.raw_decode(text)
+        except ValueError:
+            if start + window >= len(data):
+                return None
+            window *= 2
+            continue
+        return storable, start + len(text[:end].encode('utf-8'))
+
+
+def extract_character_storables(data):
+    """ Finds the geometry and anatomy storables in the utf-8 json data of an appearance and only decodes those, so
+        the large clothing, hair and skin storables are never turned into python objects. Returns an appearance with
+        just these storables, in the order of the file, or None if the data looks unusual: a byte order mark, a
+        storable id which is found more than once or inside another of these storables, or a geometry storable
+        without morphs or character. """
+    if data[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+        return None
+    storables = list()
+    found_ids = set()
+    end = 0
+    for match in CHARACTER_STORABLE_PATTERN.finditer(data):
+        storable_id = match.group(1)
+        if match.start() < end or storable_id in found_ids:
+            return None
+        decoded = decode_storable(data, match.start())
+        if decoded is None:
+            return None
+        storable, end = decoded
+        found_ids.add(storable_id)
+        storables.append(storable)
+    geometry = [storable for storable in storables if storable['id'] == 'geometry']
+    if not geometry or 'morphs' not in geometry[0] or 'character' not in geometry[0]:
+        return None
+    return {STORABLES: storables}
+
+
+def load_character_storables(filename):
+    """ Loads an appearance with only the storables needed for its morphs and gender, see
+        extract_character_storables(). The file is memory mapped, so only the bytes of these storables are copied.
+        Falls back to load_appearance() if the file looks unusual. """
+    appearance = None
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                appearance = extract_character_storables(data)
+    if appearance is None:
+        return load_appearance(filename)
+    return appearance
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
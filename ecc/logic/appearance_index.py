@@ -0,0 +1,163 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import os
+import json
+
+from .tools import *
+
+# bump this whenever the layout of an index record changes, older index files are then rebuilt automatically
+INDEX_VERSION = 4
+
+
+def get_file_signature(filename):
+    """ Returns the (mtime, size) of filename. An index entry is only valid as long as its signature matches the
+        signature of the file on disk. """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_thumbnail_path(filename):
+    """ Returns the path of the thumbnail belonging to the appearance file, or None if there is no thumbnail """
+    thumbnail_path = os.path.splitext(filename)[0] + '.jpg'
+    if os.path.isfile(thumbnail_path):
+        return thumbnail_path
+    return None
+
+
+def encode_index_entries(entries):
+    """ Returns the index entries as stored in the index file. Most presets share their morphs, so the morph names
+        and uids are stored once in the tables morph_names and morph_uids, and each record only holds the positions
+        in these tables. Returns (entries, morph_names, morph_uids). """
+    tables = ({}, {})
+    encoded_entries = dict()
+    for filename, entry in entries.items():
+        record = entry['record']
+        if record is not None:
+            record = dict(record)
+            for key, table in zip(('morph_names', 'morph_uids'), tables):
+                record[key] = [table.setdefault(value, len(table)) for value in record[key]]
+        encoded_entries[filename] = dict(entry, record=record)
+    return encoded_entries, list(tables[0]), list(tables[1])
+
+
+def decode_index_entries(entries, morph_names, morph_uids):
+    """ Reverses encode_index_entries(). The records share the name and uid strings of the tables. """
+    for entry in entries.values():
+        record = entry['record']
+        if record is not None:
+            record['morph_names'] = [morph_names[position] for position in record['morph_names']]
+            record['morph_uids'] = [morph_uids[position] for position in record['morph_uids']]
+    return entries
+
+
+def create_appearance_record(appearance, filename):
+    """ Extracts everything the app needs to know about an appearance into a small dictionary, so the full appearance
+        json does not have to be kept in memory or parsed again. The morphs are stored as three lists of names, uids
+        and values. Missing uids or values are stored as None. Returns None if the appearance is not a valid
+        Appearance file, which includes json with another structure than an appearance. """
+    try:
+        if get_morph_index_with_character_info_from_appearance(appearance) is None:
+            return None
+        morph_list = get_morph_list_from_appearance(appearance)
+        return {
+            'gender': get_appearance_gender(appearance),
+            'is_fav': os.path.isfile(filename + '.fav'),
+            'morph_names': [morph['name'] for morph in morph_list],
+            'morph_uids': [morph.get('uid') for morph in morph_list],
+            'morph_values': [float(morph['value']) if 'value' in morph else None for morph in morph_list],
+            'thumbnail': get_thumbnail_path(filename)
+        }
+    except (KeyError, IndexError, TypeError, AttributeError, ValueError):
+        return None
+
+
+class AppearanceIndex:
+    """ On disk index of appearance records, keyed by filename. Each entry stores the mtime and size of the file at
+        the moment it was indexed, so only new or changed files have to be parsed again. """
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = dict()
+        self.is_changed = False
+
+    def load(self):
+        """ Reads the index file. If the index file is missing, corrupt or has another version, the index starts
+            empty and is rebuilt during the next library scan. """
+        self.entries = dict()
+        if not os.path.isfile(self.filename):
+            return
+        try:
+            with open(self.filename, encoding='utf-8') as json_file:
+                data = json.load(json_file)
+            if data['version'] != INDEX_VERSION:
+                raise ValueError(f"index version {data['version']} does not match version {INDEX_VERSION}")
+            entries = data['entries']
+            if not isinstance(entries, dict):
+                raise ValueError('index entries are not a dictionary')
+            entries = decode_index_entries(entries, data['morph_names'], data['morph_uids'])
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            print(f'*** Warning! The appearance index {self.filename} cannot be used ({e}), rebuilding it.')
+            self.is_changed = True
+            return
+        print(f'Reading appearance index from: {self.filename} ({len(entries)} entries)')
+        self.entries = entries
+
+    def save(self):
+        """ Writes the index file, but only if something changed since it was loaded. The index is first written to
+            a temporary file, so an interrupted save never leaves a corrupt index behind. """
+        if not self.is_changed:
+            return
+        entries, morph_names, morph_uids = encode_index_entries(self.entries)
+        data = json.dumps({'version': INDEX_VERSION, 'morph_names': morph_names, 'morph_uids': morph_uids,
+                           'entries': entries}).encode('utf-8')
+        try:
+            save_data_atomically(data, self.filename)
+            print(f'Writing appearance index to: {self.filename} ({len(self.entries)} entries)')
+            self.is_changed = False
+        except OSError as e:
+            print(f'*** Warning! Could not write the appearance index: {e}')
+
+    def close(self):
+        """ Saves the index and frees the memory of the loaded entries. The entries are loaded again with load(). """
+        self.save()
+        self.entries = dict()
+
+    def get(self, filename, signature):
+        """ Returns the index entry for filename, or None if the file was never indexed or has changed since. The
+            record of the entry is None for files which are not valid Appearance files. """
+        entry = self.entries.get(filename)
+        if entry is None:
+            return None
+        if entry['mtime'] != signature[0] or entry['size'] != signature[1]:
+            return None
+        return entry
+
+    def put(self, filename, signature, record):
+        """ Adds or replaces the index entry for filename """
+        self.entries[filename] = {'mtime': signature[0], 'size': signature[1], 'record': record}
+        self.is_changed = True
+
+    def refresh_sidecar_files(self, filename, is_fav, thumbnail):
+        """ The .fav marker and the thumbnail can be added or removed without changing the appearance file itself,
+            so these are updated with what was found in the directory listing for every scan. """
+        record = self.entries[filename]['record']
+        if record['is_fav'] != is_fav or record['thumbnail'] != thumbnail:
+            record['is_fav'] = is_fav
+            record['thumbnail'] = thumbnail
+            self.is_changed = True
+
+    def prune(self, scanned_filenames):
+        """ Removes the entries of files which no longer exist. Files which still exist but were not part of this
+            scan (for example files in subdirectories when the recursive search is switched off) are kept. """
+        scanned_filenames = set(scanned_filenames)
+        for filename in list(self.entries.keys()):
+            if filename not in scanned_filenames and not os.path.isfile(filename):
+                del self.entries[filename]
+                self.is_changed = True
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
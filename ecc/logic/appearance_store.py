@@ -0,0 +1,190 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .appearance_index import *
+from .appearance_extractor import *
+from .morph_space import *
+
+DEFAULT_MAX_LOADED_APPEARANCES = 32
+MAX_CACHED_MORPH_COUNTS = 4  # thresholds per appearance for which the number of morphs above it is kept
+
+
+def count_values_above_threshold(values, threshold):
+    """ Returns how many of the morph values (None for a morph without a value) have an absolute value of at least
+        threshold. For the float64 values of an appearance record this gives exactly the same count as
+        len(filter_morphs_below_threshold(morph_list, threshold)) on the morphs in the file. """
+    values = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return int(np.count_nonzero(np.abs(values) >= threshold))
+
+
+def count_float32_values_above_threshold(values, threshold):
+    """ Returns how many of the float32 morph values have an absolute value of at least threshold, or None if that
+        cannot be told from the float32 values. Rounding to float32 never changes the order of two values, so only a
+        value which rounds to the same float32 as threshold can be on either side of it. """
+    abs_values = np.abs(values)
+    if threshold <= 0:
+        return int(np.count_nonzero(~np.isnan(abs_values)))
+    float32_threshold = np.float32(threshold)
+    if np.any(abs_values == float32_threshold):
+        return None
+    return int(np.count_nonzero(abs_values > float32_threshold))
+
+
+class AppearanceRecord:
+    """ Lightweight summary of an appearance file in the library. Only holds what is needed to filter and combine
+        appearances; the full appearance json is loaded on demand by the AppearanceStore. The morphs are stored as
+        columns of the MorphSpace of the store, with a float32 value for each column. The number of morphs above a
+        threshold is kept for the last few thresholds in morph_counts {threshold: count}. """
+    __slots__ = ('filename', 'gender', 'is_fav', 'thumbnail', 'morph_columns', 'morph_values', 'uid_overrides',
+                 'morph_counts')
+
+    def __init__(self, filename, record, morph_space, morph_count_threshold=None):
+        self.filename = filename
+        self.gender = record['gender']
+        self.is_fav = record['is_fav']
+        self.thumbnail = record['thumbnail']
+        self.morph_columns, self.morph_values, self.uid_overrides = morph_space.from_morph_columns(
+            record['morph_names'], record['morph_uids'], record['morph_values'], np.float32)
+        self.morph_counts = dict()
+        if morph_count_threshold is not None:
+            # the record still has the exact values of the file
+            self.cache_morph_count(morph_count_threshold,
+                                   count_values_above_threshold(record['morph_values'], morph_count_threshold))
+
+    def cache_morph_count(self, threshold, count):
+        if len(self.morph_counts) >= MAX_CACHED_MORPH_COUNTS:
+            del self.morph_counts[next(iter(self.morph_counts))]
+        self.morph_counts[threshold] = count
+
+
+class AppearanceStore:
+    """ Holds an AppearanceRecord for every appearance in the library, keyed by filename, and the MorphSpace with all
+        morphs of the library. Full appearances are only loaded when they are needed, and the most recently used ones
+        are kept in a bounded cache. """
+    def __init__(self, max_loaded_appearances=DEFAULT_MAX_LOADED_APPEARANCES):
+        self.records = dict()
+        self.morph_space = MorphSpace()
+        self.max_loaded_appearances = max_loaded_appearances
+        self.loaded_appearances = OrderedDict()
+        # the threshold for which the number of morphs is counted when an appearance is added, see add()
+        self.morph_count_threshold = None
+
+    def __contains__(self, filename):
+        return filename in self.records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, filename):
+        return self.records[filename]
+
+    def keys(self):
+        return self.records.keys()
+
+    def clear(self):
+        self.records.clear()
+        self.morph_space.clear()
+        self.loaded_appearances.clear()
+
+    def add(self, filename, record):
+        """ Adds an appearance record, as created by create_appearance_record(), to the store. The record has the
+            exact values of the file, so the number of morphs above morph_count_threshold is counted right away. """
+        self.records[filename] = AppearanceRecord(filename, record, self.morph_space, self.morph_count_threshold)
+
+    def remove(self, filename):
+        """ Removes the appearance from the store. Its morphs stay in the morph space. """
+        del self.records[filename]
+        self.loaded_appearances.pop(filename, None)
+
+    def update_sidecar_files(self, filename, is_fav, thumbnail):
+        """ Updates the .fav marker and thumbnail of an appearance. Returns True if one of them changed. """
+        record = self.records[filename]
+        if record.is_fav == is_fav and record.thumbnail == thumbnail:
+            return False
+        record.is_fav = is_fav
+        record.thumbnail = thumbnail
+        return True
+
+    def get_morph_list(self, filename):
+        """ Returns the morphs of an appearance in the VAM morph list format. The values are the float32 values of the
+            record, which VAM stores its morph values in as well. """
+        record = self.records[filename]
+        return self.morph_space.to_morph_list(record.morph_columns, record.morph_values, record.uid_overrides)
+
+    def get_morph_matrix(self, filenames):
+        """ Returns a MorphMatrix with a row for each of the filenames, over the morph space of the store """
+        rows = [(self.records[f].morph_columns, self.records[f].morph_values) for f in filenames]
+        return self.morph_space.build_matrix(rows)
+
+    def count_morphs_above_threshold(self, filename, threshold):
+        """ Returns the number of morphs of filename with an absolute value of at least threshold, exactly like
+            filter_morphs_below_threshold() counts them in the file. The count is cached in the record. Only when a
+            float32 value of the record is too close to threshold to tell, the morphs are read from the file. """
+        record = self.records[filename]
+        count = record.morph_counts.get(threshold)
+        if count is None:
+            count = count_float32_values_above_threshold(record.morph_values, threshold)
+            if count is None:
+                count = self.count_morphs_in_file(filename, threshold)
+            record.cache_morph_count(threshold, count)
+        return count
+
+    def count_morphs_in_file(self, filename, threshold):
+        """ Counts the morphs above threshold on the exact values in the file. If the file cannot be read anymore,
+            the float32 values of the record are used. """
+        try:
+            record = create_appearance_record(load_character_storables(filename), filename)
+        except (OSError, ValueError) as e:
+            print(f'*** Warning! Could not read {filename}: {e}')
+            record = None
+        if record is None:
+            return int(np.count_nonzero(np.abs(self.records[filename].morph_values) >= np.float32(threshold)))
+        return count_values_above_threshold(record['morph_values'], threshold)
+
+    def filter_on_morph_count(self, filenames, threshold, min_morphs):
+        """ Returns the filenames which have more than min_morphs morphs with an absolute value of at least
+            threshold """
+        return [f for f in filenames if self.count_morphs_above_threshold(f, threshold) > min_morphs]
+
+    def is_favorite(self, filename):
+        return self.records[filename].is_fav
+
+    def get_gender(self, filename):
+        """ Returns the gender of an appearance. Files outside the library are loaded to determine the gender. """
+        if filename in self.records:
+            return self.records[filename].gender
+        return get_appearance_gender(self.get_appearance(filename))
+
+    def get_appearance(self, filename):
+        """ Returns the full appearance json of filename, or False if it couldn't be loaded. Cached appearances are
+            only used as long as the file did not change on disk. The returned appearance is shared with the cache,
+            so it should not be modified. """
+        try:
+            signature = get_file_signature(filename)
+        except OSError:
+            return False
+        if filename in self.loaded_appearances:
+            cached_signature, appearance = self.loaded_appearances[filename]
+            if cached_signature == signature:
+                self.loaded_appearances.move_to_end(filename)
+                return appearance
+        appearance = load_appearance(filename)
+        self.loaded_appearances[filename] = signature, appearance
+        self.loaded_appearances.move_to_end(filename)
+        while len(self.loaded_appearances) > self.max_loaded_appearances:
+            self.loaded_appearances.popitem(last=False)
+        return appearance
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,73 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import os
+import time
+
+from .tools import *
+
+
+class BatchRunner:
+    """ Runs the genetic algorithm for a number of generations without the GUI. The first population is initialized
+        from the library with method, and every next one is bred from the ratings that rater gives the previous one.
+        rater needs a rate(generation, population, filenames) method which returns the ratings, see raters.py.
+        The population size is the setting 'population size' (see EvolutionEngine.get_population_size()).
+        Every population is saved to the children path of the generator, so the last one can be loaded in VAM like
+        after a session in the app. With keep_generations, every population is also saved to its own subdirectory. """
+    def __init__(self, generator, rater, method, generations, get_only_favorites=False, keep_generations=False):
+        self.generator = generator
+        self.settings = generator.settings
+        self.rater = rater
+        self.method = method
+        self.generations = generations
+        self.get_only_favorites = get_only_favorites
+        self.keep_generations = keep_generations
+        # the writer threads would print every filename at the same time, so only a line per generation is printed
+        self.generator.population_writer.verbose = False
+
+    def get_generation_path(self, generation):
+        return os.path.join(self.generator.get_children_path(), f'Generation_{generation:04d}')
+
+    def save(self, generation, population):
+        """ Saves the population and returns the filenames of the children in the children path """
+        filenames = self.generator.save_population(population)
+        if self.keep_generations:
+            self.generator.save_population(population, self.get_generation_path(generation))
+        self.generator.gen_counter = generation
+        print(f'Saved {len(filenames)} children of generation {generation}.')
+        return filenames
+
+    def run(self):
+        """ Runs all generations and returns the last population. Raises a ValueError if the library has less than
+            2 parents for the child template. """
+        start = time.perf_counter()
+        try:
+            self.generator.fill_data_with_all_appearances()
+            template_gender = self.generator.appearances.get_gender(self.settings['child template'])
+            filenames = self.generator.get_parent_filenames(template_gender, self.get_only_favorites)
+            print(f'Source files: {len(filenames)} Files')
+            if len(filenames) < 2:
+                raise ValueError('Please have at least 2 Parent files')
+
+            print(f'Population size: {self.generator.engine.get_population_size()}')
+            population = self.generator.engine.initialize_population(self.method, filenames, gender=template_gender)
+            children_filenames = self.save(1, population)
+            print(f'Generation 1 done in {time.perf_counter() - start:.2f} seconds.')
+            for generation in range(2, self.generations + 1):
+                generation_start = time.perf_counter()
+                ratings = self.rater.rate(generation - 1, population, children_filenames)
+                population = self.generator.engine.create_next_population(population, ratings)
+                children_filenames = self.save(generation, population)
+                print(f'Generation {generation} done in {time.perf_counter() - generation_start:.2f} seconds.')
+        finally:
+            self.generator.stop_library_watcher()
+        print(f'Ran {self.generator.gen_counter} generations in {time.perf_counter() - start:.2f} seconds.')
+        print(f'The children are in: {self.generator.get_children_path()}')
+        return population
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
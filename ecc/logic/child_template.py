@@ -0,0 +1,55 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import json
+
+from .appearance_index import *
+
+MORPHS_PLACEHOLDER = '__VAM_ECC_CHILD_MORPHS__'
+
+
+class ChildTemplate:
+    """ The child template appearance, pre-serialized once. The template json is rendered with a placeholder instead
+        of the morph list and split around it, so writing a child only has to serialize the morph list of the child
+        and put it between the cached bytes before and after it. The cache is refreshed when another template is
+        used or when the template file changes on disk. """
+    def __init__(self):
+        self.filename = None
+        self.signature = None
+        self.gender = None
+        self.head = b''
+        self.tail = b''
+        self.indent = ''
+
+    def load(self, filename):
+        """ Loads and pre-serializes the template in filename, unless it is already cached and unchanged """
+        signature = get_file_signature(filename)
+        if filename == self.filename and signature == self.signature:
+            return
+        print('Using as appearance template:', filename)
+        appearance = load_appearance(filename)
+        self.gender = get_appearance_gender(appearance)
+        text = json.dumps(save_morph_to_appearance(MORPHS_PLACEHOLDER, appearance), indent=3)
+        placeholder = json.dumps(MORPHS_PLACEHOLDER)
+        start = text.index(placeholder)
+        # the morph list is rendered with the indentation of the line it is on, like json.dump would do
+        line_start = text.rindex('\n', 0, start) + 1
+        line = text[line_start:start]
+        self.indent = line[:len(line) - len(line.lstrip(' '))]
+        self.head = text[:start].encode('utf-8')
+        self.tail = text[start + len(placeholder):].encode('utf-8')
+        self.filename = filename
+        self.signature = signature
+
+    def render(self, morph_list):
+        """ Returns the utf-8 encoded json of the template with morph_list as morphs. The result is the same as
+            json.dump(save_morph_to_appearance(morph_list, template), indent=3). """
+        morphs = json.dumps(morph_list, indent=3).replace('\n', '\n' + self.indent)
+        return self.head + morphs.encode('utf-8') + self.tail
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,128 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import numpy as np
+
+from .tools import *
+from .variation import *
+from .gaussian import *
+
+
+def gaussian_initialization(engine, filenames, n, gender=None, progress=None):
+    """ Initialization strategy which samples n morph lists from a multivariate gaussian distribution, fitted on the
+        appearances in filenames """
+    print('Using random samples from multivariate gaussian distribution for initialization.')
+    shrinkage = DEFAULT_GAUSSIAN_SHRINKAGE
+    if 'gaussian shrinkage' in engine.settings:
+        shrinkage = engine.settings['gaussian shrinkage']
+    return create_gaussian_samples_morph_lists(engine.appearances, filenames, n, engine.settings['morph threshold'],
+                                               shrinkage, engine.rng, engine.gaussian_model_cache, gender, progress)
+
+
+def crossover_initialization(engine, filenames, n, gender=None, progress=None):
+    """ Initialization strategy which creates n children with random crossover between the appearances in
+        filenames """
+    print('Using random pairwise chromosome crossover for sample initialization.')
+    # every parent gets the same rating, so each child has two different, uniformly chosen parents
+    parent_morph_lists = [engine.appearances.get_morph_list(f) for f in filenames]
+    return engine.create_children(parent_morph_lists, [1] * len(parent_morph_lists), n, progress)
+
+
+class EvolutionEngine:
+    """ The genetic algorithm, without any GUI or VAM code. The engine takes the appearance store of the library and
+        the settings, and creates populations as lists of morph lists: the first one from library appearances, the
+        next ones from the previous population and its ratings. Saving the populations is up to the caller.
+        The strategies can be replaced:
+            initialization_strategies: {method name: function(engine, filenames, n, gender, progress)}
+            selection_strategies: {method name: function(ratings, n_pairs, rng)}, see selection.py
+            select_parents: function(ratings, n_pairs, rng), which overrides the setting 'selection method'
+            breed: function(values, parent_pairs, threshold, rng), which returns (children, used, sources), see
+                   breed_children()
+        The methods that create a population take an optional progress(done, total), which is called for every
+        child, so a caller can show the progress, or stop the work by raising an exception from it. """
+    def __init__(self, appearances, settings, gaussian_model_cache=None, rng=None):
+        self.appearances = appearances
+        self.settings = settings
+        self.gaussian_model_cache = gaussian_model_cache
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.initialization_strategies = {
+            'Gaussian Samples': gaussian_initialization,
+            'Random Crossover': crossover_initialization
+        }
+        self.selection_strategies = dict(SELECTION_STRATEGIES)
+        self.select_parents = None
+        self.breed = breed_children
+
+    def get_population_size(self):
+        """ Returns the setting 'population size', or POP_SIZE if there is no such setting """
+        if 'population size' in self.settings:
+            return self.settings['population size']
+        return POP_SIZE
+
+    def initialize_population(self, method, filenames, n=None, gender=None, progress=None):
+        """ Returns the first population of n morph lists, created from the appearances in filenames with the
+            initialization strategy method. gender is the gender of the child template. n defaults to the
+            population size. """
+        if method not in self.initialization_strategies:
+            raise ValueError(f'Unknown initialization method: {method}')
+        if n is None:
+            n = self.get_population_size()
+        return self.initialization_strategies[method](self, filenames, n, gender, progress)
+
+    def create_next_population(self, population, ratings, n=None, progress=None):
+        """ Returns the next population of n morph lists. The elites of population are kept, and the other children
+            are bred from population, with parents chosen based on ratings. n defaults to the population size, which
+            can differ from the size of population. """
+        if n is None:
+            n = self.get_population_size()
+        new_population = [elite_morph_list for elite_morph_list in self.get_elites(population, ratings)
+                          if elite_morph_list][:n]
+        new_population.extend(self.create_children(population, ratings, n - len(new_population), progress))
+        return new_population
+
+    def get_select_parents(self):
+        """ Returns the selection strategy: select_parents if it is set, or else the strategy of the setting
+            'selection method' (DEFAULT_SELECTION_METHOD if there is no such setting). Tournaments use the setting
+            'tournament size' if there is one. """
+        if self.select_parents is not None:
+            return self.select_parents
+        method = DEFAULT_SELECTION_METHOD
+        if 'selection method' in self.settings:
+            method = self.settings['selection method']
+        if method not in self.selection_strategies:
+            raise ValueError(f'Unknown selection method: {method}')
+        select_parents = self.selection_strategies[method]
+        if select_parents is select_parent_pairs_tournament and 'tournament size' in self.settings:
+            tournament_size = self.settings['tournament size']
+            return lambda ratings, n_pairs, rng: select_parent_pairs_tournament(ratings, n_pairs, rng, tournament_size)
+        return select_parents
+
+    def create_children(self, parent_morph_lists, ratings, n, progress=None):
+        """ Returns n children bred from the parent morph lists, using the selection and variation strategies """
+        return create_children_morph_lists(parent_morph_lists, ratings, n, self.settings['morph threshold'], self.rng,
+                                           self.get_select_parents(), self.breed, progress)
+
+    def get_elites(self, population, ratings):
+        """ Returns the morph lists of the children where the rating is the maximum rating that the user selected.
+            If the maximum selected rating is lower than MINIMAL_RATING_FOR_KEEP_ELITES, then no appearances are
+            returned. Returns a maximum of appearances equal to the setting 'max kept elites'. """
+        max_selected_rating = max(ratings)
+        if max_selected_rating < MINIMAL_RATING_FOR_KEEP_ELITES:
+            return list()
+
+        # Select all children with maximum rating.
+        morph_lists_with_maximum_rating = [morph_list for morph_list, rating in zip(population, ratings)
+                                           if rating == max_selected_rating]
+
+        # Limit the list of morph lists to a maximum of 'max kept elites' elements and return it.
+        max_kept_elites = DEFAULT_MAX_KEPT_ELITES
+        if 'max kept elites' in self.settings:
+            max_kept_elites = self.settings['max kept elites']
+        return morph_lists_with_maximum_rating[:max_kept_elites]
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,178 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+from ..common.utility import *
+
+POLL_INTERVAL = 0.025  # seconds between two stat() calls of the polling backend, and between retries
+
+# inotify constants, see <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+INOTIFY_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+INOTIFY_EVENT_HEADER = struct.Struct('iIII')
+INOTIFY_BUFFER_SIZE = 64 * 1024
+
+
+class PollingWatchBackend:
+    """ Fallback backend which lets the FileWatcher stat() the file every poll_interval seconds. A stat() is much
+        cheaper than opening and parsing the file, which is only done when the stat() shows a change. """
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.wake_event = threading.Event()
+
+    def wait(self, timeout=None):
+        """ Waits for the next poll. Returns False, since polling never knows for sure that the file changed. """
+        self.wake_event.wait(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        self.wake_event.clear()
+        return False
+
+    def wake(self):
+        self.wake_event.set()
+
+    def close(self):
+        pass
+
+
+class InotifyWatchBackend:
+    """ Linux backend which sleeps in select() until inotify reports a change in the folder of the file, so an idle
+        watcher does not use any cpu. The folder is watched instead of the file itself, because a file that is
+        replaced by a new one (like an atomic save does) would otherwise not be watched anymore. """
+    def __init__(self, filename):
+        self.basename = os.fsencode(os.path.basename(filename))
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        directory = os.path.dirname(os.path.abspath(filename))
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {directory}')
+        # a pipe to wake up the select() from another thread
+        self.wake_read_fd, self.wake_write_fd = os.pipe()
+
+    def wait(self, timeout=None):
+        """ Waits until the file changes, wake() is called or timeout seconds have passed (None meaning no timeout).
+            Returns True if inotify reported an event for the file. """
+        readable = select.select([self.fd, self.wake_read_fd], [], [], timeout)[0]
+        if self.wake_read_fd in readable:
+            os.read(self.wake_read_fd, 1024)
+        if self.fd not in readable:
+            return False
+        try:
+            events = os.read(self.fd, INOTIFY_BUFFER_SIZE)
+        except BlockingIOError:
+            return False
+        return self.basename in self.get_event_names(events)
+
+    @staticmethod
+    def get_event_names(events):
+        """ Returns the filenames in a buffer of inotify_event structs """
+        names = list()
+        offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(events):
+            _, _, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(events, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            names.append(events[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+        return names
+
+    def wake(self):
+        os.write(self.wake_write_fd, b'\0')
+
+    def close(self):
+        for fd in (self.fd, self.wake_read_fd, self.wake_write_fd):
+            os.close(fd)
+
+
+def create_watch_backend(filename, poll_interval=POLL_INTERVAL):
+    """ Returns an inotify backend on Linux, and a polling backend if inotify is not available """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatchBackend(filename)
+        except (OSError, AttributeError) as e:
+            print(f'*** Warning! Could not use inotify to watch {filename}, falling back to polling: {e}')
+    return PollingWatchBackend(poll_interval)
+
+
+class FileWatcher:
+    """ Watches a single file from a background thread, and calls on_change(filename) from that thread whenever the
+        size or mtime of the file changed. The file is checked once right after start(). on_change returns True when
+        it handled the file, or False if it should be called again after poll_interval seconds, for instance when it
+        found the file only half written. """
+    def __init__(self, filename, on_change, poll_interval=POLL_INTERVAL):
+        self.filename = filename
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.signature = None
+        self.retry = False
+        self.force_read = False
+        self.backend = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.backend = create_watch_backend(self.filename, self.poll_interval)
+        self.thread = threading.Thread(target=self.run, name='FileWatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.backend.wake()
+        self.thread.join()
+        self.backend.close()
+        self.thread = None
+
+    def request_read(self):
+        """ Makes the watcher call on_change again, even if the file did not change """
+        self.force_read = True
+        if self.backend is not None:
+            self.backend.wake()
+
+    def run(self):
+        self.check(force=True)
+        while not self.stop_event.is_set():
+            changed = self.backend.wait(self.poll_interval if self.retry else None)
+            if self.stop_event.is_set():
+                break
+            self.check(force=changed)
+
+    def check(self, force=False):
+        """ Calls on_change if the file changed since the last check, or if a read is forced or retried """
+        try:
+            stat = os.stat(self.filename)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        force = force or self.retry or self.force_read
+        if signature == self.signature and not force:
+            return
+        self.signature = signature
+        self.force_read = False
+        self.retry = False
+        if signature is None:
+            return
+        self.retry = not self.on_change(self.filename)
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,175 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import hashlib
+import json
+import os
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .appearance_index import *
+from .morph_space import *
+
+MAX_CACHED_GAUSSIAN_MODELS = 4
+GAUSSIAN_MODEL_VERSION = 1
+
+
+class GaussianModel:
+    """ Multivariate gaussian distribution of morph values, fitted on the (files, morphs) matrix of the source files.
+        The covariance matrix is never built: with n files and m morphs it has rank n - 1 at most, so it is stored as
+        the n x m matrix components, with covariance = components.T @ components. Fitting takes one thin svd of the
+        centered values, O(n²·m), instead of the O(m³) decomposition that multivariate_normal() does for every single
+        sample. The morphs of the columns are in morph_space. """
+    def __init__(self, means, components, morph_space=None):
+        self.means = means
+        self.components = components
+        self.variances = np.einsum('ij,ij->j', components, components)
+        self.morph_space = morph_space
+
+    @classmethod
+    def fit(cls, values, morph_space=None):
+        """ Fits the model on a (samples, morphs) array of values """
+        values = np.asarray(values, dtype=np.float64)
+        n_samples, n_morphs = values.shape
+        means = values.mean(axis=0) if n_samples else np.zeros(n_morphs)
+        if n_samples < 2:
+            return cls(means, np.zeros((0, n_morphs)), morph_space)
+        # centered = u @ diag(s) @ vt, so the covariance (centered.T @ centered / (n - 1)) is
+        # vt.T @ diag(s² / (n - 1)) @ vt
+        _, s, vt = np.linalg.svd(values - means, full_matrices=False)
+        return cls(means, (s / np.sqrt(n_samples - 1))[:, None] * vt, morph_space)
+
+    def sample(self, n_samples, shrinkage=0.0, rng=None):
+        """ Returns an (n_samples, morphs) array with random samples from the distribution. With shrinkage, the
+            covariance is shrunk towards its diagonal:
+                covariance = (1 - shrinkage) * covariance + shrinkage * diag(covariance)
+            which gives the morphs a bit of independent variation when there are only a few source files. """
+        if rng is None:
+            rng = np.random.default_rng()
+        shrinkage = min(max(float(shrinkage), 0.0), 1.0)
+        samples = np.tile(self.means, (n_samples, 1))
+        if len(self.components):
+            z = rng.standard_normal((n_samples, len(self.components)))
+            samples += np.sqrt(1.0 - shrinkage) * (z @ self.components)
+        if shrinkage > 0:
+            samples += np.sqrt(shrinkage * self.variances) * rng.standard_normal(samples.shape)
+        return samples
+
+    def sample_morph_lists(self, n_samples, threshold, shrinkage=0.0, rng=None, progress=None):
+        """ Returns n_samples morph lists sampled from the model, without the morphs below threshold.
+            progress(done, n_samples) is called before the first and after every morph list. """
+        columns = np.arange(len(self.means), dtype=np.int32)
+        morph_lists = list()
+        if progress is not None:
+            progress(0, n_samples)
+        for sample in self.sample(n_samples, shrinkage, rng):
+            keep = np.abs(sample) >= threshold
+            morph_lists.append(self.morph_space.to_morph_list(columns[keep], sample[keep]))
+            if progress is not None:
+                progress(len(morph_lists), n_samples)
+        return morph_lists
+
+
+def fit_gaussian_model_on_appearances(appearance_store, filenames):
+    """ Fits a GaussianModel on the morphs of the appearances in filenames. Like the padding in
+        pad_morph_names_to_morph_lists(), morphs that an appearance does not have count as 0. """
+    matrix = appearance_store.get_morph_matrix(filenames)
+    columns = matrix.get_used_columns()
+    morph_space = MorphSpace()
+    for column in columns:
+        morph_space.get_column(appearance_store.morph_space.names[column], appearance_store.morph_space.uids[column])
+    return GaussianModel.fit(matrix.to_dense(columns), morph_space)
+
+
+class GaussianModelCache:
+    """ Keeps the most recently fitted GaussianModels, so restarting with the same source files only has to sample.
+        Models are keyed by the source files with their mtime and size, the morph threshold and the gender of the
+        child template. If filename is given, the last fitted model is also saved to that file, so it survives a
+        restart of the app. """
+    def __init__(self, filename=None, max_models=MAX_CACHED_GAUSSIAN_MODELS):
+        self.filename = filename
+        self.max_models = max_models
+        self.models = OrderedDict()
+        self.is_loaded = False
+
+    @staticmethod
+    def get_key(filenames, threshold, gender):
+        """ Returns a hash of everything the fitted model depends on """
+        signatures = list()
+        for filename in sorted(filenames):
+            try:
+                signatures.append((filename,) + get_file_signature(filename))
+            except OSError:
+                signatures.append((filename, None, None))
+        key_json = json.dumps([GAUSSIAN_MODEL_VERSION, signatures, threshold, gender])
+        return hashlib.sha1(key_json.encode('utf-8')).hexdigest()
+
+    def get_model(self, appearance_store, filenames, threshold, gender):
+        """ Returns the GaussianModel for the appearances in filenames, which is only fitted if it isn't cached """
+        key = self.get_key(filenames, threshold, gender)
+        if not self.is_loaded:
+            self.load()
+        if key in self.models:
+            print('Using cached gaussian model.')
+            self.models.move_to_end(key)
+            return self.models[key]
+        model = fit_gaussian_model_on_appearances(appearance_store, filenames)
+        self.models[key] = model
+        while len(self.models) > self.max_models:
+            self.models.popitem(last=False)
+        self.save(key, model)
+        return model
+
+    def load(self):
+        """ Loads the saved model into the cache, if there is one """
+        self.is_loaded = True
+        if self.filename is None or not os.path.isfile(self.filename):
+            return
+        try:
+            with np.load(self.filename, allow_pickle=False) as data:
+                morph_space = MorphSpace()
+                for name, uid, has_uid in zip(data['names'].tolist(), data['uids'].tolist(),
+                                              data['has_uids'].tolist()):
+                    morph_space.get_column(name, uid if has_uid else None)
+                model = GaussianModel(data['means'], data['components'], morph_space)
+                self.models[str(data['key'])] = model
+        except (OSError, ValueError, KeyError) as e:
+            print(f'*** Warning! Could not load the gaussian model from {self.filename}, ignoring it: {e}')
+
+    def save(self, key, model):
+        """ Saves a single model to filename """
+        if self.filename is None:
+            return
+        uids = model.morph_space.uids
+
+        def write(f):
+            np.savez(f, key=np.array(key), means=model.means, components=model.components,
+                     names=np.array(model.morph_space.names, dtype=str),
+                     uids=np.array(['' if uid is None else uid for uid in uids], dtype=str),
+                     has_uids=np.array([uid is not None for uid in uids], dtype=bool))
+
+        try:
+            save_data_atomically(write, self.filename)
+        except OSError as e:
+            print(f'*** Warning! Could not save the gaussian model to {self.filename}: {e}')
+
+
+def create_gaussian_samples_morph_lists(appearance_store, filenames, n_samples, threshold, shrinkage=0.0, rng=None,
+                                        model_cache=None, gender=None, progress=None):
+    """ Returns n_samples morph lists sampled from a GaussianModel of the appearances in filenames, without the
+        morphs below threshold. The model is taken from model_cache if it is given. progress(done, n_samples) is
+        called for every sample, see GaussianModel.sample_morph_lists(). """
+    if model_cache is None:
+        model = fit_gaussian_model_on_appearances(appearance_store, filenames)
+    else:
+        model = model_cache.get_model(appearance_store, filenames, threshold, gender)
+    return model.sample_morph_lists(n_samples, threshold, shrinkage, rng, progress)
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
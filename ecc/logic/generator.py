@@ -5,91 +5,289 @@ Please credit me if you change, use or adapt this file.
 """
 
 import os
-import glob
+import fnmatch
 import pathlib
 
-from PIL import ImageTk, Image, UnidentifiedImageError
-
 from .tools import *
+from .appearance_index import *
+from .library_scan import *
+from .library_walker import *
+from .library_watcher import *
+from .appearance_store import *
+from .child_template import *
+from .population_writer import *
+from .gaussian import *
+from .thumbnail_service import *
+from .search_index import *
+from .evolution_engine import *
+
+
+def get_appearance_filename_for_path(path):
+    """ Returns the appearance filename a changed file belongs to: the file itself for a preset, or the preset of a
+        .fav marker or thumbnail. Returns None for all other files. """
+    if path.endswith('.fav'):
+        path = path[:-len('.fav')]
+    elif path.endswith('.jpg'):
+        path = os.path.splitext(path)[0] + '.vap'
+    if not fnmatch.fnmatch(os.path.basename(path), APPEARANCE_FILENAME_PATTERN):
+        return None
+    return str(pathlib.Path(path))
 
 
 class Generator:
     def __init__(self, settings):
         self.settings = settings
         self.gen_counter = 0
-        self.appearances = dict()
-        self.gender = dict()
-        self.thumbnails = dict()
+        self.appearances = AppearanceStore()
+        self.library_signatures = dict()
+        self.library_watcher = None
+        self.thumbnail_service = ThumbnailService(settings.get_data_filename(THUMBNAIL_CACHE_PATH))
+        self.index = AppearanceIndex(settings.get_data_filename(APPEARANCE_INDEX_FILENAME))
+        self.search_index = None
+        self.child_template = ChildTemplate()
+        self.population_writer = PopulationWriter()
+        self.gaussian_model_cache = GaussianModelCache(self.get_gaussian_model_filename())
+        self.engine = EvolutionEngine(self.appearances, settings, self.gaussian_model_cache)
         self.last_five_commands = list()
         self.connected_to_VAM = False
 
     def clear_data_with_all_appearances(self):
         """ Clears the data stored in the data dictionaries. This is called when loading the VAM
             directory fails, to delete old data. """
+        self.stop_library_watcher()
         self.appearances.clear()
-        self.thumbnails.clear()
-        self.gender.clear()
+        self.library_signatures.clear()
+        self.thumbnail_service.clear()
+        self.search_index = None
+
+    def get_library_files(self):
+        """ Walks the appearance directory, and its subdirectories if the recursive search is on, and returns a
+            LibraryFile for every preset. The directories are added to the library watcher right before they are
+            listed, so no change between listing and watching is missed. """
+        on_directory = None if self.library_watcher is None else self.library_watcher.add_directory
+        library_files, directories = walk_library(self.settings['appearance dir'],
+                                                  self.settings['recursive directory search'], on_directory,
+                                                  self.get_walk_workers())
+        if self.library_watcher is not None and self.library_watcher.error is not None:
+            print(f'*** Warning! Could not watch the appearance directory, falling back to polling: '
+                  f'{self.library_watcher.error}')
+            self.stop_library_watcher()
+            self.library_watcher = PollingLibraryWatcher(self.settings['recursive directory search'])
+            for directory in directories:
+                self.library_watcher.add_directory(directory)
+        return library_files
 
     def fill_data_with_all_appearances(self):
-        """ Loads all available presets found in the default VAM directory into dictionaries
-            to save loading-times when using the app """
-        path = self.settings['appearance dir']
+        """ Loads all available presets found in the default VAM directory into the appearance store
+            to save loading-times when using the app. Files which did not change since the last scan are read from
+            the appearance index instead of being parsed again. Appearances which are already in the store and did
+            not change are kept, so only the differences with the last scan are applied. Afterwards the library is
+            watched for changes, see refresh_appearances(). """
+        self.appearances.morph_count_threshold = self.settings.get('morph threshold')
+        self.start_library_watcher()
+        library_files = self.get_library_files()
+        filenames = [library_file.filename for library_file in library_files]
+        self.index.load()
+        # only the files which are new or changed since the last scan have to be parsed
+        changed_filenames = [f.filename for f in library_files if self.index.get(f.filename, f.signature) is None]
+        unreadable_filenames = set(changed_filenames)
+        for f, signature, record in scan_appearance_files(changed_filenames, self.get_scan_workers()):
+            self.index.put(f, signature, record)
+            unreadable_filenames.discard(f)
 
-        if self.settings['recursive directory search']:
-            filenames = glob.glob(os.path.join(path, "**", "Preset_*.vap"), recursive=True)
-        else:
-            filenames = glob.glob(os.path.join(path, "Preset_*.vap"), recursive=False)
+        scanned_filenames = set(filenames)
+        for f in list(self.library_signatures.keys()):
+            if f not in scanned_filenames:
+                self.remove_appearance(f)
 
-        for f in filenames:
-            f = str(pathlib.Path(f))  # since we use path names as keys, we need to have a uniform formatting
-            appearance = load_appearance(f)
-            if get_morph_index_with_character_info_from_appearance(appearance) is None:
-                # just calling this function since it looks for morphs
+        for library_file in library_files:
+            f = library_file.filename
+            if f in unreadable_filenames:
+                continue  # like in update_appearance_files(), an appearance is kept until its file can be read again
+            entry = self.index.entries[f]
+            record = entry['record']
+            signature = (entry['mtime'], entry['size'])
+            if record is None:
                 print(f"File {f} is not a valid Appearance file, skipping.")
+                self.remove_appearance(f)
+                self.library_signatures[f] = signature
+                continue
+            self.index.refresh_sidecar_files(f, library_file.is_fav, library_file.thumbnail)
+            if record['is_fav']:
+                print(f"###### is_fav = {record['is_fav']} {f}.fav")
+            if self.library_signatures.get(f) == signature and f in self.appearances:
+                self.appearances.update_sidecar_files(f, record['is_fav'], record['thumbnail'])
             else:
-                f_fav = f + '.fav'
-                appearance['is_fav'] = os.path.isfile(f_fav)
-                if appearance['is_fav']:
-                    print(f"###### is_fav = {appearance['is_fav']} {f_fav}")
-                self.appearances[f] = appearance
-                # print(f"Loading file {f} into database.")
-                self.thumbnails[f] = self.get_thumbnail_for_filename(f)
-                self.gender[f] = get_appearance_gender(self.appearances[f])
-
-    # to do: does this belong into GUI?
-    @staticmethod
-    def get_thumbnail_for_filename(filename):
-        """ Returns the corresponding thumbnail as a tk.Image for a given Appearance file with
-            PATH_TO/NAME_OF_APPEARANCE.vap as format """
-        thumbnail_path = os.path.splitext(filename)[0] + '.jpg'
-        if not os.path.exists(thumbnail_path):
-            thumbnail_path = os.path.join(DATA_PATH, NO_THUMBNAIL_FILENAME)
-
-        image = None
-        jpg_loaded = False
-        try:
-            image = Image.open(thumbnail_path)
-            jpg_loaded = True
-        except UnidentifiedImageError as e:
-            print(f'*** Warning! {e}')
-            print(f'*** The thumbnail file cannot be read, using dummy image instead.')
-
-        if not jpg_loaded:
+                self.appearances.add(f, record)
+            self.library_signatures[f] = signature
+        self.index.prune(filenames)
+        self.index.close()
+        self.search_index = None
+
+    def start_library_watcher(self):
+        """ Starts watching the appearance directory for presets which are added, changed or removed """
+        self.stop_library_watcher()
+        path = self.settings['appearance dir']
+        if path and os.path.isdir(path):
+            self.library_watcher = create_library_watcher(path, self.settings['recursive directory search'])
+
+    def stop_library_watcher(self):
+        if self.library_watcher is not None:
+            self.library_watcher.close()
+            self.library_watcher = None
+
+    def refresh_appearances(self):
+        """ Applies the changes the library watcher saw since the last call to the appearance store, for instance
+            presets saved from VAM during the session. Only the changed files are checked, so a refresh takes time
+            proportional to what changed, not to the size of the library. Returns True if the library changed. """
+        if self.library_watcher is None:
+            return False
+        changes = self.library_watcher.get_changes()
+        if changes is None:
+            print('The appearance directory changed, scanning it again.')
+            self.fill_data_with_all_appearances()
+            return True
+        filenames = set()
+        for path in changes:
+            filename = get_appearance_filename_for_path(path)
+            if filename is not None:
+                filenames.add(filename)
+        return self.update_appearance_files(filenames)
+
+    def update_appearance_files(self, filenames):
+        """ Adds, updates or removes the appearances of filenames, depending on their mtime and size, their .fav
+            marker and their thumbnail. Files which cannot be read, for instance because they are still being
+            written, are tried again when they change the next time. Returns True if the library changed. """
+        is_changed = False
+        self.appearances.morph_count_threshold = self.settings.get('morph threshold')
+        for f in sorted(filenames):
+            try:
+                signature = get_file_signature(f)
+            except OSError:
+                if f in self.library_signatures:
+                    self.remove_appearance(f)
+                    is_changed = True
+                continue
+            if signature == self.library_signatures.get(f):
+                if f in self.appearances:
+                    is_changed |= self.appearances.update_sidecar_files(f, os.path.isfile(f + '.fav'),
+                                                                        get_thumbnail_path(f))
+                continue
             try:
-                thumbnail_path = os.path.join(DATA_PATH, NO_THUMBNAIL_FILENAME)
-                image = Image.open(thumbnail_path)
-            except Exception as e:
-                print(f'*** Error! {e}')
+                _, signature, record = scan_appearance_file(f)
+            except (OSError, ValueError) as e:
+                print(f'*** Warning! Could not read {f}, trying again when it changes: {e}')
+                continue
+            if record is None:
+                print(f"File {f} is not a valid Appearance file, skipping.")
+                is_changed |= f in self.appearances
+                self.remove_appearance(f)
+            else:
+                print(f'Appearance added or changed: {f}')
+                self.appearances.add(f, record)
+                is_changed = True
+            self.library_signatures[f] = signature
+        if is_changed:
+            self.search_index = None
+        return is_changed
+
+    def remove_appearance(self, filename):
+        """ Removes an appearance file which is no longer part of the library """
+        self.library_signatures.pop(filename, None)
+        if filename in self.appearances:
+            self.appearances.remove(filename)
+
+    def get_search_index(self):
+        """ Returns the SearchIndex over all appearances, which is built the first time it is needed after a scan """
+        if self.search_index is None:
+            self.search_index = SearchIndex(list(self.appearances.keys()), self.appearances,
+                                            self.settings['appearance dir'])
+        return self.search_index
+
+    def get_gaussian_model_filename(self):
+        """ Returns the file to save the fitted gaussian model to, or None if it should only be kept in memory """
+        if 'persist gaussian model' in self.settings and not self.settings['persist gaussian model']:
+            return None
+        return self.settings.get_data_filename(GAUSSIAN_MODEL_FILENAME)
 
-        image = image.resize(THUMBNAIL_SIZE, Image.ANTIALIAS)
-        thumbnail = ImageTk.PhotoImage(image)
-        return thumbnail
+    def get_walk_workers(self):
+        """ Returns the number of threads used to list the directories of the library, None means one per cpu """
+        if 'walk workers' in self.settings:
+            return self.settings['walk workers']
+        return None
+
+    def get_scan_workers(self):
+        """ Returns the number of worker processes used to parse appearance files, None means one per cpu """
+        if 'scan workers' in self.settings:
+            return self.settings['scan workers']
+        return None
+
+    def get_parent_filenames(self, template_gender, get_only_favorites=False):
+        """ Returns the appearances of the library which can be parents for a child template with template_gender:
+            the (favorite) appearances with a matching gender and more than 'min morph threshold' morphs above the
+            'morph threshold'. Children are never used as parents. Returns an empty list if one of these settings is
+            missing. """
+        if 'morph threshold' not in self.settings or 'min morph threshold' not in self.settings:
+            return list()
+        if get_only_favorites:
+            filenames = [f for f in self.appearances if self.appearances.is_favorite(f)]
+        else:
+            filenames = list(self.appearances.keys())
+        filenames = [f for f in filenames if CHILDREN_FILENAME_PREFIX not in f]
+        filenames = self.filter_filename_list_on_genders(filenames, matching_genders(template_gender))
+        return self.appearances.filter_on_morph_count(filenames, self.settings['morph threshold'],
+                                                      self.settings['min morph threshold'])
+
+    def get_children_path(self):
+        """ Returns the directory in the VAM Appearance directory the children are saved to """
+        return os.path.join(self.settings.get_vam_default_appearance_path(), SAVED_CHILDREN_PATH)
+
+    def save_population(self, population, save_path=None):
+        """ Saves a population list of child morph lists to files in save_path (the children path by default), using
+            the child template as appearance. Returns the filenames of the children. """
+        if save_path is None:
+            save_path = self.get_children_path()
+        pathlib.Path(save_path).mkdir(parents=True, exist_ok=True)
+        self.child_template.load(self.settings['child template'])
+        save_filenames = self.get_child_filenames(len(population), save_path)
+        datas = [self.child_template.render(child_morph_list) for child_morph_list in population]
+        self.population_writer.write(save_filenames, datas)
+        return save_filenames
+
+    def get_child_filenames(self, n, save_path=None):
+        """ Returns the filenames of n children in save_path (the children path by default), numbered from 1 like
+            the children in VAM """
+        if save_path is None:
+            save_path = self.get_children_path()
+        return [os.path.join(save_path, 'Preset_' + CHILDREN_FILENAME_PREFIX + str(i + 1) + '.vap') for i in range(n)]
+
+    def load_population(self, n):
+        """ Returns (filenames, population) for the n children which were saved to the children path by
+            save_population(), to continue the last session. A child which is missing or is not a valid Appearance
+            file gets an empty morph list, with a warning. """
+        filenames = self.get_child_filenames(n)
+        population = list()
+        for filename in filenames:
+            try:
+                appearance = load_appearance(filename)
+            except (OSError, ValueError) as e:
+                print(f'*** Warning! Could not read the child {filename}: {e}')
+                appearance = False
+            morph_list = list()
+            if not appearance:
+                print(f'*** Warning! The child {filename} is missing, it has no morphs.')
+            elif create_appearance_record(appearance, filename) is None:
+                print(f'*** Warning! The child {filename} is not a valid Appearance file, it has no morphs.')
+            else:
+                morph_list = get_morph_list_from_appearance(appearance)
+            population.append(morph_list)
+        return filenames, population
 
     def filter_filename_list_on_genders(self, filenames, genderlist):
         """ For a give list of filenames, filters on gender. """
         filtered = []
         for f in filenames:
-            gender = self.gender[f]
+            gender = self.appearances.get_gender(f)
             if gender:
                 if gender in genderlist:
                     filtered.append(f)
@@ -0,0 +1,124 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import queue
+import threading
+import traceback
+
+from ..common.utility import *
+
+JOB_POLL_INTERVAL = 20  # ms between two checks for progress of the running job
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """ Handle that the work function of a job gets, to report progress and to check for cancellation. Both methods
+        are called from the worker thread. """
+    def __init__(self, events, on_done, on_progress=None, on_cancelled=None, on_error=None):
+        self.events = events
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_cancelled = on_cancelled
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+
+    def report_progress(self, text):
+        self.events.put((self, 'progress', text))
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """ Raises JobCancelled if the job was cancelled. Called by the work function between its steps. """
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def get_progress_callback(self, text):
+        """ Returns a function(done, total) for the loops of the work function, which raises JobCancelled if the
+            job was cancelled and otherwise reports text with the progress, like 'text\n(3/20)' """
+        def progress(done, total):
+            self.check_cancelled()
+            self.report_progress(f'{text}\n({done}/{total})')
+        return progress
+
+
+class JobRunner:
+    """ Runs one job at a time in a worker thread, so the Tk main loop (and with it the VAM command channel) keeps
+        running. The work function gets a Job and runs in the worker thread; it should only use data that isn't
+        changed by the main thread while it runs. All callbacks (on_done with the result of the work function,
+        on_progress with a text, on_cancelled and on_error with the exception) are called in the main thread, from
+        process_events(), which is scheduled with schedule, usually the after() of a Tk widget. """
+    def __init__(self, schedule, poll_interval=JOB_POLL_INTERVAL):
+        self.schedule = schedule
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.job = None
+        self.is_polling = False
+
+    def is_running(self):
+        return self.job is not None
+
+    def start(self, work, on_done, on_progress=None, on_cancelled=None, on_error=None):
+        """ Starts work(job) in a worker thread. Returns False if another job is still running. """
+        if self.job is not None:
+            print('*** Warning! A job is still running, please wait until it is finished.')
+            return False
+        self.job = Job(self.events, on_done, on_progress, on_cancelled, on_error)
+        thread = threading.Thread(target=self.run, args=(self.job, work), name='JobRunner', daemon=True)
+        thread.start()
+        if not self.is_polling:
+            self.is_polling = True
+            self.schedule(self.poll_interval, self.process_events)
+        return True
+
+    def cancel(self):
+        """ Asks the running job to stop. The job stops at its next check_cancelled(). """
+        if self.job is not None:
+            print('Cancelling the running job.')
+            self.job.cancel_event.set()
+
+    def run(self, job, work):
+        """ Runs in the worker thread """
+        try:
+            result = work(job)
+        except JobCancelled:
+            self.events.put((job, 'cancelled', None))
+        except Exception as e:
+            traceback.print_exc()
+            self.events.put((job, 'error', e))
+        else:
+            self.events.put((job, 'done', result))
+
+    def process_events(self):
+        """ Calls the callbacks for the progress and the end of the job. Runs in the main thread. """
+        self.is_polling = True
+        while True:
+            try:
+                job, event, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event == 'progress':
+                if job.on_progress is not None:
+                    job.on_progress(value)
+                continue
+            self.job = None
+            if event == 'done':
+                job.on_done(value)
+            elif event == 'cancelled' and job.on_cancelled is not None:
+                job.on_cancelled()
+            elif event == 'error' and job.on_error is not None:
+                job.on_error(value)
+        if self.job is not None:
+            self.schedule(self.poll_interval, self.process_events)
+        else:
+            self.is_polling = False
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
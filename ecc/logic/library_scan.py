@@ -0,0 +1,74 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .appearance_index import *
+from .appearance_extractor import *
+
+# starting worker processes takes a while, so small scans are faster when done in this process
+MIN_FILES_FOR_PARALLEL_SCAN = 32
+SCAN_CHUNK_SIZE = 16
+
+
+def scan_appearance_file(filename):
+    """ Parses and classifies a single appearance file. Runs inside a worker process, so only the small appearance
+        record is sent back to the app instead of the full appearance json. Only the storables needed for the record
+        are decoded, see load_character_storables(). Returns (filename, signature, record), where record is None if
+        the file is not a valid Appearance file. Raises OSError or ValueError if the file cannot be read or is not
+        json at all. """
+    signature = get_file_signature(filename)
+    record = create_appearance_record(load_character_storables(filename), filename)
+    return filename, signature, record
+
+
+def try_scan_appearance_file(filename):
+    """ Runs scan_appearance_file(), but returns (filename, None, None, error) instead of raising when the file cannot
+        be read or parsed, for instance because it is still being written. The error is sent back as a message, so
+        one bad file does not stop the whole scan. Returns (filename, signature, record, None) otherwise. """
+    try:
+        return scan_appearance_file(filename) + (None,)
+    except (OSError, ValueError) as e:
+        return filename, None, None, str(e)
+
+
+def get_scan_worker_count(workers=None):
+    """ Returns the number of worker processes to use. None means one worker per cpu. """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def scan_appearance_files(filenames, workers=None):
+    """ Scans all filenames with scan_appearance_file and yields the results in the same order as filenames. With more
+        than one worker the files are parsed in a process pool, otherwise they are parsed one by one in this
+        process. Both ways give exactly the same results. Files which cannot be read or parsed are skipped with a
+        warning, like Generator.update_appearance_files() does, so they are tried again when they change. """
+    workers = get_scan_worker_count(workers)
+    if workers == 1 or len(filenames) < MIN_FILES_FOR_PARALLEL_SCAN:
+        results = map(try_scan_appearance_file, filenames)
+        yield from get_scanned_files(results)
+        return
+
+    print(f'Scanning {len(filenames)} appearance files with {workers} worker processes.')
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from get_scanned_files(executor.map(try_scan_appearance_file, filenames, chunksize=SCAN_CHUNK_SIZE))
+
+
+def get_scanned_files(results):
+    """ Yields (filename, signature, record) for the results of try_scan_appearance_file() which have no error, and
+        prints a warning for the others """
+    for filename, signature, record, error in results:
+        if error is not None:
+            print(f'*** Warning! Could not read {filename}, trying again when it changes: {error}')
+            continue
+        yield filename, signature, record
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,128 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import os
+import re
+import fnmatch
+import pathlib
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ..common.utility import *
+
+# listing directories mostly waits for the file system, but with more threads than cpus the threads mostly wait
+# for each other
+MAX_WALK_WORKERS = 4
+match_appearance_filename = re.compile(fnmatch.translate(os.path.normcase(APPEARANCE_FILENAME_PATTERN))).match
+
+
+class LibraryFile:
+    """ A preset found in the appearance directory, with its (mtime, size) signature and whether it has a .fav marker
+        and a thumbnail next to it """
+    __slots__ = ('filename', 'signature', 'is_fav', 'thumbnail')
+
+    def __init__(self, filename, signature, is_fav, thumbnail):
+        self.filename = filename
+        self.signature = signature
+        self.is_fav = is_fav
+        self.thumbnail = thumbnail
+
+
+def scan_library_directory(directory):
+    """ Lists a single directory with os.scandir(). The presets, their .fav markers and their thumbnails all come from
+        this one listing, so the only other call per preset is the stat() for its signature, which on Windows is
+        taken from the listing as well. Returns (library_files, subdirectories). Like glob, hidden subdirectories are
+        skipped. """
+    preset_entries = list()
+    names = set()
+    subdirectories = list()
+    normcase = os.path.normcase
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.name.startswith('.'):
+                            subdirectories.append(entry.path)
+                        continue
+                except OSError:
+                    continue
+                name = normcase(entry.name)
+                names.add(name)
+                if match_appearance_filename(name):
+                    preset_entries.append(entry)
+    except OSError as e:
+        print(f'*** Warning! Could not read the directory {directory}: {e}')
+        return list(), list()
+
+    # since we use path names as keys, we need to have a uniform formatting
+    path = str(pathlib.Path(directory))
+    library_files = list()
+    for entry in preset_entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        filename = os.path.join(path, entry.name)
+        stem = os.path.splitext(entry.name)[0]
+        thumbnail = None
+        if normcase(stem + '.jpg') in names:
+            thumbnail = os.path.join(path, stem + '.jpg')
+        is_fav = normcase(entry.name + '.fav') in names
+        library_files.append(LibraryFile(filename, (stat.st_mtime_ns, stat.st_size), is_fav, thumbnail))
+    return library_files, subdirectories
+
+
+def get_walk_worker_count(workers=None):
+    """ Returns the number of threads to list directories with. None means one per cpu, up to MAX_WALK_WORKERS. """
+    if workers is None:
+        workers = min(MAX_WALK_WORKERS, os.cpu_count() or 1)
+    return max(1, int(workers))
+
+
+def walk_library(path, recursive, on_directory=None, workers=None):
+    """ Returns (library_files, directories) for all presets in path, and in its subdirectories if recursive is True.
+        The library files are sorted on filename. With more than one worker (see get_walk_worker_count()), the
+        subdirectories are listed in a thread pool, every directory as soon as its parent was listed.
+        on_directory(directory) is called right before a directory is listed, from the thread which lists it. """
+    if on_directory is not None:
+        on_directory(path)
+    library_files, subdirectories = scan_library_directory(path)
+    directories = [path]
+    if not recursive:
+        return sorted(library_files, key=lambda f: f.filename), directories
+
+    def scan(directory):
+        if on_directory is not None:
+            on_directory(directory)
+        return scan_library_directory(directory)
+
+    if get_walk_worker_count(workers) == 1:
+        while subdirectories:
+            directory = subdirectories.pop()
+            directories.append(directory)
+            files, new_subdirectories = scan(directory)
+            library_files.extend(files)
+            subdirectories.extend(new_subdirectories)
+    else:
+        with ThreadPoolExecutor(max_workers=get_walk_worker_count(workers)) as executor:
+            pending = set()
+            for directory in subdirectories:
+                directories.append(directory)
+                pending.add(executor.submit(scan, directory))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, new_subdirectories = future.result()
+                    library_files.extend(files)
+                    for directory in new_subdirectories:
+                        directories.append(directory)
+                        pending.add(executor.submit(scan, directory))
+    return sorted(library_files, key=lambda f: f.filename), directories
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,189 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+
+from .file_watcher import *
+
+# more inotify constants, see <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+LIBRARY_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ATTRIB |
+                      IN_DELETE_SELF | IN_MOVE_SELF)
+# the files the polling watcher compares, which are the presets and their .fav markers and thumbnails
+WATCHED_EXTENSIONS = ('.vap', '.fav', '.jpg')
+# seconds between two listings of the library by the polling watcher, which lists every directory every time
+LIBRARY_POLL_INTERVAL = 5.0
+
+
+class PollingLibraryWatcher:
+    """ Fallback watcher which lists every directory of the library from a background thread, every poll_interval
+        seconds, and compares the (mtime, size) signatures of the presets, .fav markers and thumbnails in it with the
+        last listing. A preset which is saved over in place does not change the mtime of its directory, so the
+        signatures of the files themselves are compared. The changed files are collected until get_changes() is
+        called, so that only takes time proportional to what changed. """
+    def __init__(self, recursive, poll_interval=LIBRARY_POLL_INTERVAL):
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.directories = dict()
+        self.changed_files = set()
+        self.needs_scan = False
+        self.error = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='LibraryWatcher', daemon=True)
+        self.thread.start()
+
+    def add_directory(self, directory):
+        """ Starts watching directory. Called right before the directory is listed, possibly from several threads. """
+        signatures = self.get_signatures(directory)[0]
+        with self.lock:
+            self.directories[directory] = signatures
+
+    @staticmethod
+    def get_signatures(directory):
+        """ Returns ({path: (mtime, size)}, subdirectories) for the files in directory which can belong to a preset,
+            or (None, None) if the directory cannot be listed """
+        signatures = dict()
+        subdirectories = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.name.startswith('.'):
+                                subdirectories.add(entry.path)
+                        elif os.path.normcase(entry.name).endswith(WATCHED_EXTENSIONS):
+                            stat = entry.stat()
+                            signatures[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue  # removed while listing
+        except OSError:
+            return None, None
+        return signatures, subdirectories
+
+    def run(self):
+        """ Runs in the background thread """
+        while not self.stop_event.wait(self.poll_interval):
+            self.poll()
+
+    def poll(self):
+        """ Lists all watched directories once and collects the files which changed since the last listing. A
+            directory which was added or removed means that the library has to be scanned again completely. """
+        with self.lock:
+            directories = dict(self.directories)
+        changed_files = set()
+        new_signatures = dict()
+        needs_scan = False
+        for directory, old_signatures in directories.items():
+            if self.stop_event.is_set():
+                return
+            signatures, subdirectories = self.get_signatures(directory)
+            if signatures is None or old_signatures is None or \
+                    (self.recursive and not subdirectories.issubset(directories)):
+                needs_scan = True
+                break
+            if signatures != old_signatures:
+                changed_files.update(path for path in signatures.keys() | old_signatures.keys()
+                                     if signatures.get(path) != old_signatures.get(path))
+                new_signatures[directory] = signatures
+        with self.lock:
+            self.directories.update(new_signatures)
+            self.changed_files.update(changed_files)
+            self.needs_scan |= needs_scan
+
+    def get_changes(self):
+        """ Returns the files which changed since the last call, or None if the library has to be scanned again
+            completely because a directory was added or removed """
+        with self.lock:
+            if self.needs_scan:
+                return None
+            changed_files, self.changed_files = self.changed_files, set()
+        return changed_files
+
+    def close(self):
+        self.stop_event.set()
+
+
+class InotifyLibraryWatcher:
+    """ Linux watcher which puts an inotify watch on every directory of the library. The events are read without
+        blocking whenever get_changes() is called, so it costs nothing while nothing changes and reports exactly the
+        files which changed. """
+    def __init__(self, recursive):
+        self.recursive = recursive
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = dict()
+        self.error = None
+
+    def add_directory(self, directory):
+        """ Starts watching directory. Called right before the directory is listed, possibly from several threads.
+            If the watch cannot be added, for instance because the inotify watch limit is reached, the error is
+            kept in self.error. """
+        watch = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), LIBRARY_WATCH_MASK)
+        if watch < 0:
+            self.error = OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+            return
+        self.directories[watch] = directory
+
+    @staticmethod
+    def get_events(buffer):
+        """ Yields (watch, mask, name) for every inotify_event struct in buffer """
+        offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(buffer):
+            watch, mask, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            yield watch, mask, os.fsdecode(buffer[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+
+    def get_changes(self):
+        """ Returns the files which changed since the last call, or None if the library has to be scanned again
+            completely because events were lost or a directory was added or removed """
+        changed_files = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, INOTIFY_BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            for watch, mask, name in self.get_events(buffer):
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    return None
+                if mask & IN_ISDIR:
+                    if self.recursive and not name.startswith('.'):
+                        return None
+                    continue
+                if watch in self.directories:
+                    changed_files.add(os.path.join(self.directories[watch], name))
+        return changed_files
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_library_watcher(path, recursive):
+    """ Returns an inotify watcher on Linux, and a polling watcher if inotify is not available. The directories to
+        watch are added with add_directory() while the library is walked. """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyLibraryWatcher(recursive)
+        except (OSError, AttributeError) as e:
+            print(f'*** Warning! Could not use inotify to watch {path}, falling back to polling: {e}')
+    return PollingLibraryWatcher(recursive)
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
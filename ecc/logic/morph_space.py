@@ -0,0 +1,158 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import sys
+
+import numpy as np
+
+from ..common.utility import *
+
+
+class MorphMatrix:
+    """ Sparse matrix in compressed sparse row (CSR) format with float32 values, where every row is an appearance and
+        every column a morph of a MorphSpace. Row i holds the values data[indptr[i]:indptr[i + 1]] for the columns
+        indices[indptr[i]:indptr[i + 1]]. """
+    def __init__(self, indptr, indices, data, n_columns):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_columns = n_columns
+
+    @property
+    def shape(self):
+        return len(self.indptr) - 1, self.n_columns
+
+    def get_row(self, index):
+        """ Returns the columns and values of row index """
+        start, end = self.indptr[index], self.indptr[index + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def get_used_columns(self):
+        """ Returns a sorted array of all columns which are used by at least one row """
+        return np.unique(self.indices)
+
+    def to_dense(self, columns=None):
+        """ Returns the matrix as a dense float32 array. If columns is given, only those columns are returned, in the
+            order of columns. Morphs which a row does not have are 0. """
+        n_rows = self.shape[0]
+        row_indices = np.repeat(np.arange(n_rows), np.diff(self.indptr))
+        column_indices = self.indices
+        data = self.data
+        n_columns = self.n_columns
+        if columns is not None:
+            # map every column of the morph space to its position in columns, or -1 if it is not requested
+            positions = np.full(self.n_columns, -1, dtype=np.int64)
+            positions[columns] = np.arange(len(columns))
+            column_indices = positions[column_indices]
+            keep = column_indices >= 0
+            row_indices, column_indices, data = row_indices[keep], column_indices[keep], data[keep]
+            n_columns = len(columns)
+        dense = np.zeros((n_rows, n_columns), dtype=np.float32)
+        dense[row_indices, column_indices] = data
+        return dense
+
+
+class MorphSpace:
+    """ Vocabulary of all morphs in the library. Every morph name is interned into an integer column, together with
+        the first uid that was seen for it, so morphs can be handled as numpy arrays instead of lists of
+        {'uid', 'name', 'value'} dictionaries. """
+    def __init__(self):
+        self.names = list()
+        self.uids = list()
+        self.columns = dict()
+
+    def __len__(self):
+        return len(self.names)
+
+    def clear(self):
+        self.names.clear()
+        self.uids.clear()
+        self.columns.clear()
+
+    def get_column(self, name, uid=None):
+        """ Returns the column of the morph name, and adds the morph to the vocabulary if it is new """
+        column = self.columns.get(name)
+        if column is None:
+            column = len(self.names)
+            name = sys.intern(name)
+            self.columns[name] = column
+            self.names.append(name)
+            self.uids.append(uid if uid is None else sys.intern(uid))
+        return column
+
+    def get_columns(self, names):
+        """ Returns the columns for a list of morph names as an int32 array """
+        return np.array([self.get_column(name) for name in names], dtype=np.int32)
+
+    def from_morph_list(self, morph_list):
+        """ Converts a VAM morph list into (columns, values, uid_overrides), see from_morph_columns() """
+        names = [morph['name'] for morph in morph_list]
+        uids = [morph.get('uid') for morph in morph_list]
+        values = [float(morph['value']) if 'value' in morph else None for morph in morph_list]
+        return self.from_morph_columns(names, uids, values)
+
+    def from_morph_columns(self, names, uids, values, dtype=np.float64):
+        """ Converts lists of morph names, uids and values into (columns, values, uid_overrides). Columns is an int32
+            array and values an array of dtype, in the same order as the names. With the default float64 the values
+            are exactly the values in the file; float32 takes half the memory. Morphs without a value (None) get nan as
+            value. uid_overrides is a dictionary {position: uid} for the morphs whose uid differs from the uid in the
+            vocabulary (None meaning the morph has no uid), or None if all uids match. """
+        columns = np.empty(len(names), dtype=np.int32)
+        uid_overrides = None
+        for position, (name, uid) in enumerate(zip(names, uids)):
+            column = self.get_column(name, uid)
+            columns[position] = column
+            if uid != self.uids[column]:
+                if uid_overrides is None:
+                    uid_overrides = dict()
+                uid_overrides[position] = uid
+        values = np.array([np.nan if value is None else value for value in values], dtype=dtype)
+        return columns, values, uid_overrides
+
+    def to_morph_list(self, columns, values, uid_overrides=None):
+        """ Converts columns and values back into a VAM morph list. Values are written as strings, like VAM does,
+            and morphs with a nan value are written without a value. A value is written as the shortest string which
+            reads back as the same float of the dtype of values. So the float64 values of from_morph_columns() give
+            the same values as the file, but not always the same strings, like '0.50' which is written as '0.5'. """
+        names = self.names
+        uids = self.uids
+        value_strings = values.astype(str).tolist()
+        has_values = (~np.isnan(values)).tolist()
+        morph_list = list()
+        for position, (column, value, has_value) in enumerate(zip(columns.tolist(), value_strings, has_values)):
+            uid = uids[column]
+            if uid_overrides is not None and position in uid_overrides:
+                uid = uid_overrides[position]
+            morph = dict()
+            if uid is not None:
+                morph['uid'] = uid
+            morph['name'] = names[column]
+            if has_value:
+                morph['value'] = value
+            morph_list.append(morph)
+        return morph_list
+
+    def build_matrix(self, rows):
+        """ Builds a MorphMatrix from a list of (columns, values) rows. Like dedupe_morphs(), only the first
+            occurrence of a morph in a row is kept, and like get_means_from_morphlists(), nan values become 0. """
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        all_indices = list()
+        all_data = list()
+        for row, (columns, values) in enumerate(rows):
+            unique_columns, first_positions = np.unique(columns, return_index=True)
+            if len(unique_columns) != len(columns):
+                first_positions = np.sort(first_positions)
+                columns, values = columns[first_positions], values[first_positions]
+            all_indices.append(columns)
+            all_data.append(values)
+            indptr[row + 1] = indptr[row] + len(columns)
+        indices = np.concatenate(all_indices).astype(np.int32) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate(all_data).astype(np.float32) if rows else np.zeros(0, dtype=np.float32)
+        return MorphMatrix(indptr, indices, np.nan_to_num(data), len(self))
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,38 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .tools import *
+
+DEFAULT_WRITER_THREADS = 4
+
+
+class PopulationWriter:
+    """ Writes the appearance files of a population concurrently. Every file is written atomically with
+        save_appearance_data(), so the files can be written at the same time without VAM ever seeing a half written
+        preset. With verbose, every filename is printed when it is written. """
+    def __init__(self, threads=DEFAULT_WRITER_THREADS, verbose=True):
+        self.threads = max(1, int(threads))
+        self.verbose = verbose
+
+    def write(self, filenames, datas):
+        """ Writes each of the utf-8 encoded appearances in datas to the filename at the same position in filenames.
+            Raises the first exception that happened while writing, after all files have been tried. """
+        if self.threads == 1 or len(filenames) < 2:
+            for filename, data in zip(filenames, datas):
+                save_appearance_data(data, filename, self.verbose)
+            return True
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = [executor.submit(save_appearance_data, data, filename, self.verbose)
+                       for filename, data in zip(filenames, datas)]
+        for future in futures:
+            future.result()
+        return True
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,127 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import os
+import sys
+import json
+import time
+import importlib
+import importlib.util
+
+import numpy as np
+
+from .tools import *
+
+RATINGS_FILE_POLL_INTERVAL = 1.0  # seconds between checks for a ratings file which is not there yet
+
+
+def clip_ratings(ratings, n):
+    """ Returns ratings as a list of n integers between MIN_RATING and MAX_RATING. Raises a ValueError if there are
+        not n ratings. """
+    ratings = list(ratings)
+    if len(ratings) != n:
+        raise ValueError(f'Expected {n} ratings, but got {len(ratings)}')
+    clipped = [int(min(MAX_RATING, max(MIN_RATING, round(float(rating))))) for rating in ratings]
+    if any(c != r for c, r in zip(clipped, ratings)):
+        print(f'*** Warning! Ratings were rounded to whole numbers between {MIN_RATING} and {MAX_RATING}.')
+    return clipped
+
+
+class CallableRater:
+    """ Rates a population with function(generation, population, filenames), which returns a rating for every morph
+        list in population. filenames are the files the children were saved to. """
+    def __init__(self, function):
+        self.function = function
+
+    def rate(self, generation, population, filenames):
+        return clip_ratings(self.function(generation, population, filenames), len(population))
+
+
+def load_rater_function(spec):
+    """ Returns the function in spec, which is 'module:function' for an importable module or 'path/to/file.py:function'
+        for a python file """
+    module_name, separator, function_name = spec.rpartition(':')
+    if not separator or not module_name or not function_name:
+        raise ValueError(f'Expected module:function or file.py:function, got: {spec}')
+    if module_name.endswith('.py'):
+        module_spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(module_name))[0],
+                                                             module_name)
+        if module_spec is None:
+            raise ValueError(f'Could not load the python file: {module_name}')
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        if '' not in sys.path:
+            sys.path.insert(0, '')  # so modules in the working directory can be used
+        module = importlib.import_module(module_name)
+    if not callable(getattr(module, function_name, None)):
+        raise ValueError(f'{module_name} has no function {function_name}')
+    return getattr(module, function_name)
+
+
+class JsonFileRater:
+    """ Reads the ratings of every generation from a json file. The filename is pattern formatted with the generation
+        number, like 'ratings_{generation}.json'. The file holds either a list with a rating for every child, in the
+        order of the children, or a dictionary from the filename of a child (without its directory) to its rating,
+        where children which are missing get INITIAL_RATING. If the file is not there yet, the rater waits up to
+        timeout seconds for it, so another program or a person can write it. """
+    def __init__(self, pattern, timeout=0.0):
+        self.pattern = pattern
+        self.timeout = timeout
+
+    def get_filename(self, generation):
+        return self.pattern.format(generation=generation)
+
+    def rate(self, generation, population, filenames):
+        filename = self.get_filename(generation)
+        deadline = time.monotonic() + self.timeout
+        if not os.path.isfile(filename) and self.timeout > 0:
+            print(f'Waiting for ratings file: {filename}')
+            while not os.path.isfile(filename) and time.monotonic() < deadline:
+                time.sleep(RATINGS_FILE_POLL_INTERVAL)
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(f'Could not find the ratings file: {filename}')
+        with open(filename, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = [data.get(os.path.basename(f), INITIAL_RATING) for f in filenames]
+        return clip_ratings(data, len(population))
+
+
+class TargetSimilarityRater:
+    """ Rates every child on how close its morphs are to the morphs of a target appearance. Morphs which are missing
+        in a morph list count as 0. The children are ranked on their euclidean distance to the target, and the ranks
+        are spread evenly over MIN_RATING to MAX_RATING, so the closest children get MAX_RATING. """
+    def __init__(self, target_morph_list):
+        self.target_morph_list = target_morph_list
+
+    @classmethod
+    def from_file(cls, filename):
+        return cls(get_morph_list_from_appearance(load_appearance(filename)))
+
+    def get_distances(self, population):
+        morph_names = sorted(get_all_morph_names_in_morph_lists([self.target_morph_list] + list(population)))
+        column = {name: i for i, name in enumerate(morph_names)}
+
+        def to_vector(morph_list):
+            vector = np.zeros(len(morph_names))
+            for morph in morph_list:
+                vector[column[morph['name']]] = float(morph['value'])
+            return vector
+
+        target = to_vector(self.target_morph_list)
+        return np.array([np.linalg.norm(to_vector(morph_list) - target) for morph_list in population])
+
+    def rate(self, generation, population, filenames):
+        distances = self.get_distances(population)
+        ranks = np.empty(len(population), dtype=int)
+        ranks[np.argsort(distances, kind='stable')] = np.arange(len(population))
+        n_ratings = MAX_RATING - MIN_RATING + 1
+        return [int(MAX_RATING - rank * n_ratings // len(population)) for rank in ranks]
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
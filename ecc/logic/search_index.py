@@ -0,0 +1,170 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import bisect
+import os
+import re
+
+from collections import defaultdict
+from fnmatch import translate
+
+from ..common.utility import *
+
+SEARCH_TAG_PREFIX = '#'
+FAVORITE_TAG = 'fav'
+PRESET_PREFIX = 'preset_'
+
+
+def get_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def split_search_text(search_text):
+    """ Splits the text of the filter box into the text that is matched against the filenames, and a list of tags.
+        Words starting with # are tags, like #fav, #female or #somefolder. Without tags the text is kept exactly as
+        it was typed. """
+    words = search_text.split()
+    tags = [word[len(SEARCH_TAG_PREFIX):].lower() for word in words
+            if word.startswith(SEARCH_TAG_PREFIX) and len(word) > len(SEARCH_TAG_PREFIX)]
+    if not tags:
+        return search_text, tags
+    text = ' '.join(word for word in words if not word.startswith(SEARCH_TAG_PREFIX))
+    return text, tags
+
+
+def get_glob_pattern(text):
+    """ The pattern that the filter box has always used: the text has to be somewhere in the preset name """
+    return '*' + PRESET_PREFIX + '*' + text + '*.vap'
+
+
+def get_literal_parts(text):
+    """ Splits a glob pattern into its literal parts, like fnmatch.translate() reads it: *, ? and every whole [...]
+        or [!...] set are boundaries between the literal parts. A [ without a closing ] is a literal [. """
+    parts = list()
+    literal = ''
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        i += 1
+        if c in '*?':
+            parts.append(literal)
+            literal = ''
+        elif c == '[':
+            j = i
+            if j < n and text[j] == '!':
+                j += 1
+            if j < n and text[j] == ']':
+                j += 1  # a ] right at the start is part of the set
+            j = text.find(']', j)
+            if j < 0:
+                literal += c
+            else:
+                parts.append(literal)
+                literal = ''
+                i = j + 1
+        else:
+            literal += c
+    parts.append(literal)
+    return parts
+
+
+def get_searchable_part(filename):
+    """ Returns the part of the lowercase filename that text matched by get_glob_pattern() has to be in: everything
+        after the first 'preset_'. Returns None if filename can never match. """
+    filename = filename.lower()
+    start = filename.find(PRESET_PREFIX)
+    if start < 0:
+        return None
+    return filename[start + len(PRESET_PREFIX):]
+
+
+class SearchIndex:
+    """ Index for the filter box of the appearance picker. A trigram index over the preset names finds the files
+        that contain the literal parts of the search text, so only those have to be matched against the glob pattern,
+        and a prefix index over tags finds the files with a gender, favorite or directory tag. The results are
+        exactly the same as matching every lowercase filename against the glob pattern with fnmatch(). """
+    def __init__(self, filenames, appearance_store=None, base_path=None):
+        self.positions = dict()
+        self.match_names = dict()
+        self.trigrams = defaultdict(set)
+        self.tags = defaultdict(set)
+        for position, filename in enumerate(filenames):
+            self.positions[filename] = position
+            # fnmatch() compares os.path.normcase() of both the name and the pattern
+            self.match_names[filename] = os.path.normcase(filename.lower())
+            searchable = get_searchable_part(filename)
+            if searchable is None:
+                continue
+            for trigram in get_trigrams(searchable):
+                self.trigrams[trigram].add(position)
+            for tag in self.get_tags(filename, appearance_store, base_path):
+                self.tags[tag].add(position)
+        self.tag_names = sorted(self.tags)
+
+    @staticmethod
+    def get_tags(filename, appearance_store, base_path):
+        """ Returns the tags of filename: its gender, 'fav' for favorites and the names of its directories below
+            base_path """
+        tags = set()
+        if appearance_store is not None and filename in appearance_store:
+            gender = appearance_store.get_gender(filename)
+            if gender:  # the gender of an appearance can be undetermined
+                tags.add(gender.lower())
+            if appearance_store.is_favorite(filename):
+                tags.add(FAVORITE_TAG)
+        if base_path:
+            directory = os.path.relpath(os.path.dirname(filename), base_path)
+            if directory != os.curdir and not directory.startswith(os.pardir):
+                tags.update(part.lower() for part in re.split(r'[\\/]', directory) if part)
+        return tags
+
+    def get_tag_positions(self, prefix):
+        """ Returns the positions of all files with a tag that starts with prefix """
+        positions = set()
+        index = bisect.bisect_left(self.tag_names, prefix)
+        while index < len(self.tag_names) and self.tag_names[index].startswith(prefix):
+            positions.update(self.tags[self.tag_names[index]])
+            index += 1
+        return positions
+
+    def get_candidate_positions(self, text, tags):
+        """ Returns the positions of the files which can match, or None if every file can match. The literal parts of
+            the text (between the glob wildcards) must be in the searchable part of a matching file, so a file has to
+            contain all their trigrams. """
+        positions = None
+        for literal in get_literal_parts(text.lower()):
+            for trigram in get_trigrams(literal):
+                postings = self.trigrams.get(trigram, set())
+                positions = set(postings) if positions is None else positions & postings
+        for tag in tags:
+            tag_positions = self.get_tag_positions(tag)
+            positions = tag_positions if positions is None else positions & tag_positions
+        return positions
+
+    def search(self, search_text, filenames):
+        """ Returns the filenames, in the same order, which match the search text """
+        text, tags = split_search_text(search_text)
+        match = re.compile(translate(os.path.normcase(get_glob_pattern(text)))).match
+        positions = self.get_candidate_positions(text, tags)
+        if positions is not None:
+            filenames = [f for f in filenames if self.positions.get(f) in positions]
+        match_names = self.match_names
+        return [f for f in filenames if match(match_names.get(f) or os.path.normcase(f.lower()))]
+
+    @staticmethod
+    def can_narrow(previous_search_text, search_text):
+        """ Returns True if everything that matches search_text also matched previous_search_text, so the search
+            only has to look at the previous results. This is the case when text was only added at the end (and
+            the previous text did not have an unfinished [ ] set). """
+        if previous_search_text is None or not search_text.startswith(previous_search_text):
+            return False
+        previous_text, previous_tags = split_search_text(previous_search_text)
+        text, tags = split_search_text(search_text)
+        return text.startswith(previous_text) and '[' not in previous_text and set(previous_tags) <= set(tags)
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -0,0 +1,141 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import numpy as np
+
+from ..common.utility import *
+
+DEFAULT_TOURNAMENT_SIZE = 3
+SUS_SWAP_ATTEMPTS = 10  # tries to fix a pair of stochastic universal sampling with the same parent twice, by swapping
+
+
+def get_selection_weights(ratings):
+    """ Returns ratings as a float64 array of weights. If no chromosome has a rating, they all get the same weight.
+        Raises a ValueError if there are less than two chromosomes. """
+    weights = np.asarray(ratings, dtype=np.float64)
+    if len(weights) < 2:
+        raise ValueError('At least two chromosomes are needed to select pairs of parents.')
+    if weights.sum() <= 0:
+        weights = np.ones(len(weights))
+    return weights
+
+
+def draw_other_parents(weights, first, rng):
+    """ Draws a second parent for every parent in first, from a roulette wheel without the slice of that first
+        parent, which gives the same odds as drawing again until a different parent comes up. The wheel is a single
+        cumulative sum, so this takes O((n + pairs) log n) time and O(n + pairs) memory for n weights. """
+    n = len(weights)
+    n_pairs = len(first)
+    # pick a point on the remaining length of the wheel, and skip over the slice of the first parent when the point
+    # lies after its start
+    cumulative = np.cumsum(weights)
+    slice_start = cumulative[first] - weights[first]
+    remaining = cumulative[-1] - weights[first]
+    picks = rng.random(n_pairs) * remaining
+    picks = np.where(picks >= slice_start, picks + weights[first], picks)
+    second = np.minimum(np.searchsorted(cumulative, picks, side='right'), n - 1)
+
+    # if only the first parent had a weight, any of the other chromosomes can be the second parent
+    no_weight_left = remaining <= 0
+    others = rng.integers(0, n - 1, size=n_pairs)
+    second = np.where(no_weight_left, others + (others >= first), second)
+    # rounding can push a pick past the end of the wheel, onto the first parent or a chromosome without a weight
+    for k in np.flatnonzero((second == first) | ((weights[second] <= 0) & ~no_weight_left)):
+        other_weights = weights.copy()
+        other_weights[first[k]] = 0.0
+        second[k] = rng.choice(n, p=other_weights / other_weights.sum())
+    return second
+
+
+def select_parent_pairs(ratings, n_pairs, rng):
+    """ Roulette wheel selection of n_pairs pairs of parents at once. Returns an (n_pairs, 2) array with indices into
+        ratings. The two parents of a pair are always different, see draw_other_parents(). """
+    weights = get_selection_weights(ratings)
+    first = rng.choice(len(weights), size=n_pairs, p=weights / weights.sum())
+    return np.stack((first, draw_other_parents(weights, first, rng)), axis=1)
+
+
+def stochastic_universal_sampling(weights, n_samples, rng):
+    """ Returns n_samples indices into weights, chosen with equally spaced pointers on a roulette wheel with a single
+        random offset. Every chromosome is chosen either the floor or the ceiling of its expected number of times. """
+    cumulative = np.cumsum(weights)
+    step = cumulative[-1] / n_samples
+    pointers = (rng.random() + np.arange(n_samples)) * step
+    return np.minimum(np.searchsorted(cumulative, pointers, side='right'), len(weights) - 1)
+
+
+def select_parent_pairs_sus(ratings, n_pairs, rng):
+    """ Stochastic universal sampling of the 2 * n_pairs parents of n_pairs pairs at once, which are then shuffled
+        into pairs. A pair with the same parent twice swaps its second parent with a random other pair. If that does
+        not work out, because one chromosome has more than half of the wheel, the second parent is drawn from the
+        wheel without the first one like select_parent_pairs() does, so the parents of a pair are always different.
+        Returns an (n_pairs, 2) array with indices into ratings. """
+    weights = get_selection_weights(ratings)
+    if n_pairs <= 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    parents = rng.permutation(stochastic_universal_sampling(weights, 2 * n_pairs, rng))
+    first, second = parents[:n_pairs], parents[n_pairs:]
+    for k in np.flatnonzero(first == second):
+        if first[k] != second[k]:
+            continue  # fixed by an earlier swap
+        for j in rng.integers(0, n_pairs, size=SUS_SWAP_ATTEMPTS):
+            if first[j] != second[k] and first[k] != second[j]:
+                second[k], second[j] = second[j], second[k]
+                break
+    clashes = np.flatnonzero(first == second)
+    if len(clashes) > 0:
+        second[clashes] = draw_other_parents(weights, first[clashes], rng)
+    return np.stack((first, second), axis=1)
+
+
+def select_parent_pairs_tournament(ratings, n_pairs, rng, tournament_size=DEFAULT_TOURNAMENT_SIZE):
+    """ Tournament selection of n_pairs pairs of parents at once: every parent is the highest rated of
+        tournament_size chromosomes, chosen at random with replacement. Ties go to a random one of the tied
+        chromosomes. The second parent of a pair is chosen from the chromosomes without the first parent, so the
+        parents of a pair are always different. Only the order of the ratings matters. Returns an (n_pairs, 2) array
+        with indices into ratings. """
+    weights = get_selection_weights(ratings)
+    n = len(weights)
+    rows = np.arange(n_pairs)
+    candidates = rng.integers(0, n, size=(n_pairs, tournament_size))
+    first = candidates[rows, np.argmax(weights[candidates], axis=1)]
+    candidates = rng.integers(0, n - 1, size=(n_pairs, tournament_size))
+    candidates += candidates >= first[:, None]
+    second = candidates[rows, np.argmax(weights[candidates], axis=1)]
+    return np.stack((first, second), axis=1)
+
+
+def get_rank_weights(ratings):
+    """ Returns the rank of every rating, from 1 for the lowest to n for the highest. Equal ratings share their
+        average rank. """
+    ratings = np.asarray(ratings, dtype=np.float64)
+    sorted_ratings = np.sort(ratings)
+    lowest = np.searchsorted(sorted_ratings, ratings, side='left')
+    highest = np.searchsorted(sorted_ratings, ratings, side='right')
+    return (lowest + highest + 1) / 2.0
+
+
+def select_parent_pairs_rank(ratings, n_pairs, rng):
+    """ Rank based roulette wheel selection of n_pairs pairs of parents at once: the slice of every chromosome is
+        its rank instead of its rating, so a single high rating can not take over the whole wheel, and the lowest
+        rated chromosomes still have a small chance. Returns an (n_pairs, 2) array with indices into ratings. """
+    get_selection_weights(ratings)  # check that there are enough chromosomes
+    return select_parent_pairs(get_rank_weights(ratings), n_pairs, rng)
+
+
+# the selection strategies which can be chosen with the setting 'selection method', all as
+# function(ratings, n_pairs, rng)
+SELECTION_STRATEGIES = {
+    'Roulette Wheel': select_parent_pairs,
+    'Stochastic Universal Sampling': select_parent_pairs_sus,
+    'Tournament': select_parent_pairs_tournament,
+    'Rank': select_parent_pairs_rank
+}
+DEFAULT_SELECTION_METHOD = 'Roulette Wheel'
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
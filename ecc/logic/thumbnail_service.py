@@ -0,0 +1,158 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import hashlib
+import os
+import queue
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ImageTk, Image, UnidentifiedImageError
+
+from ..common.utility import *
+from .tools import save_data_atomically
+
+DEFAULT_THUMBNAIL_WORKERS = 4
+MAX_LOADED_THUMBNAILS = 512
+THUMBNAIL_CACHE_QUALITY = 90
+
+
+class ThumbnailService:
+    """ Loads the thumbnails of appearances in worker threads. Decoding and resizing a jpg is done by the workers,
+        and the resized images are kept in a disk cache, keyed by the path, mtime and size of the source jpg, so a
+        thumbnail only has to be resized once. Tk PhotoImages can only be created in the main thread, so they are
+        created by get_photo_image() when a thumbnail is about to be shown, and by process_completed() for the
+        thumbnails that finished loading. Only the most recently used thumbnails are kept in memory. """
+    def __init__(self, cache_path=None, workers=DEFAULT_THUMBNAIL_WORKERS, max_loaded=MAX_LOADED_THUMBNAILS):
+        self.cache_path = cache_path
+        self.workers = workers
+        self.max_loaded = max_loaded
+        self.executor = None
+        self.completed = queue.Queue()
+        self.callbacks = dict()
+        self.photo_images = OrderedDict()
+        self.placeholder = None
+
+    @staticmethod
+    def get_source_path(filename):
+        """ Returns the jpg of the appearance in filename, or the dummy image if it has none """
+        thumbnail_path = os.path.splitext(filename)[0] + '.jpg'
+        if os.path.isfile(thumbnail_path):
+            return thumbnail_path
+        return os.path.join(DATA_PATH, NO_THUMBNAIL_FILENAME)
+
+    def get_cache_filename(self, source_path):
+        """ Returns the cache file for the resized source_path. The name is a hash of the path, mtime and size of the
+            source, so a changed jpg gets a new cache file. Returns None if there is no cache or no source. """
+        if self.cache_path is None:
+            return None
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+        key = f'{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{THUMBNAIL_SIZE}'
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_path, digest[:2], digest + '.jpg')
+
+    def load_image(self, filename):
+        """ Returns the resized thumbnail of the appearance in filename as a PIL Image. Runs in a worker thread. """
+        source_path = self.get_source_path(filename)
+        cache_filename = self.get_cache_filename(source_path)
+        if cache_filename is not None and os.path.isfile(cache_filename):
+            try:
+                with Image.open(cache_filename) as image:
+                    image.load()
+                    return image
+            except (OSError, UnidentifiedImageError) as e:
+                print(f'*** Warning! Ignoring broken cached thumbnail {cache_filename}: {e}')
+
+        try:
+            with Image.open(source_path) as image:
+                image = image.convert('RGB').resize(THUMBNAIL_SIZE, Image.LANCZOS)
+        except (OSError, UnidentifiedImageError) as e:
+            print(f'*** Warning! {e}')
+            print(f'*** The thumbnail file cannot be read, using dummy image instead.')
+            with Image.open(os.path.join(DATA_PATH, NO_THUMBNAIL_FILENAME)) as image:
+                return image.convert('RGB').resize(THUMBNAIL_SIZE, Image.LANCZOS)
+
+        if cache_filename is not None:
+            self.save_cached_image(image, cache_filename)
+        return image
+
+    @staticmethod
+    def save_cached_image(image, cache_filename):
+        """ Saves a resized image in the disk cache, atomically, since other workers might read it at the same time """
+        try:
+            os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+            save_data_atomically(lambda f: image.save(f, 'JPEG', quality=THUMBNAIL_CACHE_QUALITY), cache_filename)
+        except OSError as e:
+            print(f'*** Warning! Could not cache thumbnail {cache_filename}: {e}')
+
+    def load_in_background(self, filename):
+        """ Worker thread job: loads the thumbnail and hands it to the main thread through the completed queue """
+        try:
+            image = self.load_image(filename)
+        except Exception as e:
+            print(f'*** Error! Could not load the thumbnail of {filename}: {e}')
+            image = None
+        self.completed.put((filename, image))
+
+    def get_placeholder(self):
+        """ Returns the PhotoImage which is shown while a thumbnail is loading """
+        if self.placeholder is None:
+            with Image.open(os.path.join(DATA_PATH, NO_THUMBNAIL_FILENAME)) as image:
+                self.placeholder = ImageTk.PhotoImage(image.resize(THUMBNAIL_SIZE, Image.LANCZOS))
+        return self.placeholder
+
+    def get_photo_image(self, filename, callback=None):
+        """ Returns the thumbnail of filename as a PhotoImage. Must be called from the main thread. If the thumbnail
+            isn't loaded yet, it is loaded in the background and the placeholder is returned instead; callback is
+            then called with the PhotoImage by process_completed() once it is loaded. """
+        if filename in self.photo_images:
+            self.photo_images.move_to_end(filename)
+            return self.photo_images[filename]
+        if filename not in self.callbacks:
+            self.callbacks[filename] = list()
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='Thumbnail')
+            self.executor.submit(self.load_in_background, filename)
+        if callback is not None:
+            self.callbacks[filename].append(callback)
+        return self.get_placeholder()
+
+    def cancel_callbacks(self):
+        """ Forgets all callbacks, for instance when the widgets they would update are destroyed. The thumbnails that
+            are still loading are loaded anyway, so they are ready the next time. """
+        for callbacks in self.callbacks.values():
+            callbacks.clear()
+
+    def has_pending(self):
+        return len(self.callbacks) > 0
+
+    def process_completed(self):
+        """ Creates the PhotoImages for the thumbnails that finished loading and calls their callbacks. Must be called
+            regularly from the main thread (with after()) while has_pending() is True. """
+        while True:
+            try:
+                filename, image = self.completed.get_nowait()
+            except queue.Empty:
+                return
+            callbacks = self.callbacks.pop(filename, list())
+            photo_image = self.get_placeholder() if image is None else ImageTk.PhotoImage(image)
+            self.photo_images[filename] = photo_image
+            while len(self.photo_images) > self.max_loaded:
+                self.photo_images.popitem(last=False)
+            for callback in callbacks:
+                callback(photo_image)
+
+    def clear(self):
+        """ Forgets the loaded thumbnails, the disk cache is kept """
+        self.photo_images.clear()
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
@@ -6,10 +6,10 @@ Please credit me if you change, use or adapt this file.
 
 import copy
 import random
-import shutil
 import os
 import time
 import json
+import threading
 
 from collections import defaultdict
 
@@ -17,6 +17,11 @@ import numpy as np
 
 from ..common.utility import *
 
+REPLACE_ATTEMPTS = 5
+REPLACE_RETRY_DELAY = 0.05
+
+child_thumbnail_data = None
+
 
 def load_appearance(filename):
     """ Loads appearance from filename and returns it, or returns False if the appearance couldn't be loaded """
@@ -29,24 +34,87 @@ def load_appearance(filename):
 
 def save_appearance(appearance, filename):
     """ Saves the appearance as a json to the filename """
-    # The code below is needed in case the user somehow clicks on a number in the companion app
-    # exactly at the same time, as this script is trying to save the new generation. This happens very
-    # very very rarely, but if it does, it ruins the progress. The code below makes sure to wait a
-    # few seconds and try again. The three repeats is a failsafe to avoid looping to eternity.
-    for x in range(3):
+    save_appearance_data(json.dumps(appearance, indent=3).encode('utf-8'), filename)
+    return True
+
+
+def save_appearance_data(data, filename, verbose=True):
+    """ Saves data, the utf-8 encoded json of an appearance, to the filename and puts a child thumbnail next to it.
+        With verbose, the filename is printed. """
+    if verbose:
+        print("Writing appearance to:", filename)
+    save_data_atomically(data, filename)
+    save_child_thumbnail(filename)
+    return True
+
+
+def save_data_atomically(data, filename):
+    """ Writes data to filename. data is either bytes, or a function(f) which writes the content to the binary file f.
+        The data is written to a temporary file in the same folder first, which then replaces filename in one go, so
+        VAM or the companion app never see a half written file. If anything fails, the temporary file is removed
+        and the error is raised. """
+    temp_filename = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_filename, 'wb') as f:
+            if callable(data):
+                data(f)
+            else:
+                f.write(data)
+        replace_file(temp_filename, filename)
+    finally:
+        if os.path.exists(temp_filename):
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass  # the error which got us here is more interesting
+
+
+def replace_file(source, destination):
+    """ os.replace(source, destination), which is retried a few times when it fails. On Windows replacing can fail
+        for a moment if another program, like VAM, has the destination file open for reading. """
+    for attempt in range(REPLACE_ATTEMPTS):
         try:
-            with open(filename, 'w', encoding="utf-8") as json_file:
-                print("Writing appearance to:", filename)
-                json.dump(appearance, json_file, indent=3)
-            # copy a vam character fusion thumbnail as well
-            thumbnail_path = os.path.splitext(filename)[0] + '.jpg'
-            shutil.copyfile(os.path.join(DATA_PATH, CHILD_THUMBNAIL_FILENAME), thumbnail_path)
-            return True
-        except Exception as exception:
-            print(f'{exception=}')
-            print(f"Error while trying to save {filename}, trying again in 2 seconds.")
-            time.sleep(2)
-    raise Exception(f"Can't save appearance {filename}")
+            os.replace(source, destination)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(REPLACE_RETRY_DELAY)
+
+
+def get_app_data_filename(filename):
+    """ Returns the path of filename in DATA_PATH. Like the app has always done, DATA_PATH is relative to the working
+        directory, but if the file isn't there, the DATA_PATH of the app folder is used, so the scripts can also be
+        run from another directory. """
+    path = os.path.join(DATA_PATH, filename)
+    if os.path.isfile(path):
+        return path
+    app_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+    return os.path.normpath(os.path.join(app_path, DATA_PATH, filename))
+
+
+def get_child_thumbnail_data():
+    """ Returns the bytes of the vam character fusion thumbnail, which are only read from disk once """
+    global child_thumbnail_data
+    if child_thumbnail_data is None:
+        with open(get_app_data_filename(CHILD_THUMBNAIL_FILENAME), 'rb') as f:
+            child_thumbnail_data = f.read()
+    return child_thumbnail_data
+
+
+def save_child_thumbnail(filename):
+    """ Puts the vam character fusion thumbnail next to the appearance in filename, unless the same thumbnail is
+        already there (which is the case for every generation after the first one). """
+    thumbnail_path = os.path.splitext(filename)[0] + '.jpg'
+    data = get_child_thumbnail_data()
+    try:
+        if os.path.getsize(thumbnail_path) == len(data):
+            with open(thumbnail_path, 'rb') as f:
+                if f.read() == data:
+                    return
+    except OSError:
+        pass
+    save_data_atomically(data, thumbnail_path)
 
 
 def get_morph_names(morph_list):
@@ -76,22 +144,41 @@ def get_uid_from_morph_name(morph_name, morph_lists, filenames=None):
 
 def pad_morph_names_to_morph_lists(morph_lists, morph_names, filenames=None):
     """ adds uid keys to each morph_list in morph_lists and sets the values to 0 if uid key doesn't exist """
-    morph_lists = copy.deepcopy(morph_lists)
+    # the uid of a padded morph is the uid of the first morph with that name in morph_lists, so find all of those
+    # in a single pass instead of searching the morph_lists again for every missing morph
+    first_morphs = dict()
+    for idx, morph_list in enumerate(morph_lists):
+        for morph in morph_list:
+            if morph['name'] not in first_morphs:
+                first_morphs[morph['name']] = idx, morph
 
+    padded_morph_lists = list()
     for morph_list in morph_lists:
-        morphs_to_add = []
+        names_in_morph_list = {morph['name'] for morph in morph_list}
+        padded_morph_list = [dict(morph) for morph in morph_list]
         for morph_name in morph_names:
-            if is_morph_name_in_morph_list(morph_name, morph_list):
+            if morph_name in names_in_morph_list:
                 continue
-            else:
-                new_morph = {
-                    'uid': get_uid_from_morph_name(morph_name, morph_lists, filenames),
-                    'name': morph_name,
-                    'value': '0.0'
-                }
-                morphs_to_add.append(new_morph)
-        morph_list.extend(morphs_to_add)
-    return morph_lists
+            padded_morph_list.append({
+                'uid': get_uid_from_first_morph(morph_name, first_morphs, filenames),
+                'name': morph_name,
+                'value': '0.0'
+            })
+        padded_morph_lists.append(padded_morph_list)
+    return padded_morph_lists
+
+
+def get_uid_from_first_morph(morph_name, first_morphs, filenames=None):
+    """ returns the uid of the first morph with morph_name, as found by pad_morph_names_to_morph_lists, or False if
+        there is no morph with that name """
+    if morph_name not in first_morphs:
+        return False
+    idx, morph = first_morphs[morph_name]
+    if 'uid' in morph:
+        return morph['uid']
+    if filenames is None:  # this is the case when called from fuse_characters()
+        raise KeyError("Could not find a morph with key 'uid'")
+    raise KeyError(f"Could not find a morph with key 'uid' in file: {filenames[idx]}")
 
 
 def intuitive_crossover(morph_list1, morph_list2):
@@ -265,31 +352,14 @@ def save_morph_to_appearance(morph_list, appearance):
 
 
 def dedupe_morphs(morph_lists):
-    """ removes duplicate morphs from each morph_list in morph_lists """
-
-    # suggestion from GPT-3.5 -- do not understand yet. :) todo: test
-    # return [
-    #     [morph for i, morph in enumerate(morph_list) if morph['name'] not in morph_list[:i]]
-    #     for morph_list in morph_lists
-    # ]
-
-    # another suggestion by GPT-4
-    # new_morph_lists = []
-    # for morph_list in morph_lists:
-    #     found_morphs = {morph['name']: morph for morph in morph_list if morph['name'] not in found_morphs}
-    #     new_morph = list(found_morphs.values())
-    #     new_morph_lists.append(new_morph)
-    # return new_morph_lists
-
+    """ removes duplicate morphs from each morph_list in morph_lists, keeping the first morph with each name """
     new_morph_lists = list()
     for morph_list in morph_lists:
         new_morph = list()
-        found = list()
-        found_morphs = dict()
+        found = set()
         for morph in morph_list:
             if morph['name'] not in found:
-                found.append(morph['name'])
-                found_morphs[morph['name']] = morph
+                found.add(morph['name'])
                 new_morph.append(morph)
         new_morph_lists.append(new_morph)
     return new_morph_lists
@@ -10,12 +10,19 @@ import shutil
 import os
 import time
 import json
+import queue
+import threading
 
 from collections import defaultdict
 
 import numpy as np
 
 from ..common.utility import *
+from .file_watcher import *
+from .tools import save_data_atomically
+
+COMMAND_QUEUE_INTERVAL = 10  # ms between two checks of the command queue
+OUTBOUND_WRITE_DELAY = 0.05  # seconds in which writes to the same VAM file are coalesced into one
 
 
 class VamComm:
@@ -23,6 +30,13 @@ class VamComm:
         self.master = master
         self.settings = settings
         self.execute_vam_command_callback = execute_vam_command_callback
+        self.command_queue = queue.Queue()
+        self.command_watcher = None
+        self.lastcommand = None
+        self.outbound_lock = threading.RLock()
+        self.outbound_files = dict()
+        self.outbound_timers = dict()
+        self.pending_outbound_values = dict()
 
     def broadcast_generation_number_to_vam(self, number):
         """ Updates the file
@@ -58,20 +72,40 @@ class VamComm:
         self.write_value_to_vam_file(path, 'Text', 'text', text)
 
     def write_value_to_vam_file(self, path, id_string, needed_key, replacement_string):
-        """ Updates the VAM file with path, by loading the storables array inside, and looking for the dictionary with
-            ("id", "id_string") as (key, value) pair. Then, within this dictionary, it will overwrite the (key, value)
-            pair with ("needed_key", "replacement_string"). Then it will overwrite the VAM file. """
-        # todo: candidate for logic
-        try:
-            with open(path, encoding='utf-8') as f:
-                text_json = json.load(f)
-            text_json['storables'] = self.replace_value_from_id_in_dict_list(text_json[STORABLES], id_string,
-                                                                        needed_key,
-                                                                        replacement_string)
-            with open(path, 'w', encoding='utf-8') as json_file:
-                json.dump(text_json, json_file, indent=3)
-        except IOError as e:
-            print(e)
+        """ Updates the VAM file with path: within the dictionary of the storables array with ("id", "id_string") as
+            (key, value) pair, the (key, value) pair ("needed_key", "replacement_string") is overwritten. Writes are
+            coalesced: the file is written OUTBOUND_WRITE_DELAY seconds later from a timer thread, with only the
+            latest values that were set within that time. """
+        with self.outbound_lock:
+            self.pending_outbound_values.setdefault(path, dict())[(id_string, needed_key)] = replacement_string
+            if path in self.outbound_timers:
+                return
+            timer = threading.Timer(OUTBOUND_WRITE_DELAY, self.flush_vam_file, args=(path,))
+            self.outbound_timers[path] = timer
+        timer.start()
+
+    def flush_vam_file(self, path):
+        """ Writes the pending values for the VAM file with path. The parsed file is cached after the first time, so
+            only the cached json has to be updated and dumped. The file is replaced atomically, so VAM never reads a
+            half written file. """
+        with self.outbound_lock:
+            self.outbound_timers.pop(path, None)
+            values = self.pending_outbound_values.pop(path, None)
+            if not values:
+                return
+            try:
+                if path not in self.outbound_files:
+                    with open(path, encoding='utf-8') as f:
+                        self.outbound_files[path] = json.load(f)
+                text_json = self.outbound_files[path]
+                for (id_string, needed_key), replacement_string in values.items():
+                    if self.replace_value_from_id_in_dict_list(text_json[STORABLES], id_string, needed_key,
+                                                               replacement_string) is None:
+                        print(f'*** Warning! Could not find {needed_key} of {id_string} in {path}')
+                data = json.dumps(text_json, indent=3).encode('utf-8')
+                save_data_atomically(data, path)
+            except IOError as e:
+                print(e)
 
     @staticmethod
     def replace_value_from_id_in_dict_list(dict_list, id_string, needed_key, replacement_string):
@@ -91,37 +125,61 @@ class VamComm:
         return None
 
     def scan_vam_for_command_updates(self, lastcommand):
-        """ Continously check if
+        """ Starts watching
             PATH_TO_VAM\\Custom\\Atom\\UIText\\VAM Evolutionary Character Creation\\Preset_VAM2PythonText.vap
-            has a new command string. If so, try to execute that command by calling execute_VAM_command() """
-        # todo: candidate for logic
-        # try to open file
+            for new command strings. The file is only read when it changed, by a FileWatcher in a background thread,
+            which hands the commands to the Tk loop through a queue. New commands are executed by
+            process_vam_commands(). If lastcommand is "Initialize", the command which is in the file right now is
+            not executed, but only remembered as the last command. """
         path = self.settings.get_vam_path(
                 r'Custom\Atom\UIText\VAM Evolutionary Character Creation\Preset_VAM2PythonText.vap')
         if not path:
             return
+        self.lastcommand = lastcommand
+        if self.command_watcher is not None and self.command_watcher.filename == path:
+            self.command_watcher.request_read()
+            return
+        if self.command_watcher is not None:
+            self.command_watcher.stop()
+        else:
+            self.master.after(COMMAND_QUEUE_INTERVAL, self.process_vam_commands)
+        self.command_watcher = FileWatcher(path, self.read_vam_command_file)
+        self.command_watcher.start()
+
+    def read_vam_command_file(self, path):
+        """ Reads the command string from the VAM command file and puts it in the command queue. Called from the
+            FileWatcher thread. Returns False if the file couldn't be read (VAM might be writing it right now), so
+            the watcher tries again. """
         try:
             with open(path, encoding='utf-8') as f:
                 linestring = f.read()
-                lines = linestring.split('\n')
-                # print(f"Length of lines {len(lines)}")
-                if len(lines) < 70:  # incomplete file
-                    raise IOError(f'Not enough lines ({len(lines)}) in the file ')
-                # f.seek(0) # back to start of file
-                command_json = json.loads(linestring)
-                command = self.value_from_id_in_dict_list(command_json['storables'], 'Text', 'text')
-                if lastcommand == "Initialize":  # if we Initialize we have to set lastcommand as the file we just read
-                    lastcommand = command
-                if command != lastcommand:
-                    self.broadcast_last_command_to_vam(command)
-                    self.execute_vam_command_callback(command)
-                    print(f'We have a new command: {command}')
-        except IOError as e:
+            lines = linestring.split('\n')
+            if len(lines) < 70:  # incomplete file
+                raise IOError(f'Not enough lines ({len(lines)}) in the file ')
+            command_json = json.loads(linestring)
+            command = self.value_from_id_in_dict_list(command_json['storables'], 'Text', 'text')
+        except (IOError, ValueError) as e:
             print(e)
-            self.master.after(25, lambda lastcommand=lastcommand: self.scan_vam_for_command_updates(lastcommand))
-        else:
-            self.master.after(25, lambda lastcommand=command: self.scan_vam_for_command_updates(lastcommand))
-
+            return False
+        self.command_queue.put(command)
+        return True
+
+    def process_vam_commands(self):
+        """ Executes the new commands in the command queue by calling execute_vam_command_callback(). Runs every
+            COMMAND_QUEUE_INTERVAL ms in the Tk loop, which is cheap when the queue is empty. """
+        self.master.after(COMMAND_QUEUE_INTERVAL, self.process_vam_commands)
+        while True:
+            try:
+                command = self.command_queue.get_nowait()
+            except queue.Empty:
+                return
+            if self.lastcommand == "Initialize":  # if we Initialize we have to set lastcommand as the file we just read
+                self.lastcommand = command
+            if command != self.lastcommand:
+                self.lastcommand = command
+                self.broadcast_last_command_to_vam(command)
+                self.execute_vam_command_callback(command)
+                print(f'We have a new command: {command}')
 
 
 if __name__ == '__main__':
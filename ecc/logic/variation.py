@@ -0,0 +1,104 @@
+"""
+Business logic for VAM Evolutionary Character Creation
+By Pino Sante
+Please credit me if you change, use or adapt this file.
+"""
+
+import numpy as np
+
+from .tools import *
+from .morph_space import *
+from .selection import *
+
+MUTATION_B = 0.5
+
+
+def breed_children(values, parent_pairs, threshold, rng, b=MUTATION_B):
+    """ Creates one child for each pair of parents in a single vectorized pass. values is a dense (population, morphs)
+        matrix of the parents over a shared morph vocabulary, with 0 for morphs a parent does not have. Like
+        fuse_characters(), morphs with an absolute value below threshold are ignored, each morph of the child comes
+        from either parent with equal chance (uniform crossover; a morph which only one parent has, is 0 for the
+        other), and finally one random morph of the child is mutated with non-uniform mutation.
+        Returns (children, used, sources), three (pairs, morphs) arrays with the float32 values of the children, a
+        boolean mask of the morphs each child has, and the row in values of the parent each morph of a child comes
+        from. A morph which only one of the parents has comes from that parent, like the uid that
+        pad_morph_names_to_morph_lists() gives it. """
+    values = np.asarray(values, dtype=np.float32)
+    present = (np.abs(values) >= threshold) & (values != 0)
+    values = np.where(present, values, np.float32(0))
+
+    first, second = parent_pairs[:, 0], parent_pairs[:, 1]
+    n_children, n_morphs = len(parent_pairs), values.shape[1]
+    crossover_mask = rng.random((n_children, n_morphs)) < 0.5
+    children = np.where(crossover_mask, values[first], values[second])
+    used = present[first] | present[second]
+    from_first = np.where(present[first] == present[second], crossover_mask, present[first])
+    sources = np.where(from_first, first[:, None], second[:, None])
+
+    # pick one random used morph per child: the used morph with the highest random score
+    scores = np.where(used, rng.random((n_children, n_morphs)), -1.0)
+    mutated_morphs = np.argmax(scores, axis=1)
+    has_morphs = used.any(axis=1)
+    rows = np.arange(n_children)[has_morphs]
+    mutated_morphs = mutated_morphs[has_morphs]
+    old_values = children[rows, mutated_morphs]
+    r1 = rng.random(len(rows))
+    r2 = rng.random(len(rows))
+    children[rows, mutated_morphs] = np.where(r1 >= 0.5, (1.0 - old_values) * r2 * b, old_values * r2 * b)
+    return children, used, sources
+
+
+def get_column_uid_overrides(columns, uid_overrides):
+    """ Returns the uid_overrides of from_morph_list() as a dictionary {column: uid}. Like build_matrix(), only the
+        first occurrence of a morph counts. """
+    if uid_overrides is None:
+        return dict()
+    first_positions = set(np.unique(columns, return_index=True)[1].tolist())
+    return {int(columns[position]): uid for position, uid in uid_overrides.items() if position in first_positions}
+
+
+def create_children_morph_lists(parent_morph_lists, ratings, n_children, threshold, rng=None,
+                                select_parents=select_parent_pairs, breed=breed_children, progress=None):
+    """ Creates n_children children from the parent morph lists, where the parents are chosen with select_parents
+        (roulette wheel selection by default) based on ratings, and bred with breed. Returns a list with the morph
+        list of each child, sorted by morph name. Every morph of a child has the uid it has in the parent it comes
+        from. progress(done, n_children) is called before the parents are converted and after every child. """
+    if rng is None:
+        rng = np.random.default_rng()
+    if n_children <= 0:
+        return list()
+    if progress is not None:
+        progress(0, n_children)
+    morph_space = MorphSpace()
+    # like fuse_characters(), filter on threshold before duplicate morphs are removed by build_matrix()
+    rows = list()
+    parent_uid_overrides = list()
+    for morph_list in parent_morph_lists:
+        columns, values, uid_overrides = morph_space.from_morph_list(filter_morphs_below_threshold(morph_list,
+                                                                                                   threshold))
+        rows.append((columns, values))
+        parent_uid_overrides.append(get_column_uid_overrides(columns, uid_overrides))
+    values = morph_space.build_matrix(rows).to_dense()
+    parent_pairs = select_parents(ratings, n_children, rng)
+    children, used, sources = breed(values, parent_pairs, threshold, rng)
+
+    name_order = np.argsort(np.array(morph_space.names, dtype=object)).astype(np.int32)
+    has_uid_overrides = any(parent_uid_overrides)
+    children_morph_lists = list()
+    for child, child_used, child_sources in zip(children[:, name_order], used[:, name_order],
+                                                sources[:, name_order]):
+        columns = name_order[child_used]
+        uid_overrides = None
+        if has_uid_overrides:
+            uid_overrides = dict()
+            for position, (column, source) in enumerate(zip(columns.tolist(), child_sources[child_used].tolist())):
+                if column in parent_uid_overrides[source]:
+                    uid_overrides[position] = parent_uid_overrides[source][column]
+        children_morph_lists.append(morph_space.to_morph_list(columns, child[child_used], uid_overrides))
+        if progress is not None:
+            progress(len(children_morph_lists), n_children)
+    return children_morph_lists
+
+
+if __name__ == '__main__':
+    print(f'I am just a module, please launch the main script "{MAIN_SCRIPT_NAME}".')
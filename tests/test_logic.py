@@ -1,5 +1,82 @@
+import copy
+import glob
+import json
+import os
+import pathlib
+import random
+import tempfile
+import time
 import unittest
-import ecc_logic
+
+from fnmatch import fnmatch, filter as filter_filenames
+
+import numpy as np
+
+import ecc.logic.tools as ecc_logic
+from benchmarks.synthetic_library import create_library
+from ecc.common.settings import Settings
+from ecc.common.utility import CHILDREN_FILENAME_PREFIX
+from ecc.logic.appearance_extractor import extract_character_storables
+from ecc.logic.appearance_index import AppearanceIndex, INDEX_VERSION, create_appearance_record, get_file_signature
+from ecc.logic.appearance_store import AppearanceStore, MAX_CACHED_MORPH_COUNTS
+from ecc.logic.child_template import ChildTemplate
+from ecc.logic.evolution_engine import EvolutionEngine
+from ecc.logic.generator import Generator
+from ecc.logic.gaussian import GaussianModel
+from ecc.logic.job_runner import Job, JobCancelled
+from ecc.logic.library_scan import MIN_FILES_FOR_PARALLEL_SCAN, scan_appearance_file, scan_appearance_files
+from ecc.logic.library_walker import walk_library
+from ecc.logic.library_watcher import PollingLibraryWatcher
+from ecc.logic.morph_space import MorphSpace
+from ecc.logic.raters import JsonFileRater, TargetSimilarityRater
+from ecc.logic.search_index import SearchIndex
+from ecc.logic.selection import SELECTION_STRATEGIES, get_rank_weights, select_parent_pairs, select_parent_pairs_sus
+from ecc.logic.variation import create_children_morph_lists
+
+
+def reference_pad_morph_names_to_morph_lists(morph_lists, morph_names, filenames=None):
+    """ the original quadratic implementation of pad_morph_names_to_morph_lists, used as a regression reference """
+    morph_lists = copy.deepcopy(morph_lists)
+    for morph_list in morph_lists:
+        morphs_to_add = []
+        for morph_name in morph_names:
+            if ecc_logic.is_morph_name_in_morph_list(morph_name, morph_list):
+                continue
+            new_morph = {
+                'uid': ecc_logic.get_uid_from_morph_name(morph_name, morph_lists, filenames),
+                'name': morph_name,
+                'value': '0.0'
+            }
+            morphs_to_add.append(new_morph)
+        morph_list.extend(morphs_to_add)
+    return morph_lists
+
+
+def reference_dedupe_morphs(morph_lists):
+    """ the original quadratic implementation of dedupe_morphs, used as a regression reference """
+    new_morph_lists = list()
+    for morph_list in morph_lists:
+        new_morph = list()
+        found = list()
+        for morph in morph_list:
+            if morph['name'] not in found:
+                found.append(morph['name'])
+                new_morph.append(morph)
+        new_morph_lists.append(new_morph)
+    return new_morph_lists
+
+
+def create_synthetic_morph_lists(n_files, n_morphs, seed):
+    """ creates morph lists with partially overlapping morph names, duplicate morphs and differing uids """
+    rng = random.Random(seed)
+    all_names = [f'Morph{i}' for i in range(n_morphs * 3)]
+    morph_lists = list()
+    for i in range(n_files):
+        names = rng.sample(all_names, n_morphs)
+        names.extend(rng.sample(names, n_morphs // 10))  # duplicates
+        morph_lists.append([{'uid': f'file{i}/{name}', 'name': name, 'value': str(rng.uniform(-1, 1))}
+                            for name in names])
+    return morph_lists
 
 
 class TestLogicMethods(unittest.TestCase):
@@ -27,6 +104,459 @@ class TestLogicMethods(unittest.TestCase):
             result = ecc_logic.is_compatible_gender(g1, g2)
             self.assertTrue(expected_result == result, msg=test_case)
 
+    def test_pad_morph_names_matches_reference(self):
+        for seed in range(5):
+            morph_lists = create_synthetic_morph_lists(n_files=12, n_morphs=60, seed=seed)
+            morph_names = ecc_logic.get_all_morph_names_in_morph_lists(morph_lists)
+            morph_names.append('NotInAnyFile')
+            expected = reference_pad_morph_names_to_morph_lists(morph_lists, morph_names)
+            result = ecc_logic.pad_morph_names_to_morph_lists(morph_lists, morph_names)
+            self.assertEqual(expected, result, msg=f'seed {seed}')
+            self.assertEqual(reference_dedupe_morphs(result), ecc_logic.dedupe_morphs(result), msg=f'seed {seed}')
+
+    def test_pad_morph_names_raises_for_missing_uid(self):
+        morph_lists = [[{'name': 'a', 'value': '1'}], [{'uid': 'b', 'name': 'b', 'value': '1'}]]
+        with self.assertRaises(KeyError):
+            ecc_logic.pad_morph_names_to_morph_lists(morph_lists, ['a', 'b'], ['file 1', 'file 2'])
+
+    def test_child_template_render_matches_json_dump(self):
+        morph_list = create_synthetic_morph_lists(n_files=1, n_morphs=20, seed=0)[0]
+        for gender in ('Male', 'Female', 'Futa'):
+            geometry = {'id': 'geometry', 'character': 'Male 1' if gender == 'Male' else 'Female 1',
+                        'useFemaleMorphsOnMale': 'true' if gender == 'Futa' else 'false',
+                        'morphs': [], 'morphsOtherGender': [], 'hair': [{'id': 'h', 'internalId': 'h'}]}
+            anatomy = {'id': 'FemaleAnatomy', 'enabled': 'false' if gender == 'Male' else 'true'}
+            template = {'setUnlistedParamsToDefault': 'true', 'storables': [geometry, anatomy]}
+            with tempfile.TemporaryDirectory() as path:
+                filename = os.path.join(path, 'Preset_Template.vap')
+                with open(filename, 'w') as json_file:
+                    json.dump(template, json_file, indent=3)
+                child_template = ChildTemplate()
+                child_template.load(filename)
+            for child_morph_list in (morph_list, []):
+                expected = json.dumps(ecc_logic.save_morph_to_appearance(child_morph_list, template), indent=3)
+                self.assertEqual(expected.encode('utf-8'), child_template.render(child_morph_list), msg=gender)
+
+    def test_gaussian_model_matches_full_covariance(self):
+        values = np.random.default_rng(0).standard_normal((6, 40))
+        model = GaussianModel.fit(values)
+        self.assertTrue(np.allclose(values.mean(axis=0), model.means))
+        self.assertTrue(np.allclose(np.cov(values.T), model.components.T @ model.components))
+        self.assertEqual((20, 40), model.sample(20).shape)
+
+    def test_load_population_continues_the_saved_population(self):
+        geometry = {'id': 'geometry', 'character': 'Female 1', 'morphs': []}
+        template = {'setUnlistedParamsToDefault': 'true', 'storables': [geometry]}
+        population = [[{'uid': f'uid {i}', 'name': f'morph {i}', 'value': f'0.{i + 1}'}] for i in range(4)]
+        with tempfile.TemporaryDirectory() as path:
+            settings = Settings()
+            settings['VAM base dir'] = path
+            settings['child template'] = os.path.join(path, 'Preset_Template.vap')
+            with open(settings['child template'], 'w') as json_file:
+                json.dump(template, json_file)
+            generator = Generator(settings)
+            generator.population_writer.verbose = False
+            filenames = generator.save_population(population)
+            self.assertEqual((filenames, population), generator.load_population(len(population)))
+            self.assertTrue(filenames[0].endswith(f'Preset_{CHILDREN_FILENAME_PREFIX}1.vap'))
+
+            # a missing child or one which is not an appearance does not stop the session from continuing
+            os.remove(filenames[1])
+            with open(filenames[2], 'w') as json_file:
+                json.dump({}, json_file)
+            self.assertEqual((filenames, [population[0], [], [], population[3]]),
+                             generator.load_population(len(population)))
+
+    def test_appearance_index(self):
+        with tempfile.TemporaryDirectory() as path:
+            preset = os.path.join(path, 'Preset_a.vap')
+            with open(preset, 'w') as f:
+                f.write('{"storables": []}')
+            signature = get_file_signature(preset)
+            index_filename = os.path.join(path, 'appearance_index.json')
+            record = {'gender': 'Female', 'is_fav': False, 'morph_names': ['a'], 'morph_uids': [None],
+                      'morph_values': [0.5], 'thumbnail': None}
+            index = AppearanceIndex(index_filename)
+            index.load()
+            index.put(preset, signature, record)
+            index.put(os.path.join(path, 'Preset_removed.vap'), signature, None)
+            index.prune([preset])
+            index.close()
+            self.assertEqual({}, index.entries)
+            # the morph names and uids are stored once, the records refer to them by position
+            with open(index_filename) as f:
+                data = json.load(f)
+            self.assertEqual((['a'], [None]), (data['morph_names'], data['morph_uids']))
+            self.assertEqual(([0], [0]), (data['entries'][preset]['record']['morph_names'],
+                                          data['entries'][preset]['record']['morph_uids']))
+
+            index = AppearanceIndex(index_filename)
+            index.load()
+            self.assertEqual([preset], list(index.entries))
+            self.assertEqual(record, index.get(preset, signature)['record'])
+            # a changed mtime or size means that the file has to be parsed again
+            self.assertIsNone(index.get(preset, (signature[0] + 1, signature[1])))
+            self.assertIsNone(index.get(preset, (signature[0], signature[1] + 1)))
+            with open(preset, 'a') as f:
+                f.write(' ')
+            self.assertIsNone(index.get(preset, get_file_signature(preset)))
+            self.assertIsNone(index.get(os.path.join(path, 'Preset_b.vap'), signature))
+
+            # a corrupt index, or one of another version, starts empty and is written again on the next save
+            for data in ('{"version": ', json.dumps({'version': INDEX_VERSION + 1, 'entries': {}}),
+                         json.dumps({'version': INDEX_VERSION, 'entries': []})):
+                with open(index_filename, 'w') as f:
+                    f.write(data)
+                index = AppearanceIndex(index_filename)
+                index.load()
+                self.assertEqual({}, index.entries)
+                index.save()
+                with open(index_filename) as f:
+                    self.assertEqual({'version': INDEX_VERSION, 'morph_names': [], 'morph_uids': [], 'entries': {}},
+                                     json.load(f))
+
+    def test_morph_count_matches_filter_morphs_below_threshold(self):
+        values = ['0.01', '-0.01', '0.1', '0.0999999999', '0.00999', '-0.5', '0', None, '0.3333333', '0.05',
+                  '-0.05', '0.0499999999', '0.10000000001']
+        morph_list = [{'uid': f'uid/{i}', 'name': f'morph {i}'} for i in range(len(values))]
+        for morph, value in zip(morph_list, values):
+            if value is not None:
+                morph['value'] = value
+        appearance = {'storables': [{'id': 'geometry', 'character': 'Female', 'morphs': morph_list}]}
+        with tempfile.TemporaryDirectory() as path:
+            # the store only keeps float32 values, for values too close to the threshold it reads the file
+            filename = os.path.join(path, 'a.vap')
+            with open(filename, 'w') as f:
+                json.dump(appearance, f)
+            # the record goes through the json of the appearance index, like in the app
+            record = json.loads(json.dumps(create_appearance_record(appearance, filename)))
+            for morph_count_threshold in [None, 0.1]:
+                store = AppearanceStore()
+                store.morph_count_threshold = morph_count_threshold
+                store.add(filename, record)
+                for threshold in [0.1, 0, 0.01, 0.00999, 0.05, 0.0500001, 0.3333333, 0.5, 0.99]:
+                    expected = len(ecc_logic.filter_morphs_below_threshold(morph_list, threshold))
+                    self.assertEqual(expected, store.count_morphs_above_threshold(filename, threshold),
+                                     msg=(morph_count_threshold, threshold))
+                self.assertLessEqual(len(store.records[filename].morph_counts), MAX_CACHED_MORPH_COUNTS)
+                self.assertEqual([filename], store.filter_on_morph_count([filename], 0.01, 9))
+                self.assertEqual([], store.filter_on_morph_count([filename], 0.01, 10))
+
+    def test_morph_space_round_trip(self):
+        morph_lists = [
+            [{'uid': 'a/uid', 'name': 'a', 'value': '0.0999999999'}, {'uid': 'b/uid', 'name': 'b', 'value': '-0.5'},
+             {'name': 'no uid', 'value': '0.333333333333'}, {'uid': 'c/uid', 'name': 'c'}],
+            [{'uid': 'b/other uid', 'name': 'b', 'value': '0.12345678901234'}, {'name': 'a', 'value': '1.0'},
+             {'uid': 'no uid/uid', 'name': 'no uid', 'value': '-0.001'}, {'uid': 'c/uid', 'name': 'c'}]]
+        morph_space = MorphSpace()
+        for morph_list in morph_lists:
+            columns, values, uid_overrides = morph_space.from_morph_list(morph_list)
+            self.assertEqual(morph_list, morph_space.to_morph_list(columns, values, uid_overrides))
+        self.assertEqual(['a', 'b', 'no uid', 'c'], morph_space.names)
+        self.assertEqual(['a/uid', 'b/uid', None, 'c/uid'], morph_space.uids)
+        # the strings are not kept, only the values
+        columns, values, uid_overrides = morph_space.from_morph_list([{'name': 'a', 'value': '0.50'},
+                                                                     {'name': 'b', 'value': '-0.0000001'}])
+        self.assertEqual([{'name': 'a', 'value': '0.5'}, {'name': 'b', 'value': '-1e-07'}],
+                         morph_space.to_morph_list(columns, values, uid_overrides))
+
+        store = AppearanceStore()
+        for i, morph_list in enumerate(morph_lists):
+            appearance = {'storables': [{'id': 'geometry', 'character': 'Female', 'morphs': morph_list}]}
+            store.add(f'{i}.vap', json.loads(json.dumps(create_appearance_record(appearance, f'{i}.vap'))))
+            # the store keeps float32 values, like the floats of VAM itself
+            float32_morph_list = [dict(morph) for morph in morph_list]
+            for morph in float32_morph_list:
+                if 'value' in morph:
+                    morph['value'] = str(np.float32(morph['value']))
+            self.assertEqual(float32_morph_list, store.get_morph_list(f'{i}.vap'))
+
+    def test_children_keep_the_uids_of_their_parents(self):
+        names = [f'morph {i}' for i in range(20)]
+        first = [{'uid': f'first/{name}', 'name': name, 'value': '0.1'} for name in names]
+        second = [{'uid': f'second/{name}', 'name': name, 'value': '0.2'} for name in names[:15]]
+        second.append({'name': 'only second', 'value': '0.3'})
+        first.append({'uid': 'first/only first', 'name': 'only first', 'value': '0.4'})
+        uids = {('0.1', morph['name']): morph.get('uid') for morph in first}
+        uids.update({('0.2', morph['name']): morph.get('uid') for morph in second})
+        only_in = {'only first': 'first/only first', 'only second': None}
+        only_in.update({name: f'first/{name}' for name in names[15:]})
+        children = create_children_morph_lists([first, second], [1, 1], 30, 0.05, np.random.default_rng(4))
+        n_checked = 0
+        for child in children:
+            for morph in child:
+                if morph['name'] in only_in:
+                    self.assertEqual(only_in[morph['name']], morph.get('uid'), morph)
+                elif (morph['value'], morph['name']) in uids:  # not mutated
+                    self.assertEqual(uids[(morph['value'], morph['name'])], morph.get('uid'), morph)
+                    n_checked += 1
+        self.assertGreater(n_checked, 300)
+        self.assertEqual({'first', 'second'}, {m['uid'].split('/')[0] for c in children for m in c if 'uid' in m})
+
+    def test_evolution_engine_keeps_elites_and_uses_strategies(self):
+        population = [[{'uid': f'uid/{name}', 'name': name, 'value': str(i / 10)} for name in 'abc']
+                      for i in range(1, 6)]
+        ratings = [1, 1, 5, 1, 1]
+        engine = EvolutionEngine(None, {'morph threshold': 0.01, 'max kept elites': 1},
+                                 rng=np.random.default_rng(0))
+        new_population = engine.create_next_population(population, ratings, 8)
+        self.assertEqual(8, len(new_population))
+        self.assertEqual(population[2], new_population[0])
+
+        selected = list()
+
+        def select_first_two(ratings, n_pairs, rng):
+            selected.append(n_pairs)
+            return np.tile([0, 1], (n_pairs, 1))
+        engine.select_parents = select_first_two
+        self.assertEqual(4, len(engine.create_next_population(population, [1] * 5, 4)))
+        self.assertEqual([4], selected)
+
+        # without n, the setting 'population size' is used, and the elites never make the population larger
+        engine.settings.update({'population size': 3, 'max kept elites': 5})
+        engine.select_parents = None
+        self.assertEqual(3, len(engine.create_next_population(population, [5] * 5)))
+
+        # the progress of a job is reported for every child, and cancelling stops the work at the next child
+        events = list()
+        job = Job(type('Events', (), {'put': lambda self, event: events.append(event[2])})(), None)
+        progress = job.get_progress_callback('Generating')
+        engine.create_next_population(population, [1] * 5, 4, progress)
+        self.assertEqual([f'Generating\n({i}/4)' for i in range(5)], events)
+
+        def cancel_after_two(done, total):
+            if done == 2:
+                job.cancel_event.set()
+            progress(done, total)
+        self.assertRaises(JobCancelled, engine.create_next_population, population, [1] * 5, 4, cancel_after_two)
+
+    def test_select_parent_pairs_picks_two_rated_parents(self):
+        rng = np.random.default_rng(1)
+        ratings = np.array([1, 0, 3, 5, 2, 0, 1])
+        pairs = select_parent_pairs(ratings, 10000, rng)
+        self.assertTrue((pairs[:, 0] != pairs[:, 1]).all())
+        self.assertTrue((ratings[pairs] > 0).all())
+        # the second parent of a pair is still chosen when no other parent has a rating
+        pairs = select_parent_pairs([0, 4, 0], 100, rng)
+        self.assertTrue((pairs[:, 0] == 1).all() and (pairs[:, 1] != 1).all())
+        self.assertEqual((5000, 2), select_parent_pairs(rng.integers(1, 6, 5000), 5000, rng).shape)
+
+    def test_selection_strategies_pick_two_different_parents(self):
+        rng = np.random.default_rng(2)
+        for ratings in ([1] * 50, [1, 1, 5, 1, 1], [5, 1, 0, 0], [0, 0], rng.integers(1, 6, 1000)):
+            for method, select_parents in SELECTION_STRATEGIES.items():
+                pairs = select_parents(ratings, 500, rng)
+                self.assertEqual((500, 2), pairs.shape, method)
+                self.assertTrue((pairs[:, 0] != pairs[:, 1]).all(), method)
+        # stochastic universal sampling picks every chromosome its expected number of times, rounded up or down
+        counts = np.bincount(select_parent_pairs_sus([1, 2, 3, 4], 50, rng).ravel(), minlength=4)
+        self.assertTrue((np.abs(counts - np.array([10, 20, 30, 40])) < 1).all())
+        self.assertEqual([1.5, 1.5, 4, 3], get_rank_weights([2, 2, 9, 5]).tolist())
+
+    def test_extract_character_storables_matches_full_json(self):
+        morphs = [{'uid': 'uid/a', 'name': 'a', 'value': '0.5'}, {'name': 'MVR_G2Female', 'value': '1'}]
+        appearance = {'setUnlistedParamsToDefault': 'true', 'storables': [
+            {'id': 'skin', 'textures': ['x' * 100] * 50},
+            {'id': 'geometry', 'character': 'Male 1', 'useFemaleMorphsOnMale': 'true', 'morphs': morphs,
+             'morphsOtherGender': morphs[:1], 'clothing': [{'id': 'cloth', 'enabled': 'true'}]},
+            {'id': 'FemaleAnatomy', 'enabled': 'false'}]}
+        data = json.dumps(appearance, indent=3).encode('utf-8')
+        extracted = extract_character_storables(data)
+        self.assertEqual(appearance['storables'][1:], extracted['storables'])
+        self.assertEqual(ecc_logic.get_appearance_gender(appearance), ecc_logic.get_appearance_gender(extracted))
+        self.assertEqual(ecc_logic.get_morph_list_from_appearance(appearance),
+                         ecc_logic.get_morph_list_from_appearance(extracted))
+        # a second geometry storable is unusual, so the caller has to fall back to the full json
+        appearance['storables'].append(appearance['storables'][1])
+        self.assertIsNone(extract_character_storables(json.dumps(appearance).encode('utf-8')))
+
+    def test_raters(self):
+        target = [{'name': 'a', 'value': '1.0'}, {'name': 'b', 'value': '-0.5'}]
+        population = [[{'name': 'a', 'value': str(v)}] for v in (0.0, 1.0, 0.5, -1.0, 0.9)]
+        self.assertEqual([2, 5, 3, 1, 4], TargetSimilarityRater(target).rate(1, population, None))
+
+        filenames = [f'Preset_Child_{i}.vap' for i in range(len(population))]
+        with tempfile.TemporaryDirectory() as path:
+            pattern = os.path.join(path, 'ratings_{generation}.json')
+            with open(pattern.format(generation=2), 'w') as f:
+                json.dump({'Preset_Child_1.vap': 5, 'Preset_Child_3.vap': 0}, f)
+            rater = JsonFileRater(pattern)
+            self.assertEqual([3, 5, 3, 1, 3], rater.rate(2, population, filenames))
+            self.assertRaises(FileNotFoundError, rater.rate, 3, population, filenames)
+
+    def test_search_index_matches_fnmatch(self):
+        class Store(dict):
+            def get_gender(self, filename):
+                return self[filename]
+
+            def is_favorite(self, filename):
+                return filename.endswith('7.vap')
+
+        rng = random.Random(3)
+        base_path = os.path.join('lib')
+        words = ['anna', 'Anne', 'bob', 'Lisa_2', 'preset_x', 'look', 'abc', 'Cab', 'bab', 'beb', 'b]b', 'x[ab']
+        filenames = [os.path.join(base_path, rng.choice(['', 'Creator', 'sub']), f'Preset_{rng.choice(words)}{i}.vap')
+                     for i in range(300)]
+        filenames.append(os.path.join(base_path, 'NoPrefix.vap'))
+        # a gender can be undetermined (False), which must not break the index
+        store = Store({f: rng.choice(['Female', 'Male', 'Futa', False]) for f in filenames})
+        index = SearchIndex(filenames, store, base_path)
+
+        texts = ['', 'a', 'an', 'ann', 'anna', 'anna1', 'Anne', 'n*e', 'an?', '[ab]', '[ab', 'sa_2', 'x', '1', '12',
+                 'preset', 'vap', '*', '?', 'look1', '[abc]', '[abc]1', 'b[aeo]b', '[!xyz]', 'an[!xyz]a', 'l[a-z]ok',
+                 'c[!x]b', '[]a]b', '[!]x]ab', 'b]b', 'x[ab', '[abc', 'ab[c]', '[a][b][c]', 'ca[b]1']
+        lowercase_filenames = {f.lower(): f for f in filenames}
+        for text in texts:
+            expected = [f for f in filenames if fnmatch(f.lower(), '*preset_*' + text + '*.vap')]
+            self.assertEqual(expected, index.search(text, filenames), text)
+            self.assertEqual([lowercase_filenames[f] for f in filter_filenames(lowercase_filenames,
+                                                                                '*preset_*' + text + '*.vap')],
+                             index.search(text, filenames), text)
+        # the sets have to find more than the files with their characters as a literal
+        for text in ('[abc]', '[abc]1', 'b[aeo]b', '[!xyz]', 'an[!xyz]a', 'c[!x]b', '[]a]b'):
+            self.assertGreater(len(index.search(text, filenames)), 1, text)
+        # typing one character at a time, only the results of the previous text have to be searched
+        for text in ('anna12', 'lisa_2*', 'n?e1', '[ab]o'):
+            previous, result = None, filenames
+            for end in range(len(text) + 1):
+                if not index.can_narrow(previous, text[:end]):
+                    result = filenames
+                result = index.search(text[:end], result)
+                previous = text[:end]
+                self.assertEqual(index.search(text[:end], filenames), result, text[:end])
+
+        female = index.search('#female', filenames)
+        self.assertEqual([f for f in filenames if store[f] == 'Female' and 'preset_' in f.lower()], female)
+        self.assertEqual([f for f in female if f.endswith('7.vap') and os.sep + 'sub' + os.sep in f],
+                         index.search('#fem #fav #sub', filenames))
+
+    def test_walk_library_matches_glob(self):
+        with tempfile.TemporaryDirectory() as path:
+            rng = random.Random(7)
+            names = ['Preset_a.vap', 'Preset_b c.vap', 'preset_lower.vap', 'Other.vap', 'Preset_d.json',
+                     'Preset_e.vap.tmp', 'Preset_.vap']
+            directories = [path]
+            for directory in ('sub', os.path.join('sub', 'deeper'), os.path.join('sub', 'deeper', 'deepest'),
+                              'Creator', '.hidden', os.path.join('Creator', '.hidden too'), 'empty'):
+                directories.append(os.path.join(path, directory))
+                os.makedirs(directories[-1])
+            for directory in directories:
+                for name in rng.sample(names, 5):
+                    filename = os.path.join(directory, name)
+                    open(filename, 'w').close()
+                    if rng.random() < 0.5:
+                        open(filename + '.fav', 'w').close()
+                    if rng.random() < 0.5:
+                        open(os.path.splitext(filename)[0] + '.jpg', 'w').close()
+
+            for recursive in (False, True):
+                # the file listing of the app before the walker
+                if recursive:
+                    expected = glob.glob(os.path.join(path, "**", "Preset_*.vap"), recursive=True)
+                else:
+                    expected = glob.glob(os.path.join(path, "Preset_*.vap"), recursive=False)
+                expected = sorted(str(pathlib.Path(f)) for f in expected)
+                for workers in (1, 3):
+                    library_files, _ = walk_library(path, recursive, workers=workers)
+                    self.assertEqual(expected, [f.filename for f in library_files], (recursive, workers))
+                    for library_file in library_files:
+                        f = library_file.filename
+                        self.assertEqual(os.path.isfile(f + '.fav'), library_file.is_fav)
+                        thumbnail = os.path.splitext(f)[0] + '.jpg'
+                        self.assertEqual(thumbnail if os.path.isfile(thumbnail) else None, library_file.thumbnail)
+                        self.assertEqual(get_file_signature(f), library_file.signature)
+                # os.walk() gives the same files, when the hidden directories are skipped like glob does
+                walked = list()
+                for directory, subdirectories, files in os.walk(path):
+                    subdirectories[:] = [d for d in subdirectories if recursive and not d.startswith('.')]
+                    walked.extend(os.path.join(directory, name) for name in files if fnmatch(name, 'Preset_*.vap'))
+                self.assertEqual(expected, sorted(walked))
+
+    def test_parallel_scan_matches_serial_scan(self):
+        with tempfile.TemporaryDirectory() as path:
+            filenames = create_library(path, MIN_FILES_FOR_PARALLEL_SCAN + 8, n_morphs=20, seed=5)
+            with open(filenames[3], 'w') as f:
+                f.write('{"storables": [')  # still being written
+            # json which is not an Appearance file
+            not_appearances = {10: {'storables': []}, 11: {}, 12: [1], 13: {'storables': [1, 'geometry']},
+                               14: {'storables': [{'id': 'geometry', 'character': 'Female', 'morphs': 1}]},
+                               15: {'storables': [{'id': 'geometry', 'character': 'Female', 'morphs': [{}]}]}}
+            for i, data in not_appearances.items():
+                with open(filenames[i], 'w') as f:
+                    json.dump(data, f)
+            serial = list(scan_appearance_files(filenames, workers=1))
+            parallel = list(scan_appearance_files(filenames, workers=2))
+            # a single file is scanned like this when the library watcher sees it change
+            self.assertIsNone(scan_appearance_file(filenames[11])[2])
+            self.assertIsNone(scan_appearance_file(filenames[12])[2])
+        self.assertEqual(serial, parallel)
+        self.assertEqual([f for i, f in enumerate(filenames) if i != 3], [f for f, _, _ in serial])
+        for i in not_appearances:
+            self.assertIsNone(serial[i - 1][2], i)
+        self.assertEqual(20, len(serial[0][2]['morph_names']))
+
+    def test_save_data_atomically_leaves_no_temporary_file(self):
+        def fail(f):
+            f.write(b'half written')
+            raise OSError('disk full')
+
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'Preset_a.vap')
+            ecc_logic.save_data_atomically(b'first', filename)
+            ecc_logic.save_data_atomically(lambda f: f.write(b'second'), filename)
+            self.assertRaises(OSError, ecc_logic.save_data_atomically, fail, filename)
+            self.assertRaises(OSError, ecc_logic.save_data_atomically, b'data', os.path.join(path, 'missing', 'a'))
+            with open(filename, 'rb') as f:
+                self.assertEqual(b'second', f.read())
+            self.assertEqual(['Preset_a.vap'], os.listdir(path))
+
+    def test_polling_library_watcher_sees_files_changed_in_place(self):
+        with tempfile.TemporaryDirectory() as path:
+            preset = os.path.join(path, 'Preset_a.vap')
+            other = os.path.join(path, 'Preset_b.vap')
+            for filename in (preset, other):
+                with open(filename, 'w') as f:
+                    f.write('{"value": 1}')
+            watcher = PollingLibraryWatcher(recursive=True)
+            watcher.add_directory(path)
+            watcher.poll()
+            self.assertEqual(set(), watcher.get_changes())
+
+            # saved over in place with the same size, which does not change the mtime of the directory
+            directory_mtime = os.stat(path).st_mtime_ns
+            with open(preset, 'w') as f:
+                f.write('{"value": 2}')
+            stat = os.stat(preset)
+            os.utime(preset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            self.assertEqual(directory_mtime, os.stat(path).st_mtime_ns)
+            watcher.poll()
+            self.assertEqual({preset}, watcher.get_changes())
+            watcher.poll()
+            self.assertEqual(set(), watcher.get_changes())
+
+            os.remove(other)
+            open(preset + '.fav', 'w').close()
+            watcher.poll()
+            self.assertEqual({other, preset + '.fav'}, watcher.get_changes())
+            os.mkdir(os.path.join(path, 'new directory'))
+            watcher.poll()
+            self.assertIsNone(watcher.get_changes())
+            watcher.close()
+
+            # the background thread lists the directories by itself, get_changes() only hands over what it found
+            watcher = PollingLibraryWatcher(recursive=False, poll_interval=0.01)
+            watcher.add_directory(path)
+            open(other, 'w').close()
+            deadline = time.monotonic() + 5
+            changes = set()
+            while not changes and time.monotonic() < deadline:
+                time.sleep(0.01)
+                changes = watcher.get_changes()
+            self.assertEqual({other}, changes)
+            watcher.close()
+            watcher.thread.join(5)
+            self.assertFalse(watcher.thread.is_alive())
+
     # def test_is_morph_name_in_morph_list(self):
     #     morph_list = [{'name': 'a'}, {'name': 'b'}, {}]
     #     test_cases = [